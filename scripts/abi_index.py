@@ -0,0 +1,379 @@
+import json
+import os
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    raise Exception("numpy is required by the ABI decoder, install it with `poetry install`")
+
+from scripts import build_cache
+
+ABI_INDEX_VERSION = "2"
+CACHE_KIND = "abi-index"
+
+# metadata columns of the decoded logs
+LOG_COLUMNS = (("block_number", "<i8"), ("log_index", "<i8"), ("transaction_hash", ("u1", 32)),
+               ("log_address", ("u1", 20)))
+
+_int_pattern = re.compile(r"^(u?)int(\d*)$")
+_bytes_pattern = re.compile(r"^bytes(\d+)$")
+
+
+def canonical_type(param):
+    abi_type = param["type"]
+    if abi_type.startswith("tuple"):
+        return "(" + ",".join(canonical_type(c) for c in param["components"]) + ")" + abi_type[5:]
+    return abi_type
+
+
+def signature(entry):
+    return f"{entry['name']}({','.join(canonical_type(p) for p in entry['inputs'])})"
+
+
+# how a value is decoded: a 32 bytes word decoded for all the rows at once, or `dynamic` for eth_abi
+def field_kind(abi_type, indexed=False):
+    if indexed and (abi_type in ("string", "bytes") or abi_type.endswith("]") or abi_type.startswith("(")):
+        # indexed reference types are only logged as the keccak of their encoding
+        return "hash"
+    if abi_type in ("address", "bool"):
+        return abi_type
+    match = _int_pattern.match(abi_type)
+    if match:
+        bits = int(match.group(2) or 256)
+        return f"{match.group(1)}int{64 if bits <= 64 else 256}"
+    match = _bytes_pattern.match(abi_type)
+    if match:
+        return f"bytes{match.group(1)}"
+    return "dynamic"
+
+
+def column_dtype(kind):
+    if kind == "address":
+        return ("u1", 20)
+    if kind == "hash":
+        return ("u1", 32)
+    if kind.startswith("bytes"):
+        return ("u1", int(kind[5:]))
+    return {"bool": "?", "uint64": "<u8", "int64": "<i8"}.get(kind, "O")
+
+
+# the words of a value in the head of an encoding, static tuples and fixed size arrays are encoded in place
+def _head_words(param, abi_type=None):
+    abi_type = abi_type or param["type"]
+    if abi_type.endswith("]"):
+        base, size = abi_type[:-1].rsplit("[", 1)
+        if not size:
+            return None
+        words = _head_words(param, base)
+        return words and words * int(size)
+    if abi_type == "tuple":
+        words = [_head_words(c) for c in param["components"]]
+        return None if None in words else sum(words)
+    return None if abi_type in ("string", "bytes") else 1
+
+
+def _fields(inputs, logged):
+    fields = []
+    names = {name for name, _ in LOG_COLUMNS} if logged else set()
+    head = 0
+    for i, param in enumerate(inputs):
+        name = param.get("name") or f"arg{i}"
+        while name in names:
+            name += "_"
+        names.add(name)
+        abi_type = canonical_type(param)
+        indexed = bool(param.get("indexed"))
+        field = {"name": name, "type": abi_type, "indexed": indexed, "kind": field_kind(abi_type, indexed)}
+        if not indexed:
+            field["head"] = head
+            head += _head_words(param) or 1
+        fields.append(field)
+    return fields
+
+
+# topic0 -> event and selector -> function of every ABI of `abi_dir`, the same signature in several contracts is
+# decoded once
+def build(abi_dir):
+    from eth_hash.auto import keccak
+
+    events = {}
+    functions = {}
+    for file in sorted(os.listdir(abi_dir)):
+        if not file.endswith(".abi"):
+            continue
+        contract = file[:-4]
+        with open(os.path.join(abi_dir, file), "r") as f:
+            abi = json.load(f)
+
+        for entry in abi:
+            if entry["type"] == "event" and not entry.get("anonymous"):
+                sig = signature(entry)
+                topic = "0x" + keccak(sig.encode()).hex()
+                event = events.setdefault(
+                    topic, {"name": entry["name"], "signature": sig, "contracts": [],
+                            "fields": _fields(entry["inputs"], True)}
+                )
+                event["contracts"].append(contract)
+            elif entry["type"] == "function":
+                sig = signature(entry)
+                selector = "0x" + keccak(sig.encode())[:4].hex()
+                function = functions.setdefault(
+                    selector, {"name": entry["name"], "signature": sig, "contracts": [],
+                               "fields": _fields(entry["inputs"], False),
+                               "outputs": [canonical_type(p) for p in entry.get("outputs", ())]}
+                )
+                function["contracts"].append(contract)
+    return {"version": ABI_INDEX_VERSION, "events": events, "functions": functions}
+
+
+def index_key(abi_dir):
+    items = [ABI_INDEX_VERSION]
+    for file in sorted(os.listdir(abi_dir)):
+        if file.endswith(".abi"):
+            with open(os.path.join(abi_dir, file), "rb") as f:
+                items += [file, f.read()]
+    return build_cache.hash_items(*items)
+
+
+def _to_bytes(value):
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+
+# a column of `0x` prefixed hex strings or of bytes as one blob and the length of every value, converted at once
+def _join(values):
+    if values and isinstance(values[0], str):
+        # `x` is not a hex digit, so the prefixes are the only matches
+        return bytes.fromhex("".join(values).replace("0x", "")), [(len(v) >> 1) - 1 for v in values]
+    values = [bytes(v) for v in values]
+    return b"".join(values), [len(v) for v in values]
+
+
+def _to_ints(values):
+    if values and isinstance(values[0], str):
+        return [int(v, 16) for v in values]
+    return [-1 if v is None else int(v) for v in values]
+
+
+class _Rows:
+    # the ABI encodings of a batch, stored back to back in one blob
+    def __init__(self, blob, lengths):
+        self.blob = blob
+        self.lengths = lengths
+        self.fixed = len(set(lengths)) <= 1
+        if not self.fixed:
+            self.starts = np.concatenate([[0], np.cumsum(lengths[:-1])]).tolist()
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, row):
+        if self.fixed:
+            length = self.lengths[0]
+            return self.blob[row * length:(row + 1) * length]
+        return self.blob[self.starts[row]:self.starts[row] + self.lengths[row]]
+
+    # the 32 bytes words from `offset` of every row as a (rows, words, 32) uint8 array
+    def words(self, offset, num_words):
+        size = num_words * 32
+        if min(self.lengths, default=0) < offset + size:
+            raise Exception("Truncated ABI encoded data")
+        if self.fixed:
+            matrix = np.frombuffer(self.blob, dtype=np.uint8).reshape(len(self), -1)
+            return matrix[:, offset:offset + size].reshape(len(self), num_words, 32)
+        joined = b"".join(self.blob[start + offset:start + offset + size] for start in self.starts)
+        return np.frombuffer(joined, dtype=np.uint8).reshape(len(self), num_words, 32)
+
+
+def _decode_words(kind, words):
+    if kind == "address":
+        return words[:, 12:]
+    if kind == "hash":
+        return words
+    if kind == "bool":
+        return words[:, 31] != 0
+    if kind.startswith("bytes"):
+        return words[:, :int(kind[5:])]
+    if kind == "uint64":
+        return np.ascontiguousarray(words[:, 24:]).view(">u8")[:, 0]
+    if kind == "int64":
+        return np.ascontiguousarray(words[:, 24:]).view(">i8")[:, 0]
+    signed = kind == "int256"
+    return [int.from_bytes(word, "big", signed=signed) for word in map(bytes, words)]
+
+
+class Decoder:
+    # the decoding of one event or function into a structured array, one column per parameter
+    def __init__(self, entry, logged):
+        self.name = entry["name"]
+        self.signature = entry["signature"]
+        self.contracts = entry["contracts"]
+        self.fields = entry["fields"]
+        self.outputs = entry.get("outputs", [])
+        self.logged = logged
+
+        self.topic_fields = [f for f in self.fields if f["indexed"]]
+        self.data_fields = [f for f in self.fields if not f["indexed"]]
+        self.dynamic = [i for i, f in enumerate(self.data_fields) if f["kind"] == "dynamic"]
+        self.head_words = max((f["head"] + 1 for f in self.data_fields), default=0)
+
+        columns = list(LOG_COLUMNS) if logged else []
+        self.dtype = np.dtype(columns + [(f["name"], column_dtype(f["kind"])) for f in self.fields])
+
+    # `topics` are the (rows, indexed parameters, 32) words of the rows, `data` their ABI encoded parameters
+    def decode(self, topics, data, offset=0):
+        rows = np.zeros(len(data), dtype=self.dtype)
+
+        for i, field in enumerate(self.topic_fields):
+            rows[field["name"]] = _decode_words(field["kind"], topics[:, i])
+
+        if self.data_fields:
+            # the static parameters and the offsets of the dynamic ones are in the head of the encoding
+            words = data.words(offset, self.head_words)
+            for field in self.data_fields:
+                if field["kind"] != "dynamic":
+                    rows[field["name"]] = _decode_words(field["kind"], words[:, field["head"]])
+
+        if self.dynamic:
+            from eth_abi import decode
+
+            types = [f["type"] for f in self.data_fields]
+            columns = [(rows[self.data_fields[i]["name"]], i) for i in self.dynamic]
+            for row in range(len(data)):
+                values = decode(types, data[row][offset:])
+                for column, i in columns:
+                    column[row] = values[i]
+        return rows
+
+    def decode_output(self, data):
+        from eth_abi import decode
+
+        return decode(self.outputs, data)
+
+
+class AbiIndex:
+    # topic0/selector lookup table of the system contracts with the decoder of every event and function
+    def __init__(self, index):
+        self.events = {bytes.fromhex(topic[2:]): Decoder(e, True) for topic, e in index["events"].items()}
+        self.functions = {bytes.fromhex(sel[2:]): Decoder(f, False) for sel, f in index["functions"].items()}
+        # the raw values of JSON-RPC are looked up without conversion
+        self._hex_events = {"0x" + topic.hex(): decoder for topic, decoder in self.events.items()}
+        self._hex_functions = {"0x" + sel.hex(): decoder for sel, decoder in self.functions.items()}
+        self._contract_functions = {
+            (contract, decoder.name): (sel, decoder)
+            for sel, decoder in self.functions.items() for contract in decoder.contracts
+        }
+
+    @classmethod
+    def load(cls, abi_dir, cache_dir=None):
+        key = index_key(abi_dir)
+        cache = build_cache.BuildCache(cache_dir) if cache_dir else None
+        data = cache.get(CACHE_KIND, key) if cache else None
+        if data is None:
+            data = json.dumps(build(abi_dir)).encode()
+            if cache:
+                cache.put(CACHE_KIND, key, data)
+        return cls(json.loads(data))
+
+    def event(self, topic):
+        return self.events.get(_to_bytes(topic))
+
+    def function(self, selector):
+        return self.functions.get(_to_bytes(selector)[:4])
+
+    # the calldata of a call to the function `name` of `contract`, and the decoder of its result
+    def encode_call(self, contract, name, *args):
+        from eth_abi import encode
+
+        try:
+            sel, decoder = self._contract_functions[(contract, name)]
+        except KeyError:
+            raise Exception(f"Unknown function {contract}.{name}")
+        return sel + encode([f["type"] for f in decoder.fields], args), decoder
+
+    def _lookup(self, by_bytes, by_hex, key):
+        if isinstance(key, str):
+            return by_hex.get(key) or by_hex.get(key.lower())
+        return by_bytes.get(bytes(key))
+
+    # decode batches of raw logs, JSON-RPC dicts with `0x` prefixed hex strings or bytes, every batch is yielded as
+    # a dict `signature -> structured array` of its events, the logs of unknown events under `None`
+    def decode_logs(self, logs, batch_size=100_000):
+        for batch in _batches(logs, batch_size):
+            groups = {}
+            unknown = []
+            for log in batch:
+                topics = log["topics"]
+                decoder = self._lookup(self.events, self._hex_events, topics[0]) if topics else None
+                if decoder is None or len(topics) != len(decoder.topic_fields) + 1:
+                    unknown.append(log)
+                    continue
+                groups.setdefault(decoder, []).append(log)
+
+            decoded = {}
+            for decoder, group in groups.items():
+                topics, _ = _join([t for log in group for t in log["topics"][1:]])
+                topics = np.frombuffer(topics, dtype=np.uint8).reshape(len(group), len(decoder.topic_fields), 32)
+                rows = decoder.decode(topics, _Rows(*_join([log.get("data", b"") for log in group])))
+
+                rows["block_number"] = _to_ints([log.get("blockNumber") for log in group])
+                rows["log_index"] = _to_ints([log.get("logIndex") for log in group])
+                if "transactionHash" in group[0]:
+                    blob, _ = _join([log["transactionHash"] for log in group])
+                    rows["transaction_hash"] = np.frombuffer(blob, dtype=np.uint8).reshape(len(group), 32)
+                if "address" in group[0]:
+                    blob, _ = _join([log["address"] for log in group])
+                    rows["log_address"] = np.frombuffer(blob, dtype=np.uint8).reshape(len(group), 20)
+                decoded[decoder.signature] = rows
+            if unknown:
+                decoded[None] = unknown
+            yield decoded
+
+    # decode batches of calldata (`0x` prefixed hex strings or bytes) like `decode_logs`, by function selector
+    def decode_calls(self, calls, batch_size=100_000):
+        for batch in _batches(calls, batch_size):
+            groups = {}
+            unknown = []
+            for call in batch:
+                decoder = self._lookup(self.functions, self._hex_functions, call[:10 if isinstance(call, str) else 4])
+                if decoder is None:
+                    unknown.append(call)
+                    continue
+                groups.setdefault(decoder, []).append(call)
+
+            decoded = {}
+            for decoder, group in groups.items():
+                decoded[decoder.signature] = decoder.decode(None, _Rows(*_join(group)), 4)
+            if unknown:
+                decoded[None] = unknown
+            yield decoded
+
+
+def _batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# the per-log decoding of web3 contract objects, the reference of the columnar decoding
+def decode_log_reference(index, log):
+    from eth_abi import decode
+
+    decoder = index.event(log["topics"][0])
+    values = {}
+    topic_values = iter(log["topics"][1:])
+    data_values = iter(decode([f["type"] for f in decoder.data_fields], _to_bytes(log.get("data", b""))))
+    for field in decoder.fields:
+        if field["indexed"]:
+            topic = _to_bytes(next(topic_values))
+            values[field["name"]] = topic if field["kind"] == "hash" else decode([field["type"]], topic)[0]
+        else:
+            values[field["name"]] = next(data_values)
+    return decoder.signature, values
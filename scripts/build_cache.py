@@ -0,0 +1,183 @@
+import hashlib
+import os
+import re
+import shutil
+
+_import_pattern = re.compile(r"^\s*import\s+(?:[^\"';]*\s+from\s+)?[\"']([^\"']+)[\"']", re.M)
+
+
+class BuildCache:
+    # content addressed cache of build outputs, one file per entry, evicted least recently used first, the parallel
+    # workers sharing a cache may evict the entries of each other at any time, a vanished entry is a miss
+    def __init__(self, cache_dir, max_entries=128):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    def _path(self, kind, key):
+        return os.path.join(self.cache_dir, kind, key)
+
+    def get(self, kind, key):
+        path = self._path(kind, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        # mark as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def get_file(self, kind, key, destination):
+        path = self._path(kind, key)
+        try:
+            shutil.copyfile(path, destination)
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put_file(self, kind, key, source):
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, path)
+
+        self.evict(kind)
+
+    def put(self, kind, key, data):
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self.evict(kind)
+
+    def evict(self, kind):
+        kind_dir = os.path.join(self.cache_dir, kind)
+        entries = []
+        for entry in os.scandir(kind_dir):
+            try:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    entries.append((entry.stat().st_mtime_ns, entry.path))
+            except FileNotFoundError:
+                continue
+
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def hash_items(*items):
+    h = hashlib.sha256()
+    for item in items:
+        if isinstance(item, str):
+            item = item.encode()
+        h.update(len(item).to_bytes(8, "big"))
+        h.update(item)
+    return h.hexdigest()
+
+
+# (context, prefix, target) remappings of foundry.toml and remappings.txt, the longest prefix first like solc
+def load_remappings(work_dir):
+    from scripts import matrix
+
+    config = matrix.load_document(os.path.join(work_dir, "foundry.toml"))
+    entries = list(config.get("profile", {}).get("default", {}).get("remappings", []))
+    try:
+        with open(os.path.join(work_dir, "remappings.txt"), "r") as f:
+            entries += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except FileNotFoundError:
+        pass
+
+    remappings = []
+    for entry in entries:
+        mapping, _, target = entry.partition("=")
+        context, _, prefix = mapping.rpartition(":")
+        remappings.append((context, prefix, target))
+    return sorted(remappings, key=lambda r: (len(r[0]), len(r[1])), reverse=True)
+
+
+# the file of an import like forge resolves it: relative to the importer, through the remappings, from the project
+# root, then from the libraries, None when it does not exist
+def resolve_import(work_dir, importer, path, remappings=()):
+    if path.startswith("."):
+        candidates = [os.path.normpath(os.path.join(os.path.dirname(importer), path))]
+    else:
+        importer_name = os.path.relpath(importer, work_dir)
+        remapped = [
+            target + path[len(prefix):] for context, prefix, target in remappings
+            if path.startswith(prefix) and importer_name.startswith(context)
+        ]
+        if remapped:
+            candidates = [os.path.join(work_dir, remapped[0])]
+        else:
+            candidates = [os.path.join(work_dir, directory, path) for directory in ("", "node_modules", "lib")]
+
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return os.path.normpath(candidate)
+    return None
+
+
+# a contract source and every file it imports, as (path, content), an import which can not be resolved is an error:
+# the cache keys would miss the changes of the file
+def source_closure(work_dir, source_file, remappings=None, read=None):
+    read = read or _read_file
+    if remappings is None:
+        remappings = load_remappings(work_dir)
+
+    seen = set()
+    stack = [source_file]
+    files = []
+    while stack:
+        path = stack.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+
+        content = read(path)
+        files.append((path, content))
+        for imported in _import_pattern.findall(content.decode()):
+            resolved = resolve_import(work_dir, path, imported, remappings)
+            if resolved is None:
+                raise Exception(
+                    f"Unresolved import '{imported}' of '{os.path.relpath(path, work_dir)}', "
+                    f"install the dependencies (npm install, forge install) first"
+                )
+            stack.append(resolved)
+    return files
+
+
+# hash of a contract source and everything it imports, as seen by the compiler
+def source_key(work_dir, source_file, compiler_settings, read=None, remappings=None):
+    digests = [
+        (os.path.relpath(path, work_dir), hashlib.sha256(content).hexdigest())
+        for path, content in source_closure(work_dir, source_file, remappings, read)
+    ]
+
+    items = [compiler_settings]
+    for name, digest in sorted(digests):
+        items += [name, digest]
+    return hash_items(*items)
+
+
+def compiler_settings(work_dir):
+    with open(os.path.join(work_dir, "foundry.toml"), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import re
+
+ANNOTATION_PREFIX = "    // @notice signature: "
+
+_error_pattern = re.compile(r"^\s{4}(error)\s([a-zA-Z]*\(.*\));\s$")
+_annotation_pattern = re.compile(r"^\s{4}(//\s@notice\ssignature:)\s.*\s$")
+_params_pattern = re.compile(r"\((.*?)\)")
+
+
+def error_signature(error_msg):
+    # remove variable names
+    match = _params_pattern.search(error_msg)
+    if match and match.group(1) != "":
+        variables = [v.split()[0].strip() for v in match.group(1).split(",")]
+        error_msg = _params_pattern.sub(f"({','.join(variables)})", error_msg)
+    return error_msg
+
+
+def selector(signature):
+    from eth_hash.auto import keccak
+
+    return "0x" + keccak(signature.encode())[:4].hex()
+
+
+# update/insert the signature annotation of every error, returns the new lines and the errors found
+def annotate(lines):
+    content = []
+    errors = []
+    for line in lines:
+        if _error_pattern.match(line):
+            signature = error_signature(line[10:-2])
+            sig = selector(signature)
+            errors.append((sig, signature))
+
+            annotation = ANNOTATION_PREFIX + sig + "\n"
+            if content and _annotation_pattern.match(content[-1]):
+                content[-1] = annotation
+            else:
+                content.append(annotation)
+        content.append(line)
+    return content, errors
+
+
+class ErrorIndex:
+    # selector -> error signature of every custom error of the contracts
+    def __init__(self, selectors=None):
+        self.selectors = dict(selectors or {})
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(dict(sorted(self.selectors.items())), f, indent=2)
+            f.write("\n")
+
+    def add(self, sig, signature, source=""):
+        known = self.selectors.setdefault(sig, signature)
+        if known != signature:
+            raise Exception(f"Selector collision {sig}: {known} and {signature} ({source})")
+
+    def lookup(self, sig):
+        return self.selectors.get(sig.lower())
+
+    # decode the revert data of a call, returns the error signature and its arguments
+    def decode(self, revert_data):
+        if isinstance(revert_data, str):
+            revert_data = bytes.fromhex(revert_data[2:] if revert_data.startswith("0x") else revert_data)
+
+        signature = self.lookup("0x" + revert_data[:4].hex())
+        if signature is None:
+            return None, None
+
+        types = signature[signature.index("(") + 1:-1]
+        if not types:
+            return signature, ()
+
+        from eth_abi import decode
+        return signature, tuple(decode(types.split(","), revert_data[4:]))
+
+
+def _load_state(state_path):
+    try:
+        with open(state_path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# annotate the contracts of `dir_path` and index the errors of every contract below it,
+# files whose hash matches the state of the previous run are not processed again
+def update(dir_path, state_path, full=False):
+    state = {} if full else _load_state(state_path)
+    new_state = {}
+    index = ErrorIndex()
+    written = []
+    processed = 0
+
+    for root, dirs, files in os.walk(dir_path):
+        dirs.sort()
+        for file in sorted(files):
+            if not file.endswith(".sol"):
+                continue
+
+            file_path = os.path.join(root, file)
+            rel_path = os.path.relpath(file_path, dir_path)
+            with open(file_path, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+
+            entry = state.get(rel_path)
+            if entry is None or entry["sha256"] != digest:
+                processed += 1
+                lines = raw.decode().splitlines(keepends=True)
+                content, errors = annotate(lines)
+                # only the contracts of `dir_path` itself are annotated
+                if root == dir_path and content != lines:
+                    raw = "".join(content).encode()
+                    with open(file_path, "wb") as f:
+                        f.write(raw)
+                    digest = hashlib.sha256(raw).hexdigest()
+                    written.append(rel_path)
+                entry = {"sha256": digest, "errors": errors}
+
+            new_state[rel_path] = entry
+            for sig, signature in entry["errors"]:
+                index.add(sig, signature, rel_path)
+
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path, "w") as f:
+        json.dump(new_state, f)
+
+    return index, processed, written
@@ -0,0 +1,150 @@
+import json
+import math
+import os
+import re
+import time
+
+from scripts import matrix, validator_set
+
+# chain id asserted by test/utils/Deployer.sol
+BENCH_CHAIN_ID = 1937
+BENCH_CONTRACT = "GasBenchTest"
+
+_gas_log_pattern = re.compile(r"^gas\.(\w+): (\d+)$")
+
+
+# deterministic validators, so the gas of every run is comparable
+def bench_validators(number):
+    from eth_hash.auto import keccak
+
+    for i in range(number):
+        seed = keccak(f"gas bench validator {i}".encode())
+        addr = seed[:20]
+        bls_public_key = seed + keccak(seed)[:validator_set.BLS_PUBLIC_KEY_LENGTH - len(seed)]
+        yield validator_set.Validator(addr, addr, addr, 100, bls_public_key)
+
+
+# counts, bounds of the growth exponent of each entry point, the max increase over the reference run, the path of the
+# baseline next to the config or None without one and the margin of the bounds derived from it
+def load_config(path):
+    config = matrix.load_document(path)
+    if not isinstance(config, dict) or not isinstance(config.get("bounds"), dict):
+        raise Exception(f"'{path}' must define the `bounds` of the entry points")
+
+    counts = sorted({int(n) for n in config.get("counts", (21, 45, 100, 500))})
+    if len(counts) < 2:
+        raise Exception(f"'{path}' must define at least 2 validator counts")
+    baseline = os.path.join(os.path.dirname(path), config["baseline"]) if config.get("baseline") else None
+    return (
+        counts, {k: float(v) for k, v in config["bounds"].items()}, config.get("max_increase"), baseline,
+        float(config.get("bound_margin", 0.1)),
+    )
+
+
+# the `gas.<entry point>: <gas>` logs of `forge test --json`
+def parse_forge_results(output):
+    gas = {}
+    failed = []
+    # forge may print the compilation progress before the results
+    for suite in json.loads(output.strip().splitlines()[-1]).values():
+        for test, result in suite.get("test_results", {}).items():
+            if result.get("status") != "Success":
+                failed.append(f"{test}: {result.get('reason')}")
+            for log in result.get("decoded_logs") or ():
+                match = _gas_log_pattern.match(log.strip())
+                if match:
+                    gas[match.group(1)] = int(match.group(2))
+
+    if failed:
+        raise Exception("Gas bench failed:\n" + "\n".join(failed))
+    return gas
+
+
+# least squares slope of log(gas) over log(validators), gas ~ validators ** exponent
+def growth_exponent(points):
+    xs = [math.log(n) for n, _ in points]
+    ys = [math.log(gas) for _, gas in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+# gas of every entry point by validator count, from the results of each count
+def collect(results):
+    gas = {}
+    for number, entries in results.items():
+        for entry, used in entries.items():
+            gas.setdefault(entry, {})[number] = used
+    return {entry: dict(sorted(by_count.items())) for entry, by_count in sorted(gas.items())}
+
+
+# the measured exponents of the baseline plus the margin, rounded up, gas ~ N^bound
+def baseline_bounds(baseline, margin):
+    # rounded first, so the float error of the fit does not push a bound up by 0.01
+    return {
+        entry: math.ceil(round((exponent + margin) * 100, 6)) / 100 for entry, exponent in baseline["exponents"].items()
+    }
+
+
+# violations of the bounds, and of the max increase over the baseline or the previous entry of the history
+def check(gas, exponents, bounds, max_increase=None, previous=None):
+    violations = []
+    for entry, bound in bounds.items():
+        if entry not in exponents:
+            violations.append(f"{entry}: not measured")
+        elif exponents[entry] > bound:
+            violations.append(f"{entry}: gas grows as N^{exponents[entry]:.2f}, bound N^{bound:.2f}")
+
+    if max_increase is not None and previous:
+        for entry, by_count in gas.items():
+            for number, used in by_count.items():
+                before = previous.get("gas", {}).get(entry, {}).get(str(number))
+                if before and used > before * (1 + max_increase):
+                    violations.append(f"{entry}: {used} gas with {number} validators, {before} before")
+    return violations
+
+
+def last_entry(history_path):
+    entry = None
+    try:
+        with open(history_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+    except FileNotFoundError:
+        pass
+    return entry
+
+
+def make_entry(gas, exponents, commit=None):
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "gas": {entry: {str(n): used for n, used in by_count.items()} for entry, by_count in gas.items()},
+        "exponents": {entry: round(exponent, 4) for entry, exponent in exponents.items()},
+    }
+
+
+def append_entry(history_path, gas, exponents, commit=None):
+    record = make_entry(gas, exponents, commit)
+    os.makedirs(os.path.dirname(os.path.abspath(history_path)), exist_ok=True)
+    with open(history_path, "a") as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+    return record
+
+
+def load_baseline(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise Exception(f"Gas bench baseline '{path}' not found, record it with `gas-bench --record-baseline`")
+
+
+def write_baseline(path, gas, exponents, commit=None):
+    record = make_entry(gas, exponents, commit)
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return record
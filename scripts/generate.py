@@ -1,66 +1,83 @@
-import fileinput
+import json
 import os
-import re
 import shutil
 import subprocess
+import sys
+from typing import List
 
-import jinja2
 import typer
 from typing_extensions import Annotated
-from web3 import Web3
+
+# only modules of the standard library at import time, every command pays for them,
+# heavy dependencies (jinja2, eth_hash, eth_abi) are imported by the functions using them
+from scripts import build_cache, error_sig, genesis, holders as holders_io, matrix as parameter_matrix, validator_set
+from scripts import gas_bench as bench, genesis_state, import_profile, verify
+from scripts import profiler as profiling
+from scripts.overlay import SourceOverlay
 
 work_dir = os.getcwd()
 if work_dir.endswith("scripts"):
     work_dir = work_dir[:-8]
+cache_dir = os.path.join(work_dir, "cache", "genesis")
+overlay_dir = None
+overlay_mirror = ()
 
 network: str
 chain_id: int
 hex_chain_id: str
+sources: SourceOverlay
+profiler = profiling.Profiler()
+
+PRECOMPUTE_INIT_HELP = (
+    "Write the storage of the init calls into the genesis alloc. WARNING: a node which is not modified to skip them "
+    "still sends the init txs at block 1, they revert (onlyNotInit, initializer), check with verify-init-state"
+)
 
 main = typer.Typer()
 
 
-def backup_file(source, destination):
-    try:
-        shutil.copyfile(source, destination)
-    except FileNotFoundError:
-        print(f"Source file '{source}' not found.")
-    except PermissionError:
-        print(f"Permission error: Unable to copy file '{source}' to '{destination}'.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+@main.callback()
+def cli(
+    ctx: typer.Context,
+    import_profile_: Annotated[
+        bool, typer.Option("--import-profile", help="Report the import cost of each package of the command")
+    ] = False,
+    profile: Annotated[
+        str, typer.Option(help="Write the wall/CPU time, peak RSS and IO of every stage as a Chrome trace JSON")
+    ] = None,
+):
+    if profile:
+        profiler.enabled = True
+        command = profiler.stage(ctx.invoked_subcommand, "command", argv=sys.argv[1:])
+        command.__enter__()
 
+        def save():
+            command.__exit__(None, None, None)
+            profiler.save(os.path.join(work_dir, profile), sys.argv[1:])
 
-def insert(contract, pattern, ins):
-    pattern = re.compile(pattern)
-    filepath = os.path.join(work_dir, "contracts", contract)
+        ctx.call_on_close(save)
 
-    found = False
-    with fileinput.FileInput(filepath, inplace=True) as file:
-        for line in file:
-            if not found and pattern.search(line):
-                print(ins)
-                found = True
-            print(line, end="")
+    if not import_profile_:
+        return
 
-    if not found:
-        raise Exception(f"{pattern} not found")
+    # profile the command in a fresh interpreter, the imports of this one are already done
+    args = [arg for arg in sys.argv[1:] if arg != "--import-profile"]
+    code, stdout, times = import_profile.profile(args, cwd=work_dir)
+    sys.stdout.write(stdout)
 
+    print(f"{'package':<40} {'cumulative ms':>14}")
+    for package, cumulative_us in import_profile.by_package(times):
+        print(f"{package:<40} {cumulative_us / 1000:>14.1f}")
+    print(f"{'total':<40} {sum(t.self_us for t in times) / 1000:>14.1f}")
+    raise typer.Exit(code=code)
 
-def replace(contract, pattern, repl, count=1):
-    pattern = re.compile(pattern)
-    filepath = os.path.join(work_dir, "contracts", contract)
 
-    with open(filepath, "r") as f:
-        content = f.read()
+def insert(contract, pattern, ins):
+    sources.insert(contract, pattern, ins)
 
-    if pattern.search(content):
-        content = pattern.sub(repl, content, count=count)
-    else:
-        raise Exception(f"{pattern} not found")
 
-    with open(filepath, "w") as f:
-        f.write(content)
+def replace(contract, pattern, repl, count=1):
+    sources.replace(contract, pattern, repl, count)
 
 
 def replace_parameter(contract, parameter, value):
@@ -81,23 +98,19 @@ def convert_chain_id(int_chain_id: int):
 
 
 def generate_from_template(data, template_file, output_file):
+    import jinja2
+
     template_loader = jinja2.FileSystemLoader(work_dir)
     template_env = jinja2.Environment(loader=template_loader, autoescape=True)
 
     template = template_env.get_template(template_file)
-    result_string = template.render(data)
 
     output_path = os.path.join(work_dir, output_file)
-    with open(output_path, "w") as output_file:
-        output_file.write(result_string)
+    template.stream(data).dump(output_path)
 
 
 def generate_slash_indicator(misdemeanor_threshold, felony_threshold, init_felony_slash_scope):
     contract = "SlashIndicator.sol"
-    backup_file(
-        os.path.join(work_dir, "contracts", contract), os.path.join(work_dir, "contracts", contract[:-4] + ".bak")
-    )
-
     replace_parameter(contract, "uint256 public constant MISDEMEANOR_THRESHOLD", f"{misdemeanor_threshold}")
     replace_parameter(contract, "uint256 public constant FELONY_THRESHOLD", f"{felony_threshold}")
     replace_parameter(contract, "uint256 public constant INIT_FELONY_SLASH_SCOPE", f"{init_felony_slash_scope}")
@@ -111,10 +124,6 @@ def generate_stake_hub(
     stake_hub_protector
 ):
     contract = "StakeHub.sol"
-    backup_file(
-        os.path.join(work_dir, "contracts", contract), os.path.join(work_dir, "contracts", contract[:-4] + ".bak")
-    )
-
     replace_parameter(contract, "uint256 public constant BREATHE_BLOCK_INTERVAL", f"{breathe_block_interval}")
 
     replace(contract, r"maxElectedValidators = .*;", f"maxElectedValidators = {max_elected_validators};")
@@ -129,10 +138,6 @@ def generate_governor(
     propose_start_threshold, init_min_period_after_quorum, governor_protector
 ):
     contract = "Governor.sol"
-    backup_file(
-        os.path.join(work_dir, "contracts", contract), os.path.join(work_dir, "contracts", contract[:-4] + ".bak")
-    )
-
     replace_parameter(contract, "uint256 private constant BLOCK_INTERVAL", f"{block_interval}")
     replace_parameter(contract, "uint256 private constant INIT_VOTING_DELAY", f"{init_voting_delay}")
     replace_parameter(contract, "uint256 private constant INIT_VOTING_PERIOD", f"{init_voting_period}")
@@ -149,60 +154,224 @@ def generate_governor(
 
 def generate_timelock(init_minimal_delay):
     contract = "Timelock.sol"
-    backup_file(
-        os.path.join(work_dir, "contracts", contract), os.path.join(work_dir, "contracts", contract[:-4] + ".bak")
-    )
-
     replace_parameter(contract, "uint256 private constant INIT_MINIMAL_DELAY", f"{init_minimal_delay}")
 
 
 def generate_system():
     contract = "System.sol"
-    backup_file(
-        os.path.join(work_dir, "contracts", contract), os.path.join(work_dir, "contracts", contract[:-4] + ".bak")
-    )
-
     replace_parameter(contract, "uint16 public constant chainID", f"0x{hex_chain_id}")
 
 
 def generate_system_reward():
     if network == "dev":
         contract = "SystemReward.sol"
-        backup_file(
-            os.path.join(work_dir, "contracts", contract), os.path.join(work_dir, "contracts", contract[:-4] + ".bak")
-        )
-
         insert(contract, "numOperator = 2;", "\t\toperators[VALIDATOR_CONTRACT_ADDR] = true;")
         insert(contract, "numOperator = 2;", "\t\toperators[SLASH_CONTRACT_ADDR] = true;")
         replace(contract, "numOperator = 2;", "numOperator = 4;")
 
+
 def generate_validator_set(init_validator_set_bytes, init_burn_ratio):
     contract = "ValidatorSet.sol"
-    backup_file(
-        os.path.join(work_dir, "contracts", contract), os.path.join(work_dir, "contracts", contract[:-4] + ".bak")
-    )
-
     replace_parameter(contract, "uint256 public constant INIT_BURN_RATIO", f"{init_burn_ratio}")
     replace_parameter(contract, "bytes public constant INIT_VALIDATORSET_BYTES", f"hex\"{init_validator_set_bytes}\"")
 
 
-def generate_gov_hub():
-    contract = "GovHub.sol"
-    backup_file(
-        os.path.join(work_dir, "contracts", contract), os.path.join(work_dir, "contracts", contract[:-4] + ".bak")
+def run_subprocess(name, args, **kwargs):
+    return profiler.run(name, args, **kwargs)
+
+
+def load_init_holders():
+    try:
+        result = run_subprocess(
+            "node init_holders.js",
+            ["node", "-e", "console.log(JSON.stringify(require(\'./scripts/init_holders.js\')));"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=work_dir
+        )
+        init_holders = json.loads(result.stdout.strip().splitlines()[-1])
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"Error loading init holders: {e}")
+
+    return [(h["address"], int(h["balance"], 16)) for h in init_holders]
+
+
+def load_init_validator_set_bytes(validators_file, no_node):
+    file_path = os.path.join(work_dir, validators_file)
+    if os.path.exists(file_path) or no_node:
+        return validator_set.encode_package(validator_set.read_validators(file_path)).hex()
+
+    # no validators config, evaluate the hand edited scripts/validators.js
+    try:
+        result = run_subprocess(
+            "node validators.js",
+            [
+                "node", "-e",
+                "const exportsObj = require(\'./scripts/validators.js\'); console.log(exportsObj.validatorSetBytes.toString(\'hex\'));"
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=work_dir
+        )
+        return result.stdout.strip().splitlines()[-1][2:]
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"Error getting init_validatorset_bytes: {e}")
+
+
+def overlay_root():
+    return overlay_dir or os.path.join(work_dir, "cache", "overlay", network)
+
+
+def build_system_bytecodes(cache):
+    # the patched sources are compiled in an overlay of the project, the working tree is left untouched
+    with profiler.stage("patch sources"):
+        root = sources.materialize(overlay_root())
+    with profiler.stage("hash sources"):
+        settings = build_cache.compiler_settings(root)
+        remappings = build_cache.load_remappings(root)
+        source_keys = {
+            key: build_cache.source_key(
+                root, os.path.join(root, "contracts", f"{contract}.sol"), settings, remappings=remappings
+            )
+            for key, contract in genesis.SYSTEM_CONTRACTS.items()
+        }
+
+    if cache is not None:
+        bytecodes = {}
+        for key, source_key in source_keys.items():
+            cached = cache.get("bytecode", source_key)
+            if cached is None:
+                break
+            bytecodes[key] = cached.decode()
+        else:
+            print("System contracts are unchanged, skip forge build")
+            return bytecodes, source_keys
+
+    run_subprocess("forge build", ["forge", "build"], cwd=root, check=True)
+    with profiler.stage("read artifacts"):
+        bytecodes = genesis.read_system_bytecodes(root)
+
+    if cache is not None:
+        for key, source_key in source_keys.items():
+            cache.put("bytecode", source_key, bytecodes[key].encode())
+
+    return bytecodes, source_keys
+
+
+def genesis_extra_data(init_validator_set_bytes):
+    validators = validator_set.decode_package(bytes.fromhex(init_validator_set_bytes))
+    return "0x" + validator_set.encode_extra_data([v.consensus_addr for v in validators]).hex()
+
+
+# the init holders and their digest, None when they can not be hashed upfront
+def load_holders(no_node, init_holders_file):
+    if init_holders_file:
+        # streamed straight into the genesis, stdin can not be hashed upfront and is never cached
+        holders_path = init_holders_file if init_holders_file == "-" else os.path.join(work_dir, init_holders_file)
+        holders = holders_io.read_holders(holders_path)
+        return holders, None if holders_path == "-" else holders_io.file_digest(holders_path)
+
+    if no_node:
+        holders = genesis.load_init_holders(os.path.join(work_dir, "scripts", "init_holders.js"))
+    else:
+        holders = load_init_holders()
+    return holders, build_cache.hash_items(*[f"{address}:{balance}" for address, balance in holders])
+
+
+def genesis_key(source_keys, extra_data, holders_digest, storage=None):
+    with open(os.path.join(work_dir, genesis.TEMPLATE), "rb") as f:
+        template = f.read()
+
+    items = [template, str(chain_id), extra_data, holders_digest]
+    items += [source_keys[key] for key in sorted(source_keys)]
+    if storage:
+        items.append(genesis_state.dump_storage(storage))
+    return build_cache.hash_items(*items)
+
+
+# the storage left by the init calls of the first block, run by test/GenesisInit.t.sol on the system contracts
+def precompute_init_storage(codes, cache):
+    with open(os.path.join(work_dir, genesis_state.INIT_TEST), "rb") as f:
+        key = genesis_state.storage_key(codes, genesis_state.INIT_BLOCK, f.read().decode())
+    if cache is not None:
+        cached = cache.get("init-storage", key)
+        if cached is not None:
+            print("System contracts are unchanged, reuse the precomputed init storage")
+            return json.loads(cached)
+
+    # the test is compiled along with the contracts in the overlay, forge can only write into out/
+    root = overlay_root()
+    init_dir = os.path.join(root, "out", "genesis-init")
+    os.makedirs(init_dir, exist_ok=True)
+    input_path = os.path.join(init_dir, "input.json")
+    output_path = os.path.join(init_dir, "storage.txt")
+    genesis_state.write_input(input_path, codes, genesis_state.INIT_BLOCK)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    result = run_subprocess(
+        "forge test",
+        ["forge", "test", "--match-contract", genesis_state.INIT_CONTRACT],
+        capture_output=True,
+        text=True,
+        cwd=root,
+        env=dict(os.environ, GENESIS_INIT_INPUT=input_path, GENESIS_INIT_OUTPUT=output_path),
     )
+    if result.returncode != 0 or not os.path.exists(output_path):
+        raise Exception(f"Error running the init calls: {result.stdout}{result.stderr}")
+    storage = genesis_state.read_storage(output_path)
 
+    if cache is not None:
+        cache.put("init-storage", key, genesis_state.dump_storage(storage))
+    return storage
 
 
-def generate_genesis(output="./genesis.json"):
-    subprocess.run(["forge", "build"], cwd=work_dir, check=True)
-    subprocess.run(["node", "scripts/generate-genesis.js", "--chainId", f"{chain_id}", "--output", f"{output}"], cwd=work_dir, check=True)
+def generate_genesis(
+    init_validator_set_bytes, output="./genesis.json", no_node=False, no_cache=False, init_holders_file=None,
+    precompute_init=False
+):
+    cache = None if no_cache else build_cache.BuildCache(cache_dir)
+    if precompute_init and "test" not in sources.mirror:
+        sources.mirror += ("test",)
+    bytecodes, source_keys = build_system_bytecodes(cache)
+
+    extra_data = genesis_extra_data(init_validator_set_bytes)
+    storage = None
+    if precompute_init:
+        with profiler.stage("precompute init storage"):
+            codes = genesis_state.system_codes(genesis.render(work_dir, chain_id, extra_data, bytecodes))
+            storage = precompute_init_storage(codes, cache)
+        print(f"Precompute {sum(len(slots) for slots in storage.values())} storage slots of the init calls")
+    with profiler.stage("load holders"):
+        holders, holders_digest = load_holders(no_node, init_holders_file)
+
+    output_path = os.path.join(work_dir, output)
+    if cache is not None and holders_digest is not None:
+        key = genesis_key(source_keys, extra_data, holders_digest, storage)
+        if cache.get_file("genesis", key, output_path):
+            print("Genesis inputs are unchanged, reuse the cached genesis")
+            return
+    else:
+        key = None
 
+    with profiler.stage("assemble genesis"):
+        unique_holders = genesis.assemble(work_dir, chain_id, extra_data, holders, output, bytecodes, storage=storage)
+    if unique_holders.skipped:
+        skipped = ", ".join(unique_holders.skipped[:10])
+        print(f"Skip {len(unique_holders.skipped)} init holders reserved by the genesis: {skipped}")
+    print(f"Allocate {unique_holders.count} init holders")
 
-@main.command(help="Generate contracts for H2 mainnet")
-def mainnet():
-    global network, chain_id, hex_chain_id
+    if cache is not None and key is not None:
+        cache.put_file("genesis", key, output_path)
+
+
+# register the mainnet parameters, returns the init validator set bytes
+def configure_mainnet():
+    global network, chain_id, hex_chain_id, sources
     network = "mainnet"
+    sources = SourceOverlay(work_dir)
     chain_id = 2582
     hex_chain_id = convert_chain_id(chain_id)
 
@@ -234,7 +403,6 @@ def mainnet():
 
     generate_system()
     generate_system_reward()
-    generate_gov_hub()
     generate_slash_indicator(misdemeanor_threshold, felony_threshold, init_felony_slash_scope)
     generate_validator_set(init_validator_set_bytes, init_burn_ratio)
     generate_stake_hub(
@@ -247,14 +415,35 @@ def mainnet():
     )
     generate_timelock(init_minimal_delay)
 
-    generate_genesis()
+    return init_validator_set_bytes
+
+
+@main.command(help="Generate contracts for H2 mainnet")
+def mainnet(
+    no_node: Annotated[bool, typer.Option("--no-node", help="Assemble the genesis without Node.js")] = False,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Always run forge build and render the genesis")] = False,
+    init_holders_file: Annotated[
+        str, typer.Option(help="`address[,balance]` or JSON lines of the init holders, `-` for stdin")
+    ] = None,
+    precompute_init: Annotated[
+        bool, typer.Option("--precompute-init", help=PRECOMPUTE_INIT_HELP)
+    ] = False,
+):
+    with profiler.stage("configure"):
+        init_validator_set_bytes = configure_mainnet()
+
+    generate_genesis(
+        init_validator_set_bytes, no_node=no_node, no_cache=no_cache, init_holders_file=init_holders_file,
+        precompute_init=precompute_init
+    )
     print("Generate genesis of mainnet successfully")
 
 
-@main.command(help="Generate contracts for H2 testnet")
-def testnet():
-    global network, chain_id, hex_chain_id
+# register the testnet parameters, returns the init validator set bytes
+def configure_testnet():
+    global network, chain_id, hex_chain_id, sources
     network = "testnet"
+    sources = SourceOverlay(work_dir)
     chain_id = 25821
     hex_chain_id = convert_chain_id(chain_id)
 
@@ -284,7 +473,6 @@ def testnet():
 
     generate_system()
     generate_system_reward()
-    generate_gov_hub()
     generate_slash_indicator(misdemeanor_threshold, felony_threshold, init_felony_slash_scope)
     generate_validator_set(init_validator_set_bytes, init_burn_ratio)
     generate_stake_hub(
@@ -297,7 +485,27 @@ def testnet():
     )
     generate_timelock(init_minimal_delay)
 
-    generate_genesis()
+    return init_validator_set_bytes
+
+
+@main.command(help="Generate contracts for H2 testnet")
+def testnet(
+    no_node: Annotated[bool, typer.Option("--no-node", help="Assemble the genesis without Node.js")] = False,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Always run forge build and render the genesis")] = False,
+    init_holders_file: Annotated[
+        str, typer.Option(help="`address[,balance]` or JSON lines of the init holders, `-` for stdin")
+    ] = None,
+    precompute_init: Annotated[
+        bool, typer.Option("--precompute-init", help=PRECOMPUTE_INIT_HELP)
+    ] = False,
+):
+    with profiler.stage("configure"):
+        init_validator_set_bytes = configure_testnet()
+
+    generate_genesis(
+        init_validator_set_bytes, no_node=no_node, no_cache=no_cache, init_holders_file=init_holders_file,
+        precompute_init=precompute_init
+    )
     print("Generate genesis of testnet successfully")
 
 
@@ -329,47 +537,541 @@ def dev(
     init_min_period_after_quorum: Annotated[
         str, typer.Option(help="INIT_MIN_PERIOD_AFTER_QUORUM of Governor")] = "uint64(1 days / BLOCK_INTERVAL)",
     init_minimal_delay: Annotated[str, typer.Option(help="INIT_MINIMAL_DELAY of Timelock")] = "24 hours",
+    validators_file: Annotated[
+        str, typer.Option(help="validators config of the init validator set")] = "./validators.conf",
+    output: Annotated[str, typer.Option(help="output genesis file")] = "./genesis-dev.json",
+    no_node: Annotated[bool, typer.Option("--no-node", help="Assemble the genesis without Node.js")] = False,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Always run forge build and render the genesis")] = False,
+    init_holders_file: Annotated[
+        str, typer.Option(help="`address[,balance]` or JSON lines of the init holders, `-` for stdin")
+    ] = None,
+    precompute_init: Annotated[
+        bool, typer.Option("--precompute-init", help=PRECOMPUTE_INIT_HELP)
+    ] = False,
 ):
-    global network, chain_id, hex_chain_id
+    global network, chain_id, hex_chain_id, sources
     network = "dev"
+    sources = SourceOverlay(work_dir, mirror=overlay_mirror)
     chain_id = dev_chain_id
     hex_chain_id = convert_chain_id(chain_id)
 
-    try:
-        result = subprocess.run(
-            [
-                "node", "-e",
-                "const exportsObj = require(\'./scripts/validators.js\'); console.log(exportsObj.validatorSetBytes.toString(\'hex\'));"
-            ],
-            capture_output=True,
-            text=True,
-            check=True,
-            cwd=work_dir
+    with profiler.stage("configure"):
+        init_validator_set_bytes = load_init_validator_set_bytes(validators_file, no_node)
+
+        generate_system()
+        generate_system_reward()
+        generate_slash_indicator(misdemeanor_threshold, felony_threshold, init_felony_slash_scope)
+        generate_validator_set(init_validator_set_bytes, init_burn_ratio)
+        generate_stake_hub(
+            breathe_block_interval, max_elected_validators, unbond_period, downtime_jail_time, felony_jail_time,
+            stake_hub_protector
         )
-        init_validator_set_bytes = result.stdout.strip()[2:]
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"Error getting init_validatorset_bytes: {e}")
+        generate_governor(
+            block_interval, init_voting_delay, init_voting_period, init_proposal_threshold, init_quorum_numerator,
+            propose_start_threshold, init_min_period_after_quorum, governor_protector
+        )
+        generate_timelock(init_minimal_delay)
 
-    generate_system()
-    generate_system_reward()
-    generate_gov_hub()
-    generate_slash_indicator(misdemeanor_threshold, felony_threshold, init_felony_slash_scope)
-    generate_validator_set(init_validator_set_bytes, init_burn_ratio)
-    generate_stake_hub(
-        breathe_block_interval, max_elected_validators, unbond_period, downtime_jail_time, felony_jail_time,
-        stake_hub_protector
+    generate_genesis(init_validator_set_bytes, output, no_node, no_cache, init_holders_file, precompute_init)
+    print("Generate genesis of dev environment successfully")
+
+
+def run_matrix_set(name, params, output):
+    global overlay_dir
+    overlay_dir = os.path.join(work_dir, "cache", "overlay", f"matrix-{name}")
+    dev(**params, output=output)
+
+
+@main.command(help="Generate dev genesis files for every parameter set of a YAML/TOML matrix")
+def matrix(
+    matrix_file: Annotated[str, typer.Argument(help="YAML/TOML file with optional `defaults` and a list of `sets`")],
+    output_dir: Annotated[str, typer.Option(help="directory of the generated genesis files")] = "./genesis-matrix",
+    jobs: Annotated[int, typer.Option(help="number of parallel generations")] = os.cpu_count() or 1,
+):
+    import inspect
+    from concurrent.futures import ProcessPoolExecutor
+
+    parameter_sets = parameter_matrix.load_parameter_sets(os.path.join(work_dir, matrix_file))
+    dev_parameters = set(inspect.signature(dev).parameters) - {"output"}
+    for name, params in parameter_sets:
+        unknown = set(params) - dev_parameters
+        if unknown:
+            raise Exception(f"Unknown parameters of set {name}: {', '.join(sorted(unknown))}")
+
+    output_dir = os.path.join(work_dir, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for name, params in parameter_sets:
+            output = os.path.join(output_dir, f"genesis-{name}.json")
+            futures[name] = executor.submit(run_matrix_set, name, params, output)
+
+        for name, future in futures.items():
+            try:
+                future.result()
+                print(f"Generate genesis of {name} successfully")
+            except Exception as e:
+                print(f"Generate genesis of {name} failed: {e}")
+                failed.append(name)
+
+    if failed:
+        raise Exception(f"Failed parameter sets: {', '.join(failed)}")
+    print(f"Generate {len(parameter_sets)} genesis files into {output_dir} successfully")
+
+
+def run_gas_bench(number, bench_dir):
+    global overlay_dir, overlay_mirror
+    overlay_dir = os.path.join(work_dir, "cache", "overlay", f"bench-{number}")
+    overlay_mirror = ("test",)
+
+    # a dev genesis with `number` init validators, its contracts are compiled along with the tests in the overlay
+    validators_file = os.path.join(bench_dir, f"validators-{number}.conf")
+    validator_set.write_validators(validators_file, bench.bench_validators(number), "csv")
+    dev(
+        dev_chain_id=bench.BENCH_CHAIN_ID, validators_file=validators_file,
+        output=os.path.join(bench_dir, f"genesis-{number}.json"), no_node=True
     )
-    generate_governor(
-        block_interval, init_voting_delay, init_voting_period, init_proposal_threshold, init_quorum_numerator,
-        propose_start_threshold, init_min_period_after_quorum, governor_protector
+
+    result = run_subprocess(
+        "forge test",
+        ["forge", "test", "--match-contract", bench.BENCH_CONTRACT, "--chain-id", str(bench.BENCH_CHAIN_ID), "--json"],
+        capture_output=True,
+        text=True,
+        cwd=overlay_dir,
+        env=dict(os.environ, GAS_BENCH_VALIDATORS=str(number)),
     )
-    generate_timelock(init_minimal_delay)
+    if not result.stdout.strip():
+        raise Exception(f"Error running the gas bench: {result.stderr}")
+    return bench.parse_forge_results(result.stdout)
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=work_dir)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@main.command(help="Benchmark the gas of the hot paths of the system contracts for growing validator sets")
+def gas_bench(
+    config_file: Annotated[
+        str, typer.Option(help="validator counts and growth bounds of the entry points")] = "./test/gas-bench.toml",
+    history_file: Annotated[str, typer.Option(help="JSON lines history of the results")] = "./cache/gas-history.jsonl",
+    counts: Annotated[str, typer.Option(help="comma separated validator counts, overrides the config")] = None,
+    jobs: Annotated[int, typer.Option(help="number of parallel benchmarks")] = os.cpu_count() or 1,
+    no_record: Annotated[bool, typer.Option("--no-record", help="do not append the results to the history")] = False,
+    record_baseline: Annotated[
+        bool, typer.Option("--record-baseline", help="write the results as the baseline instead of checking them")
+    ] = False,
+):
+    from concurrent.futures import ProcessPoolExecutor
+
+    config_path = os.path.join(work_dir, config_file)
+    config_counts, bounds, max_increase, baseline_path, margin = bench.load_config(config_path)
+    counts = sorted({int(n) for n in counts.split(",")}) if counts else config_counts
+    if len(counts) < 2:
+        raise Exception("The gas bench needs at least 2 validator counts")
+
+    bench_dir = os.path.join(work_dir, "cache", "bench")
+    os.makedirs(bench_dir, exist_ok=True)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {number: executor.submit(run_gas_bench, number, bench_dir) for number in counts}
+        for number, future in futures.items():
+            results[number] = future.result()
+
+    gas = bench.collect(results)
+    exponents = {entry: bench.growth_exponent(list(by_count.items())) for entry, by_count in gas.items()}
+    for entry, by_count in gas.items():
+        print(f"{entry}: {', '.join(f'{n}: {used}' for n, used in by_count.items())}, N^{exponents[entry]:.2f}")
+
+    history_path = os.path.join(work_dir, history_file)
+    if record_baseline:
+        path = baseline_path or os.path.join(os.path.dirname(config_path), "gas-baseline.json")
+        bench.write_baseline(path, gas, exponents, git_commit())
+        print(f"Record the gas bench baseline of {len(gas)} entry points into {path}")
+        if baseline_path is None:
+            print(f"Set `baseline = \"{os.path.basename(path)}\"` in {config_file} to check the runs against it")
+        return
+
+    # a baseline set in the config bounds the entry points it has and is the reference of the max increase,
+    # without one the static bounds apply and the reference is the previous run of the local history
+    if baseline_path:
+        baseline = bench.load_baseline(baseline_path)
+        bounds = dict(bounds, **bench.baseline_bounds(baseline, margin))
+        reference = baseline
+    else:
+        reference = bench.last_entry(history_path)
+    violations = bench.check(gas, exponents, bounds, max_increase, reference)
+    if not no_record:
+        bench.append_entry(history_path, gas, exponents, git_commit())
+
+    if violations:
+        raise Exception("Gas bench out of bounds:\n" + "\n".join(violations))
+    print(f"Gas bench of {len(gas)} entry points within bounds")
+
+
+def run_simulation(params, validators, delegators, epochs, seed):
+    from scripts import simulator
+
+    return simulator.run_simulation(simulator.simulation_params(params), validators, delegators, epochs, seed)
+
+
+@main.command(help="Simulate the elections, rewards and slashes of StakeHub/ValidatorSet for parameter sets")
+def simulate(
+    matrix_file: Annotated[
+        str, typer.Argument(help="YAML/TOML file of parameter sets like `matrix`, the `dev` options by default")
+    ] = None,
+    max_elected_validators: Annotated[str, typer.Option(help="maxElectedValidators of StakeHub")] = "45",
+    felony_jail_time: Annotated[str, typer.Option(help="felonyJailTime of StakeHub")] = "30 days",
+    init_burn_ratio: Annotated[str, typer.Option(help="init burn ratio of validatorSet")] = "1000",
+    validators: Annotated[int, typer.Option(help="number of validators")] = 10_000,
+    delegators: Annotated[int, typer.Option(help="number of delegators")] = 1_000_000,
+    epochs: Annotated[int, typer.Option(help="number of breathe blocks")] = 1_000,
+    seed: Annotated[int, typer.Option(help="seed of the population and the felonies")] = 0,
+    jobs: Annotated[int, typer.Option(help="number of parallel simulations")] = os.cpu_count() or 1,
+    output: Annotated[str, typer.Option(help="write the summaries as JSON into this file")] = None,
+):
+    from concurrent.futures import ProcessPoolExecutor
+
+    defaults = {
+        "max_elected_validators": max_elected_validators,
+        "felony_jail_time": felony_jail_time,
+        "init_burn_ratio": init_burn_ratio,
+    }
+    if matrix_file:
+        parameter_sets = [
+            (name, dict(defaults, **params))
+            for name, params in parameter_matrix.load_parameter_sets(os.path.join(work_dir, matrix_file))
+        ]
+    else:
+        parameter_sets = [("default", defaults)]
+
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            name: executor.submit(run_simulation, params, validators, delegators, epochs, seed)
+            for name, params in parameter_sets
+        }
+        for name, future in futures.items():
+            summaries[name] = future.result()
+
+    print(f"{'set':<24} {'felonies':>9} {'jailed':>8} {'burned':>14} {'top share':>10} {'return p5/p50/p95':>26}")
+    for name, summary in summaries.items():
+        returns = "/".join(f"{summary[f'delegator_return_p{p}'] * 100:.2f}%" for p in (5, 50, 95))
+        print(
+            f"{name:<24} {summary['felonies']:>9} {summary['mean_jailed']:>8.1f} "
+            f"{summary['burned'] / 10 ** 18:>14.1f} {summary['mean_elected_stake_share']:>10.3f} {returns:>26}"
+        )
+    if output:
+        with open(os.path.join(work_dir, output), "w") as f:
+            json.dump(summaries, f, indent=2)
+
+
+def run_slashing_trials(params, trials, days, seed):
+    from scripts import slashing
+
+    return slashing.run_trials(params, trials, days, seed)
+
+
+@main.command(help="Estimate the jail probabilities and lost rewards of SlashIndicator thresholds by Monte Carlo")
+def simulate_slashing(
+    matrix_file: Annotated[
+        str, typer.Argument(help="YAML/TOML file of threshold and downtime sets like `matrix`")
+    ] = None,
+    misdemeanor_threshold: str = "50",
+    felony_threshold: str = "150",
+    max_elected_validators: Annotated[str, typer.Option(help="maxElectedValidators of StakeHub")] = "45",
+    block_interval: Annotated[str, typer.Option(help="block interval of Parlia")] = "3 seconds",
+    breathe_block_interval: Annotated[str, typer.Option(help="breath block interval of Parlia")] = "1 days",
+    downtime_jail_time: Annotated[str, typer.Option(help="downtimeJailTime of StakeHub")] = "2 days",
+    outages_per_day: Annotated[str, typer.Option(help="mean outages of a validator per day")] = "0.5",
+    outage_minutes: Annotated[str, typer.Option(help="mean duration of an outage")] = "10",
+    outage_distribution: Annotated[str, typer.Option(help="exponential, lognormal or fixed durations")] = "exponential",
+    trials: Annotated[int, typer.Option(help="number of trials of every set")] = 1_000,
+    days: Annotated[int, typer.Option(help="number of breathe blocks of a trial")] = 30,
+    batch_size: Annotated[int, typer.Option(help="trials simulated together by a job")] = 100,
+    seed: Annotated[int, typer.Option(help="seed of the downtimes")] = 0,
+    jobs: Annotated[int, typer.Option(help="number of parallel jobs")] = os.cpu_count() or 1,
+    output: Annotated[str, typer.Option(help="write the summaries as JSON into this file")] = None,
+):
+    from concurrent.futures import ProcessPoolExecutor
+
+    from scripts import slashing
+
+    defaults = {
+        "misdemeanor_threshold": misdemeanor_threshold,
+        "felony_threshold": felony_threshold,
+        "max_elected_validators": max_elected_validators,
+        "block_interval": block_interval,
+        "breathe_block_interval": breathe_block_interval,
+        "downtime_jail_time": downtime_jail_time,
+        "outages_per_day": outages_per_day,
+        "outage_minutes": outage_minutes,
+        "outage_distribution": outage_distribution,
+    }
+    if matrix_file:
+        parameter_sets = [
+            (name, slashing.slashing_params(dict(defaults, **params)))
+            for name, params in parameter_matrix.load_parameter_sets(os.path.join(work_dir, matrix_file))
+        ]
+    else:
+        parameter_sets = [("default", slashing.slashing_params(defaults))]
+
+    # every set runs the same batches of seeds, so the sets are compared on the same downtimes
+    batches = slashing.batch_seeds(seed, trials, batch_size)
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            name: [executor.submit(run_slashing_trials, params, size, days, batch_seed) for size, batch_seed in batches]
+            for name, params in parameter_sets
+        }
+        for name, params in parameter_sets:
+            summaries[name] = slashing.summarize(params, days, [future.result() for future in futures[name]])
+
+    print(f"{'set':<24} {'misdemeanor':>12} {'jail':>8} {'jailed share':>13} {'lost reward':>12} {'lost %':>8}")
+    for name, summary in summaries.items():
+        print(
+            f"{name:<24} {summary['misdemeanor_probability']:>12.4f} {summary['jail_probability']:>8.4f} "
+            f"{summary['jailed_share']:>13.4f} {summary['lost_reward_per_validator'] / 10 ** 18:>12.4f} "
+            f"{summary['lost_reward_ratio'] * 100:>8.3f}"
+        )
+    if output:
+        with open(os.path.join(work_dir, output), "w") as f:
+            json.dump(summaries, f, indent=2)
 
-    generate_genesis("./genesis-dev.json")
-    print("Generate genesis of dev environment successfully")
 
+@main.command(help="Write the cases checking the simulator against the contracts in test/Simulator.t.sol")
+def simulator_fixtures(
+    output: Annotated[str, typer.Option(help="fixtures read by the forge test")] = "./test/simulator-fixtures.json",
+    seed: Annotated[int, typer.Option(help="seed of the cases")] = 0,
+    cases: Annotated[int, typer.Option(help="number of cases of each kind")] = 8,
+):
+    from scripts import simulator
+
+    with open(os.path.join(work_dir, output), "w") as f:
+        json.dump(simulator.fixtures(seed, cases), f, indent=2)
+        f.write("\n")
+    print(f"Write the simulator fixtures into {output}, check them with `forge test --match-contract SimulatorTest`")
+
+
+@main.command(help="Measure the startup time of a no-op command and fail above a budget")
+def startup_bench(
+    budget_ms: Annotated[float, typer.Option(help="max median startup time in milliseconds")] = 300,
+    runs: Annotated[int, typer.Option(help="number of runs")] = 10,
+    command: Annotated[str, typer.Option(help="arguments of the measured command")] = "recover --help",
+):
+    fastest, median, slowest = import_profile.summary(
+        import_profile.startup_times(command.split(), runs, cwd=work_dir)
+    )
+    print(f"Startup of `{command}`: min {fastest * 1000:.0f}ms, median {median * 1000:.0f}ms, max {slowest * 1000:.0f}ms")
 
-@main.command(help="Recover from the backup")
+    if median * 1000 > budget_ms:
+        raise Exception(f"Startup time {median * 1000:.0f}ms exceeds the budget of {budget_ms:.0f}ms")
+
+
+@main.command(help="Aggregate the stages of several --profile files of the same command")
+def aggregate_profiles(
+    profile_files: Annotated[List[str], typer.Argument(help="profiles written by --profile")],
+    output: Annotated[str, typer.Option(help="write the aggregate as JSON into this file")] = None,
+):
+    stages = profiling.aggregate([profiling.load_stages(os.path.join(work_dir, path)) for path in profile_files])
+
+    # the RSS of the process is its high-water mark at the end of the stage, the one of a child is its own peak
+    print(
+        f"{'stage':<32} {'runs':>5} {'wall min':>9} {'median':>9} {'max':>9} {'cpu':>9} {'proc MB':>8} "
+        f"{'child MB':>8}"
+    )
+    for stage in stages:
+        rss = [stage[key] for key in ("process_max_rss_kb_max", "child_peak_rss_kb_max")]
+        print(
+            f"{stage['category'] + ' ' + stage['name']:<32} {stage['count']:>5} {stage['wall_s_min']:>9.3f} "
+            f"{stage['wall_s_median']:>9.3f} {stage['wall_s_max']:>9.3f} {stage['cpu_s_median']:>9.3f} "
+            + " ".join(f"{'-':>8}" if kb is None else f"{kb / 1024:>8.1f}" for kb in rss)
+        )
+    if output:
+        with open(os.path.join(work_dir, output), "w") as f:
+            json.dump(stages, f, indent=2)
+
+
+@main.command(help="Verify a genesis against the contracts and the parameters of mainnet or testnet")
+def verify_genesis(
+    network_name: Annotated[str, typer.Argument(help="mainnet or testnet")],
+    genesis_file: Annotated[str, typer.Option(help="genesis to verify")] = "./genesis.json",
+    no_node: Annotated[bool, typer.Option("--no-node", help="Read the init holders without Node.js")] = False,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Always run forge build")] = False,
+    init_holders_file: Annotated[
+        str, typer.Option(help="`address[,balance]` or JSON lines of the init holders, `-` for stdin")
+    ] = None,
+    report_file: Annotated[str, typer.Option(help="write the differences as JSON into this file")] = None,
+    precompute_init: Annotated[
+        bool, typer.Option("--precompute-init", help="Expect the storage of the init calls in the genesis alloc")
+    ] = False,
+):
+    configure = {"mainnet": configure_mainnet, "testnet": configure_testnet}.get(network_name)
+    if configure is None:
+        raise Exception(f"Unknown network: {network_name}")
+    init_validator_set_bytes = configure()
+
+    cache = None if no_cache else build_cache.BuildCache(cache_dir)
+    if precompute_init and "test" not in sources.mirror:
+        sources.mirror += ("test",)
+    bytecodes, _ = build_system_bytecodes(cache)
+    expected = genesis.render(work_dir, chain_id, genesis_extra_data(init_validator_set_bytes), bytecodes)
+    if precompute_init:
+        genesis_state.apply_storage(expected, precompute_init_storage(genesis_state.system_codes(expected), cache))
+    holders, _ = load_holders(no_node, init_holders_file)
+
+    diffs = verify.verify(os.path.join(work_dir, genesis_file), expected, holders)
+    failures = [diff for diff in diffs if not diff.is_warning()]
+
+    for diff in diffs:
+        print(f"{diff.kind:<10} {diff.path}: expected {diff.expected}, got {diff.actual}")
+    if report_file:
+        with open(os.path.join(work_dir, report_file), "w") as f:
+            json.dump([diff.to_json() for diff in diffs], f, indent=2)
+
+    if failures:
+        print(f"Genesis {genesis_file} does not match {network_name}, {len(failures)} differences")
+        raise typer.Exit(code=1)
+    print(f"Genesis {genesis_file} matches {network_name}")
+
+
+# the sources of the system contracts patched for mainnet/testnet in their overlay, or the working tree
+def release_root(network_name):
+    if network_name is None:
+        return work_dir
+    configure = {"mainnet": configure_mainnet, "testnet": configure_testnet}.get(network_name)
+    if configure is None:
+        raise Exception(f"Unknown network: {network_name}")
+    configure()
+    return sources.materialize(overlay_root())
+
+
+def flatten_contract(root, contract, cache):
+    from scripts import release
+
+    key = release.flatten_key(root, contract.source)
+    source = None if cache is None else cache.get("flatten", key)
+    if source is not None:
+        return source.decode(), True
+
+    result = run_subprocess(
+        f"forge flatten {contract.name}", ["forge", "flatten", contract.source], capture_output=True, text=True, cwd=root
+    )
+    if result.returncode != 0 or not result.stdout.strip():
+        raise Exception(f"Error flattening {contract.source}: {result.stderr}")
+    if cache is not None:
+        cache.put("flatten", key, result.stdout.encode())
+    return result.stdout, False
+
+
+# flatten the contracts concurrently into output_dir, returns the flattened source of every contract
+def flatten_contracts(root, contracts, cache, output_dir, jobs):
+    from concurrent.futures import ThreadPoolExecutor
+
+    os.makedirs(output_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {contract.name: executor.submit(flatten_contract, root, contract, cache) for contract in contracts}
+        results = {name: future.result() for name, future in futures.items()}
+
+    for name, (source, _) in results.items():
+        path = os.path.join(output_dir, f"{name}.sol")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                if f.read() == source:
+                    continue
+        with open(path, "w") as f:
+            f.write(source)
+
+    reused = sum(cached for _, cached in results.values())
+    print(f"Flatten {len(results)} contracts into {output_dir}, {reused} unchanged ones reused from the cache")
+    return {name: source for name, (source, _) in results.items()}
+
+
+def select_contracts(contracts, names):
+    if not names:
+        return contracts
+    names = [name.strip() for name in names.split(",")]
+    unknown = set(names) - {contract.name for contract in contracts}
+    if unknown:
+        raise Exception(f"Unknown system contracts: {', '.join(sorted(unknown))}")
+    return [contract for contract in contracts if contract.name in names]
+
+
+@main.command(help="Flatten the system contracts of the genesis concurrently, unchanged ones are reused from the cache")
+def flatten(
+    network_name: Annotated[
+        str, typer.Option("--network", help="flatten the contracts patched for mainnet or testnet")
+    ] = None,
+    output_dir: Annotated[str, typer.Option(help="directory of the flattened contracts")] = "./contracts/flattened",
+    contracts: Annotated[str, typer.Option(help="comma separated contract names, all by default")] = None,
+    jobs: Annotated[int, typer.Option(help="number of parallel forge flatten")] = os.cpu_count() or 1,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Always run forge flatten")] = False,
+):
+    from scripts import release
+
+    root = release_root(network_name)
+    cache = None if no_cache else build_cache.BuildCache(cache_dir)
+    selected = select_contracts(release.release_contracts(root, os.path.join(work_dir, genesis.TEMPLATE)), contracts)
+    flatten_contracts(root, selected, cache, os.path.join(work_dir, output_dir), jobs)
+
+
+@main.command(help="Verify the system contracts of mainnet or testnet on a block explorer")
+def verify_contracts(
+    network_name: Annotated[str, typer.Argument(help="mainnet or testnet")],
+    verifier_url: Annotated[
+        str,
+        typer.Option(
+            help="Etherscan compatible verification API, https://h2scan.io/api for mainnet by default, "
+            "required for testnet which has no known explorer"
+        ),
+    ] = None,
+    api_key: Annotated[str, typer.Option(envvar="VERIFIER_API_KEY", help="API key of the verifier")] = "empty",
+    contracts: Annotated[str, typer.Option(help="comma separated contract names, all by default")] = None,
+    jobs: Annotated[int, typer.Option(help="number of parallel verifications")] = 4,
+    retries: Annotated[int, typer.Option(help="retries of a failing verifier request")] = 5,
+    backoff: Annotated[float, typer.Option(help="first delay between retries in seconds, doubled every retry")] = 1.0,
+    poll_interval: Annotated[float, typer.Option(help="delay between checks of a pending verification")] = 3.0,
+    force: Annotated[bool, typer.Option("--force", help="Submit the contracts already verified again")] = False,
+):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from scripts import release
+
+    root = release_root(network_name)
+    verifier_url = verifier_url or release.VERIFIER_URLS.get(network_name)
+    if verifier_url is None:
+        raise Exception(f"No known verifier of {network_name}, set --verifier-url")
+    selected = select_contracts(release.release_contracts(root, os.path.join(work_dir, genesis.TEMPLATE)), contracts)
+    inputs = {contract.name: release.standard_json_input(root, contract) for contract in selected}
+
+    verifier = release.Verifier(verifier_url, api_key, chain_id, retries, backoff, poll_interval=poll_interval)
+    failed = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            (contract, executor.submit(verifier.verify, contract, inputs[contract.name], not force))
+            for contract in selected
+        ]
+        for contract, future in futures:
+            try:
+                status = future.result()
+                print(f"{contract.name} {contract.address} ({contract.compiler}): {status}")
+            except Exception as e:
+                print(f"{contract.name} {contract.address} ({contract.compiler}): failed, {e}")
+                failed.append(contract.name)
+
+    if failed:
+        print(f"Verification of {', '.join(failed)} failed")
+        raise typer.Exit(code=1)
+    print(f"Verify {len(selected)} contracts of {network_name} on {verifier_url} successfully")
+
+
+@main.command(help="Recover contracts patched in place by older versions of this script")
 def recover():
     contracts_dir = os.path.join(work_dir, "contracts")
     for file in os.listdir(contracts_dir):
@@ -400,63 +1102,304 @@ def generate_init_holders(
 def generate_validators(
     file_path: str = "./validators.conf",
     template_file: str = "./scripts/validators.template",
-    output_file: str = "./scripts/validators.js"
+    output_file: Annotated[
+        str, typer.Option(help="validators.js rendered from the template, or a .conf/.csv/.jsonl/.bin file")
+    ] = "./scripts/validators.js",
+    input_format: Annotated[
+        str, typer.Option(help="csv, jsonl or bin, detected from the file extension by default")
+    ] = None,
 ):
     file_path = os.path.join(work_dir, file_path)
-    validators = []
-
-    with open(file_path, "r") as file:
-        for line in file:
-            vs = line.strip().split(",")
-            if len(vs) != 5:
-                raise Exception(f"Invalid validator info: {line}")
-            validators.append(
-                {
-                    "consensusAddr": vs[0],
-                    "feeAddr": vs[1],
-                    "bbcFeeAddr": vs[2],
-                    "votingPower": vs[3],
-                    "bLSPublicKey": vs[4],
-                }
-            )
 
-    data = {
-        "validators": validators,
-    }
+    if output_file.endswith(".js"):
+        # validate everything once, then let the template stream the file for each of its loops
+        count = sum(1 for _ in validator_set.read_validators(file_path, input_format))
+        data = {
+            "validators": validator_set.ValidatorsView(file_path, input_format),
+        }
+        generate_from_template(data, template_file, output_file)
+    else:
+        count = validator_set.write_validators(
+            os.path.join(work_dir, output_file), validator_set.read_validators(file_path, input_format)
+        )
 
-    generate_from_template(data, template_file, output_file)
-    print("Generate validators successfully")
+    print(f"Generate {count} validators successfully")
+
+
+@main.command(help="Encode the init validator set bytes and the genesis extraData of a validators config")
+def encode_validator_set(file_path: str = "./validators.conf"):
+    validators = list(validator_set.read_validators(os.path.join(work_dir, file_path)))
+
+    print(f"init_validator_set_bytes: {validator_set.encode_package(validators).hex()}")
+    print(f"extraData: 0x{validator_set.encode_extra_data([v.consensus_addr for v in validators]).hex()}")
+
+
+@main.command(help="Decode init validator set bytes or a genesis extraData")
+def decode_validator_set(
+    data: Annotated[str, typer.Argument(help="hex encoded validator set package or extraData")],
+    extra_data: Annotated[bool, typer.Option("--extra-data", help="decode a genesis extraData")] = False,
+):
+    data = bytes.fromhex(data[2:] if data.startswith("0x") else data)
+
+    if extra_data:
+        result = ["0x" + addr.hex() for addr in validator_set.decode_extra_data(data)]
+    else:
+        result = [validator_set.to_json(v) for v in validator_set.decode_package(data)]
+    print(json.dumps(result, indent=2))
 
 
 @main.command(help="Generate errors signature")
-def generate_error_sig(dir_path: str = "./contracts"):
+def generate_error_sig(
+    dir_path: str = "./contracts",
+    index_file: Annotated[str, typer.Option(help="output selector -> error signature index")] = "./abi/errors.json",
+    full: Annotated[bool, typer.Option(help="reprocess every file instead of only the changed ones")] = False,
+):
     dir_path = os.path.join(work_dir, dir_path)
+    state_path = os.path.join(work_dir, "cache", "error-sig.json")
+
+    index, processed, written = error_sig.update(dir_path, state_path, full)
+    index.save(os.path.join(work_dir, index_file))
+
+    for file in written:
+        print(f"Update errors signature of {file}")
+    print(f"Generate errors signature successfully, {processed} files processed, {len(index.selectors)} errors indexed")
+
+
+@main.command(help="Decode the revert data of a system contract call")
+def decode_error(
+    revert_data: Annotated[str, typer.Argument(help="hex encoded revert data")],
+    index_file: Annotated[str, typer.Option(help="selector -> error signature index")] = "./abi/errors.json",
+):
+    signature, args = error_sig.ErrorIndex.load(os.path.join(work_dir, index_file)).decode(revert_data)
+    if signature is None:
+        raise Exception(f"Unknown error selector: {revert_data[:10]}")
+    print(signature if not args else f"{signature} {list(args)}")
+
+
+def read_json_items(path):
+    # a JSON array, or one JSON value per line
+    with open(path, "r") as f:
+        first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+@main.command(help="Decode system contract logs or calldata into one columnar array per event or function")
+def decode_logs(
+    input_file: Annotated[
+        str, typer.Argument(help="JSON array or JSON lines of eth_getLogs logs, or of hex calldata with --calls")
+    ],
+    output: Annotated[str, typer.Option(help="write the arrays into this .npz file, keyed by signature")] = None,
+    calls: Annotated[bool, typer.Option("--calls", help="decode calldata instead of logs")] = False,
+    abi_dir: Annotated[str, typer.Option(help="directory of the ABI files")] = "./abi",
+    batch_size: Annotated[int, typer.Option(help="logs decoded together")] = 100_000,
+    reference: Annotated[
+        bool, typer.Option("--reference", help="also time the per-log decoding of the logs for comparison")
+    ] = False,
+):
+    import time
+
+    from scripts import abi_index
+
+    index = abi_index.AbiIndex.load(os.path.join(work_dir, abi_dir), cache_dir)
+    items = read_json_items(os.path.join(work_dir, input_file))
+    if reference:
+        items = list(items)
+
+    start = time.perf_counter()
+    decode = index.decode_calls if calls else index.decode_logs
+    arrays = {}
+    unknown = 0
+    for batch in decode(items, batch_size):
+        for signature, rows in batch.items():
+            if signature is None:
+                unknown += len(rows)
+            else:
+                arrays.setdefault(signature, []).append(rows)
+    arrays = {signature: abi_index.np.concatenate(rows) for signature, rows in arrays.items()}
+    elapsed = time.perf_counter() - start
+
+    decoded = sum(len(rows) for rows in arrays.values())
+    for signature, rows in sorted(arrays.items(), key=lambda item: -len(item[1])):
+        print(f"{len(rows):>10} {signature}")
+    print(f"Decode {decoded} items in {elapsed:.3f}s ({decoded / max(elapsed, 1e-9):,.0f}/s), {unknown} unknown")
+
+    if reference and not calls:
+        start = time.perf_counter()
+        known = [log for log in items if log["topics"] and index.event(log["topics"][0])]
+        for log in known:
+            abi_index.decode_log_reference(index, log)
+        elapsed = time.perf_counter() - start
+        print(f"Per-log decoding of {len(known)} logs in {elapsed:.3f}s ({len(known) / max(elapsed, 1e-9):,.0f}/s)")
+
+    if output:
+        abi_index.np.savez(os.path.join(work_dir, output), **arrays)
+
+
+def start_anvil(genesis_file, port, *args):
+    import socket
+    import time
+
+    process = subprocess.Popen(
+        ["anvil", "--init", genesis_file, "--port", str(port), *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"Error starting anvil: {process.stderr.read().decode()}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise Exception("Timeout starting anvil")
+
+
+async def run_snapshots(url, index, output, block, follow, connections, batch_size, page_size):
+    import asyncio
+    import time
+
+    from scripts import snapshot as snapshots
+
+    client = snapshots.RpcClient(url, connections, batch_size)
+    snapshotter = snapshots.Snapshotter(client, index, page_size)
+    try:
+        last = None
+        while True:
+            number = block or await client.call("eth_blockNumber")
+            if number != last:
+                start = time.perf_counter()
+                state = await snapshotter.snapshot(number)
+                path = os.path.join(work_dir, output.format(block=state["block"]))
+                snapshots.write_snapshot(path, state)
+                print(
+                    f"Snapshot of {len(state['validators']['operator'])} validators at block {state['block']} "
+                    f"in {time.perf_counter() - start:.3f}s into {path}"
+                )
+                last = number
+            if not follow:
+                return
+            await asyncio.sleep(0.2)
+    finally:
+        client.close()
+
+
+@main.command(help="Snapshot the validators of StakeHub, ValidatorSet and SlashIndicator from a node")
+def snapshot(
+    rpc_url: Annotated[str, typer.Option(help="JSON-RPC endpoint of the node")] = "http://127.0.0.1:8545",
+    output: Annotated[
+        str, typer.Option(help="snapshot file, `{block}` is replaced by the block number, gzip with .gz")
+    ] = "./snapshot-{block}.json.gz",
+    block: Annotated[int, typer.Option(help="block of the snapshot, the latest by default")] = None,
+    follow: Annotated[bool, typer.Option("--follow", help="snapshot every new block until interrupted")] = False,
+    connections: Annotated[int, typer.Option(help="max connections to the node")] = 8,
+    batch_size: Annotated[int, typer.Option(help="calls of a JSON-RPC batch")] = 100,
+    page_size: Annotated[int, typer.Option(help="validators of a StakeHub page")] = 100,
+    anvil_genesis: Annotated[
+        str, typer.Option(help="start a local anvil from this genesis, e.g. ./genesis-dev.json, and snapshot it")
+    ] = None,
+    anvil_port: Annotated[int, typer.Option(help="port of the local anvil")] = 8546,
+    abi_dir: Annotated[str, typer.Option(help="directory of the ABI files")] = "./abi",
+):
+    import asyncio
+
+    from scripts import abi_index
+
+    index = abi_index.AbiIndex.load(os.path.join(work_dir, abi_dir), cache_dir)
+    anvil = None
+    if anvil_genesis:
+        anvil = start_anvil(os.path.join(work_dir, anvil_genesis), anvil_port)
+        rpc_url = f"http://127.0.0.1:{anvil_port}"
+    try:
+        asyncio.run(run_snapshots(
+            rpc_url, index, output, None if block is None else hex(block), follow, connections, batch_size, page_size
+        ))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if anvil:
+            anvil.terminate()
+            anvil.wait()
+
+
+# the differences of the precomputed state with the one of the init calls, before and after replaying the init calls
+# on it like an unmodified node, and the replayed calls which reverted
+async def compare_init_states(init_url, precomputed_url):
+    from scripts import snapshot as snapshots
+
+    init_client = snapshots.RpcClient(init_url)
+    precomputed_client = snapshots.RpcClient(precomputed_url)
+    try:
+        await genesis_state.run_init_calls(init_client)
+        expected = await genesis_state.account_states(init_client)
+        precomputed = await genesis_state.account_states(precomputed_client, "0x0")
+        reverted = await genesis_state.replay_init_calls(precomputed_client)
+        replayed = await genesis_state.account_states(precomputed_client)
+    finally:
+        init_client.close()
+        precomputed_client.close()
+    diffs = genesis_state.compare_states(expected, precomputed)
+    return diffs, genesis_state.compare_states(expected, replayed), reverted
+
+
+@main.command(help="Check that a genesis with precomputed init storage matches a node running the init calls")
+def verify_init_state(
+    genesis_file: Annotated[str, typer.Option(help="genesis generated with --precompute-init")] = "./genesis.json",
+    anvil_port: Annotated[int, typer.Option(help="port of the first local anvil, the second one uses the next")] = 8547,
+):
+    import asyncio
+
+    genesis_path = os.path.join(work_dir, genesis_file)
+    with open(genesis_path, "r") as f:
+        precomputed = json.load(f)
+    if not any(account.get("storage") for account in precomputed["alloc"].values()):
+        raise Exception(f"Genesis {genesis_file} has no precomputed init storage")
+
+    # the same genesis without the storage, the init calls are mined into its first block
+    init_dir = os.path.join(work_dir, "cache", "genesis-init")
+    os.makedirs(init_dir, exist_ok=True)
+    code_only_path = os.path.join(init_dir, "genesis-code-only.json")
+    genesis.write_genesis(code_only_path, genesis_state.strip_storage(precomputed))
+
+    # zero gas price system txs, not bound by the block gas limit
+    anvil_args = ("--block-base-fee-per-gas", "0", "--disable-block-gas-limit")
+    nodes = []
+    try:
+        nodes.append(start_anvil(code_only_path, anvil_port, *anvil_args))
+        nodes.append(start_anvil(genesis_path, anvil_port + 1, *anvil_args))
+        diffs, replayed_diffs, reverted = asyncio.run(
+            compare_init_states(f"http://127.0.0.1:{anvil_port}", f"http://127.0.0.1:{anvil_port + 1}")
+        )
+    finally:
+        for node in nodes:
+            node.terminate()
+            node.wait()
+
+    for diff in diffs:
+        print(f"{diff.kind:<10} {diff.path}: expected {diff.expected}, got {diff.actual}")
+    for diff in replayed_diffs:
+        print(f"{'replayed':<10} {diff.path}: expected {diff.expected}, got {diff.actual}")
+    for address, signature in reverted:
+        print(f"WARNING: the init call {address}.{signature} reverts on the precomputed genesis")
+    if reverted:
+        print(
+            f"WARNING: {len(reverted)} of the {len(genesis_state.INIT_CALLS)} init calls an unmodified node sends at "
+            f"block {genesis_state.INIT_BLOCK} revert (onlyNotInit, initializer), run this genesis only on nodes "
+            f"skipping the init calls of initialized contracts"
+        )
 
-    annotation_prefix = "    // @notice signature: "
-    error_pattern = re.compile(r"^\s{4}(error)\s([a-zA-Z]*\(.*\));\s$")
-    annotation_pattern = re.compile(r"^\s{4}(//\s@notice\ssignature:)\s.*\s$")
-    for file in os.listdir(dir_path):
-        if file.endswith(".sol"):
-            file_path = os.path.join(dir_path, file)
-            with open(file_path) as f:
-                content = f.readlines()
-            for i, line in enumerate(content):
-                if error_pattern.match(line):
-                    error_msg = line[10:-2]
-                    # remove variable names
-                    match = re.search(r"\((.*?)\)", error_msg)
-                    if match and match.group(1) != "":
-                        variables = [v.split()[0].strip() for v in match.group(1).split(",")]
-                        error_msg = re.sub(r"\((.*?)\)", f"({','.join(variables)})", error_msg)
-                    sig = Web3.keccak(text=error_msg)[:4].hex()
-                    annotation = annotation_prefix + sig + "\n"
-                    # update/insert annotation
-                    if annotation_pattern.match(content[i - 1]):
-                        content[i - 1] = annotation
-                    else:
-                        content.insert(i, annotation)
-            with open(file_path, "w") as f:
-                f.writelines(content)
+    if diffs or replayed_diffs:
+        print(f"Genesis {genesis_file} does not match the init calls, {len(diffs) + len(replayed_diffs)} differences")
+        raise typer.Exit(code=1)
+    print(f"Genesis {genesis_file} matches the state of the init calls")
 
 
 if __name__ == "__main__":
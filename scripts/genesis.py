@@ -0,0 +1,115 @@
+import json
+import os
+import re
+
+from scripts import genesis_state
+from scripts.holders import UniqueHolders
+
+# template key -> compiled contract, same as scripts/generate-genesis.js
+SYSTEM_CONTRACTS = {
+    "validatorContract": "ValidatorSet",
+    "systemRewardContract": "SystemReward",
+    "slashContract": "SlashIndicator",
+    "govHub": "GovHub",
+    "stakeHub": "StakeHub",
+    "stakeCredit": "StakeCredit",
+    "governor": "Governor",
+    "govToken": "GovToken",
+    "timelock": "Timelock",
+}
+
+TEMPLATE = "genesis-template.json"
+
+_loop_pattern = re.compile(r"\{%\s*for\s.*?%\}.*?\{%\s*endfor\s*%\}", re.S)
+_placeholder_pattern = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_holder_pattern = re.compile(
+    r"address:\s*['\"](0x[0-9a-fA-F]{40})['\"]\s*,\s*balance:\s*BigInt\(\s*['\"](\d+)['\"]\s*\)"
+)
+_alloc_marker = "__genesis_alloc__"
+
+
+# get byte code from compiled contract
+def read_bytecode(work_dir, contract):
+    artifact = os.path.join(work_dir, "out", f"{contract}.sol", f"{contract}.json")
+    try:
+        with open(artifact, "r") as f:
+            return json.load(f)["deployedBytecode"]["object"]
+    except FileNotFoundError:
+        raise Exception(f"Artifact '{artifact}' not found, run `forge build` first")
+    except (KeyError, ValueError) as e:
+        raise Exception(f"Error parsing artifact '{artifact}': {e}")
+
+
+def read_system_bytecodes(work_dir):
+    return {key: read_bytecode(work_dir, contract) for key, contract in SYSTEM_CONTRACTS.items()}
+
+
+# render the nunjucks genesis template into a dict, the init holders loop is handled by write_genesis
+def load_template(template_path, data):
+    with open(template_path, "r") as f:
+        template = f.read()
+
+    def render(match):
+        key = match.group(1)
+        if key not in data:
+            raise Exception(f"{key} not found in genesis data")
+        return str(data[key])
+
+    return json.loads(_placeholder_pattern.sub(render, _loop_pattern.sub("", template)))
+
+
+# read the holders of scripts/init_holders.js without evaluating it
+def load_init_holders(path):
+    with open(path, "r") as f:
+        content = f.read()
+
+    return [(address, int(balance)) for address, balance in _holder_pattern.findall(content)]
+
+
+def _indent(text, prefix):
+    return text.replace("\n", "\n" + prefix)
+
+
+# write the genesis with the alloc section streamed entry by entry, holders are `(address, balance)` of any iterable,
+# the output is only moved in place once every holder is written
+def write_genesis(output_path, genesis, holders=()):
+    head, tail = json.dumps(dict(genesis, alloc=_alloc_marker), indent=2).split(json.dumps(_alloc_marker), 1)
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", buffering=1 << 20) as f:
+            f.write(head)
+            f.write("{")
+            sep = "\n"
+            for address, account in genesis["alloc"].items():
+                f.write(f"{sep}    {json.dumps(address)}: {_indent(json.dumps(account, indent=2), '    ')}")
+                sep = ",\n"
+            for address, balance in holders:
+                f.write(f'{sep}    "{address}": {{\n      "balance": "{hex(balance)}"\n    }}')
+                sep = ",\n"
+            f.write("\n  }")
+            f.write(tail)
+            f.write("\n")
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# the genesis dict without the init holders
+def render(work_dir, chain_id, extra, bytecodes=None, template=TEMPLATE):
+    data = dict(bytecodes or read_system_bytecodes(work_dir))
+    data["chainId"] = chain_id
+    data["extraData"] = extra
+
+    return load_template(os.path.join(work_dir, template), data)
+
+
+# storage is the precomputed init storage of the system contracts, by address
+def assemble(work_dir, chain_id, extra, holders, output, bytecodes=None, template=TEMPLATE, storage=None):
+    genesis = render(work_dir, chain_id, extra, bytecodes, template)
+    if storage:
+        genesis_state.apply_storage(genesis, storage)
+    holders = UniqueHolders(holders, reserved=genesis["alloc"])
+    write_genesis(os.path.join(work_dir, output), genesis, holders)
+    return holders
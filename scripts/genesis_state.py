@@ -0,0 +1,154 @@
+import json
+import os
+
+from scripts import build_cache
+from scripts.verify import Diff
+
+INIT_CONTRACT = "GenesisInitTest"
+INIT_TEST = os.path.join("test", "GenesisInit.t.sol")
+
+SYSTEM_ADDRESSES = tuple(f"0x{n:040x}" for n in range(0x1000, 0x1009))
+# the init calls run in the first block, by its block producer, nothing of it is stored
+INIT_BLOCK = 1
+INIT_COINBASE = "0x00000000000000000000000000000000000000c0"
+# gas of the system txs of the node, they are not bound by the block gas limit
+SYSTEM_TX_GAS = (2 ** 64 - 1) // 2
+# the system txs of the first block, in the order of test/GenesisInit.t.sol
+INIT_CALLS = (
+    ("0x0000000000000000000000000000000000001000", "init()"),
+    ("0x0000000000000000000000000000000000001001", "init()"),
+    ("0x0000000000000000000000000000000000001004", "initialize()"),
+    ("0x0000000000000000000000000000000000001006", "initialize()"),
+    ("0x0000000000000000000000000000000000001007", "initialize()"),
+    ("0x0000000000000000000000000000000000001008", "initialize()"),
+)
+
+
+def _address_key(address):
+    address = address.lower()
+    return address if address.startswith("0x") else "0x" + address
+
+
+# the system contracts of a rendered genesis, by address
+def system_codes(genesis):
+    codes = {}
+    for address, account in genesis["alloc"].items():
+        if _address_key(address) in SYSTEM_ADDRESSES and account.get("code"):
+            codes[_address_key(address)] = account["code"]
+    return codes
+
+
+def storage_key(codes, block, test_source):
+    items = [str(block), test_source]
+    for address in sorted(codes):
+        items += [address, codes[address]]
+    return build_cache.hash_items(*items)
+
+
+def write_input(path, codes, block):
+    with open(path, "w") as f:
+        json.dump(
+            {"addresses": list(codes), "codes": list(codes.values()), "coinbase": INIT_COINBASE, "block": block}, f
+        )
+
+
+# `<address> <slot> <value>` lines of the forge test, slots written several times or back to zero are merged
+def read_storage(path):
+    storage = {}
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            address, slot, value = line.split()
+            storage.setdefault(_address_key(address), {})[f"0x{int(slot, 16):064x}"] = int(value, 16)
+
+    storage = {
+        address: {slot: f"0x{value:064x}" for slot, value in sorted(slots.items()) if value}
+        for address, slots in sorted(storage.items())
+    }
+    return {address: slots for address, slots in storage.items() if slots}
+
+
+def dump_storage(storage):
+    return json.dumps(storage, sort_keys=True).encode()
+
+
+# the precomputed storage into the `storage` of the alloc entries
+def apply_storage(genesis, storage):
+    for address, account in genesis["alloc"].items():
+        slots = storage.get(_address_key(address))
+        if slots:
+            account["storage"] = slots
+    return genesis
+
+
+# the genesis without the precomputed storage of the system contracts, the node runs the init calls itself
+def strip_storage(genesis):
+    for address, account in genesis["alloc"].items():
+        if _address_key(address) in SYSTEM_ADDRESSES:
+            account.pop("storage", None)
+    return genesis
+
+
+# mine the init calls into the first block of an anvil like the block producer, returns their receipts
+async def _mine_init_calls(client):
+    from eth_hash.auto import keccak
+
+    await client.batch([
+        ("anvil_setCoinbase", [INIT_COINBASE]),
+        ("anvil_impersonateAccount", [INIT_COINBASE]),
+        ("evm_setAutomine", [False]),
+    ])
+
+    tx_hashes = []
+    for address, signature in INIT_CALLS:
+        data = "0x" + keccak(signature.encode())[:4].hex()
+        tx = {"from": INIT_COINBASE, "to": address, "data": data, "gas": hex(SYSTEM_TX_GAS), "gasPrice": "0x0"}
+        # one by one, so the nonces of the txs follow their order
+        tx_hashes.append(await client.call("eth_sendTransaction", tx))
+    await client.call("evm_mine")
+
+    receipts = await client.batch([("eth_getTransactionReceipt", [tx_hash]) for tx_hash in tx_hashes])
+    for (address, signature), receipt in zip(INIT_CALLS, receipts):
+        if receipt is None:
+            raise Exception(f"{address}.{signature} was not mined")
+        if int(receipt["blockNumber"], 16) != INIT_BLOCK:
+            raise Exception(f"{address}.{signature} was mined into block {int(receipt['blockNumber'], 16)}")
+    return receipts
+
+
+# the init calls on an anvil started from the code only genesis, every one must succeed
+async def run_init_calls(client):
+    for (address, signature), receipt in zip(INIT_CALLS, await _mine_init_calls(client)):
+        if int(receipt["status"], 16) != 1:
+            raise Exception(f"{address}.{signature} failed on the node")
+
+
+# the init calls an unmodified node still sends at block 1, on an anvil started from the precomputed genesis,
+# returns the ones which reverted
+async def replay_init_calls(client):
+    receipts = await _mine_init_calls(client)
+    return [call for call, receipt in zip(INIT_CALLS, receipts) if int(receipt["status"], 16) != 1]
+
+
+# balance, nonce, code hash and storage root of the system contracts, from eth_getProof
+async def account_states(client, block="latest"):
+    proofs = await client.batch([("eth_getProof", [address, [], block]) for address in SYSTEM_ADDRESSES])
+    return {
+        address: {
+            "balance": int(proof["balance"], 16),
+            "nonce": int(proof["nonce"], 16),
+            "codeHash": proof["codeHash"],
+            "storageHash": proof["storageHash"],
+        }
+        for address, proof in zip(SYSTEM_ADDRESSES, proofs)
+    }
+
+
+def compare_states(expected, actual):
+    diffs = []
+    for address in SYSTEM_ADDRESSES:
+        for field, value in expected[address].items():
+            if actual[address][field] != value:
+                diffs.append(Diff("account", f"alloc.{address}.{field}", value, actual[address][field]))
+    return diffs
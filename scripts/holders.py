@@ -0,0 +1,88 @@
+import hashlib
+import json
+import sys
+
+# 500000000e18, the balance of scripts/init_holders.template
+DEFAULT_BALANCE = 500_000_000 * 10 ** 18
+
+# system contracts live at 0x...1000 - 0x...2005
+SYSTEM_ADDRESS_RANGE = (0x1000, 0x2005)
+
+_hex_digits = frozenset("0123456789abcdefABCDEF")
+
+
+def _open(path, mode="r"):
+    if path == "-":
+        return sys.stdin.buffer if "b" in mode else sys.stdin
+    return open(path, mode)
+
+
+def parse_balance(value):
+    balance = value if isinstance(value, int) else int(value, 0)
+    if balance < 0:
+        raise ValueError(f"negative balance {value}")
+    return balance
+
+
+# `address[,balance]` per line, or JSON lines {"address": ..., "balance": ...}
+def read_holders(path, default_balance=DEFAULT_BALANCE):
+    with _open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            try:
+                if line.startswith("{"):
+                    row = json.loads(line)
+                    address, balance = row["address"], row.get("balance", default_balance)
+                else:
+                    address, _, balance = line.partition(",")
+                    balance = balance.strip() or default_balance
+                yield address.strip(), parse_balance(balance)
+            except (ValueError, KeyError, TypeError) as e:
+                raise Exception(f"Invalid init holder at {path}:{line_no}: {e}")
+
+
+def _address_key(address):
+    key = address[2:] if address.startswith(("0x", "0X")) else address
+    if len(key) != 40 or not _hex_digits.issuperset(key):
+        raise Exception(f"Invalid init holder address: {address}")
+    return key.lower()
+
+
+def is_system_address(key):
+    return key.startswith("0" * 36) and SYSTEM_ADDRESS_RANGE[0] <= int(key, 16) <= SYSTEM_ADDRESS_RANGE[1]
+
+
+class UniqueHolders:
+    # normalized `(address, balance)` of the holders, dropping system contracts and the template accounts
+    def __init__(self, holders, reserved=()):
+        self.holders = holders
+        self.reserved = {_address_key(address) for address in reserved}
+        self.count = 0
+        self.skipped = []
+
+    def __iter__(self):
+        seen = set()
+        for address, balance in self.holders:
+            key = _address_key(address)
+            if key in self.reserved or is_system_address(key):
+                self.skipped.append(address)
+                continue
+
+            raw = bytes.fromhex(key)
+            if raw in seen:
+                raise Exception(f"Duplicated init holder: {address}")
+            seen.add(raw)
+
+            self.count += 1
+            yield key, balance
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
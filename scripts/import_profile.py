@@ -0,0 +1,62 @@
+import re
+import subprocess
+import sys
+import time
+from typing import NamedTuple
+
+# `import time: self [us] | cumulative | imported package` lines of `python -X importtime`
+_import_time_pattern = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_import_times(stderr):
+    times = []
+    for line in stderr.splitlines():
+        match = _import_time_pattern.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            times.append(ImportTime(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return times
+
+
+# run the CLI in a child interpreter with -X importtime, returns its exit code, stdout and import times
+def profile(args, cwd=None):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "scripts.generate", *args],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+    )
+    return result.returncode, result.stdout, parse_import_times(result.stderr)
+
+
+# cumulative import cost by top level package, the imports of the interpreter startup (site) are excluded
+def by_package(times):
+    packages = {}
+    for t in times:
+        if t.depth == 0 and t.module != "site":
+            package = t.module.split(".")[0]
+            packages[package] = packages.get(package, 0) + t.cumulative_us
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+# wall time in seconds of each run of the CLI
+def startup_times(args, runs, cwd=None):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "scripts.generate", *args], capture_output=True, check=True, cwd=cwd)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summary(times):
+    import statistics
+
+    return min(times), statistics.median(times), max(times)
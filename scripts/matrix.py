@@ -0,0 +1,58 @@
+import re
+
+_name_pattern = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+# read a TOML/YAML document, the parsers are only imported when needed
+def load_document(path):
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise Exception(
+                    f"tomli is required to read '{path}' on python < 3.11, install it with `poetry install`"
+                )
+        with open(path, "rb") as f:
+            document = tomllib.load(f)
+    elif path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise Exception(f"PyYAML is required to read '{path}', install it with `poetry install`")
+        with open(path, "r") as f:
+            document = yaml.safe_load(f)
+    else:
+        raise Exception(f"Unsupported file '{path}', expected .toml, .yaml or .yml")
+    return document
+
+
+def load_parameter_sets(path):
+    matrix = load_document(path)
+    if not isinstance(matrix, dict) or not isinstance(matrix.get("sets"), list) or not matrix["sets"]:
+        raise Exception(f"'{path}' must define a non-empty `sets` list")
+
+    defaults = _normalize(matrix.get("defaults") or {})
+    parameter_sets = []
+    names = set()
+    for i, parameter_set in enumerate(matrix["sets"]):
+        params = dict(defaults, **_normalize(parameter_set))
+        name = _name_pattern.sub("_", str(params.pop("name", f"set-{i}")))
+        if name in names:
+            raise Exception(f"Duplicated parameter set name: {name}")
+        names.add(name)
+        parameter_sets.append((name, params))
+
+    return parameter_sets
+
+
+def _normalize(params):
+    # accept both typer option names (`max-elected-validators`) and parameter names (`max_elected_validators`)
+    normalized = {}
+    for key, value in params.items():
+        if not isinstance(value, (bool, int)):
+            value = str(value)
+        normalized[key.replace("-", "_")] = value
+    return normalized
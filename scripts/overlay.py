@@ -0,0 +1,158 @@
+import os
+import re
+import shutil
+
+# entries of the project linked into the overlay root, the sources are materialized separately
+_linked_entries = ("node_modules", "lib")
+
+
+class SourceOverlay:
+    # patches registered per contract are applied in memory, the working tree is never modified,
+    # the directories of `mirror` (e.g. the tests) are hard linked into the overlay as they are
+    def __init__(self, work_dir, src="contracts", mirror=()):
+        self.work_dir = work_dir
+        self.src = src
+        self.mirror = tuple(mirror)
+        self._patches = {}
+
+    def _add(self, contract, pattern, action):
+        self._patches.setdefault(contract, {}).setdefault(pattern, []).append(action)
+
+    def insert(self, contract, pattern, ins):
+        self._add(contract, pattern, ("insert", ins, 1))
+
+    def replace(self, contract, pattern, repl, count=1):
+        self._add(contract, pattern, ("replace", repl, count))
+
+    def patch(self, contract, content):
+        patches = self._patches.get(contract)
+        if not patches:
+            return content
+
+        patterns = [re.compile(p) for p in patches]
+        # [kind, argument, remaining applications, applied], a non positive count replaces every match like re.sub
+        actions = [[[kind, arg, count if count > 0 else -1, False] for kind, arg, count in patches[p]] for p in patches]
+        # a single pass over the source, alternatives are lookaheads so no match hides another one
+        locator = re.compile("|".join(f"(?={p})" for p in patches))
+
+        last_end = [0] * len(patterns)
+        edits = []
+        for m in locator.finditer(content):
+            pos = m.start()
+            for i, pattern in enumerate(patterns):
+                active = [action for action in actions[i] if action[2] != 0]
+                if not active or pos < last_end[i]:
+                    continue
+                match = pattern.match(content, pos)
+                if match is None:
+                    continue
+
+                last_end[i] = max(match.end(), pos + 1)
+                line_start = content.rfind("\n", 0, pos) + 1
+                for action in active:
+                    if action[0] == "insert":
+                        edits.append((line_start, line_start, action[1] + "\n"))
+                    else:
+                        edits.append((match.start(), match.end(), match.expand(action[1])))
+                    action[2] -= 1
+                    action[3] = True
+
+        for i, pattern in enumerate(patterns):
+            if not all(action[3] for action in actions[i]):
+                raise Exception(f"{pattern} not found")
+
+        return _apply_edits(contract, content, edits)
+
+    def sources(self, directory=None):
+        src_dir = os.path.join(self.work_dir, directory or self.src)
+        for root, _, files in os.walk(src_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                yield os.path.relpath(path, src_dir), path
+
+    # mirror the project into `root` with patched sources, unchanged sources are hard linked
+    def materialize(self, root):
+        src_root = os.path.join(root, self.src)
+        os.makedirs(src_root, exist_ok=True)
+
+        for entry in _linked_entries:
+            target = os.path.join(self.work_dir, entry)
+            link = os.path.join(root, entry)
+            if os.path.exists(target) and not os.path.lexists(link):
+                os.symlink(target, link)
+        shutil.copyfile(os.path.join(self.work_dir, "foundry.toml"), os.path.join(root, "foundry.toml"))
+
+        expected = set()
+        unknown = set(self._patches)
+        for rel_path, path in self.sources():
+            dest = os.path.join(src_root, rel_path)
+            expected.add(dest)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+            if rel_path in self._patches:
+                unknown.discard(rel_path)
+                with open(path, "r") as f:
+                    content = self.patch(rel_path, f.read())
+                _write_if_changed(dest, content)
+            else:
+                _link(path, dest)
+
+        if unknown:
+            raise Exception(f"Source file '{', '.join(sorted(unknown))}' not found.")
+
+        for directory in self.mirror:
+            for rel_path, path in self.sources(directory):
+                dest = os.path.join(root, directory, rel_path)
+                expected.add(dest)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                _link(path, dest)
+
+        # drop sources removed from the working tree
+        for directory in (self.src,) + self.mirror:
+            for dir_path, _, files in os.walk(os.path.join(root, directory)):
+                for file in files:
+                    path = os.path.join(dir_path, file)
+                    if path not in expected:
+                        os.remove(path)
+
+        return root
+
+
+def _apply_edits(contract, content, edits):
+    edits.sort(key=lambda e: (e[0], e[1]))
+    parts = []
+    pos = 0
+    for start, end, text in edits:
+        if start < pos:
+            raise Exception(f"Overlapping patches in {contract} at offset {start}")
+        parts.append(content[pos:start])
+        parts.append(text)
+        pos = end
+    parts.append(content[pos:])
+    return "".join(parts)
+
+
+def _write_if_changed(dest, content):
+    # keep the mtime of unchanged files, so forge can build incrementally
+    if os.path.isfile(dest) and not os.path.islink(dest) and os.stat(dest).st_nlink == 1:
+        with open(dest, "r") as f:
+            if f.read() == content:
+                return
+
+    # never write through a hard link to the working tree
+    tmp_path = f"{dest}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, dest)
+
+
+def _link(path, dest):
+    if os.path.exists(dest) and os.path.samefile(path, dest):
+        return
+
+    tmp_path = f"{dest}.{os.getpid()}.tmp"
+    try:
+        os.link(path, tmp_path)
+    except OSError:
+        shutil.copy2(path, tmp_path)
+    os.replace(tmp_path, dest)
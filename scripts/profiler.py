@@ -0,0 +1,192 @@
+import contextlib
+import json
+import os
+import subprocess
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+# bytes read and written by this process and its waited children, None where /proc/self/io is not available
+def _io_counters():
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _rss_kb(ru_maxrss):
+    # ru_maxrss is in bytes on macOS
+    return ru_maxrss // 1024 if os.uname().sysname == "Darwin" else ru_maxrss
+
+
+# peak RSS in KB of this process since it started, a high-water mark that no stage resets
+def _process_max_rss():
+    if resource is None:
+        return None
+    return _rss_kb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+class _Popen(subprocess.Popen):
+    # the resource usage of this child alone, RUSAGE_CHILDREN is the max over all the waited children
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        if not hasattr(os, "wait4"):
+            return super()._try_wait(wait_flags)
+        try:
+            pid, status, rusage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return self.pid, 0
+        if pid:
+            self.rusage = rusage
+        return pid, status
+
+
+# subprocess.run, the peak RSS in KB of the child goes into `metrics`, None where os.wait4 is not available
+def _run(args, metrics, input=None, capture_output=False, timeout=None, check=False, **kwargs):
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+
+    with _Popen(args, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except BaseException:
+            process.kill()
+            raise
+    metrics["child_peak_rss_kb"] = None if process.rusage is None else _rss_kb(process.rusage.ru_maxrss)
+
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, process.args, stdout, stderr)
+    return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+
+
+def _cpu_time():
+    t = os.times()
+    return t.user + t.system, t.children_user + t.children_system
+
+
+class Profiler:
+    # wall/CPU time, peak RSS and IO of nested stages, disabled profilers only cost a context manager per stage
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    # yields a dict of metrics of the stage to fill, like the peak RSS of the child of `run`
+    @contextlib.contextmanager
+    def stage(self, name, category="stage", **args):
+        metrics = {}
+        if not self.enabled:
+            yield metrics
+            return
+
+        start = time.perf_counter()
+        cpu_self, cpu_children = _cpu_time()
+        read, written = _io_counters()
+        self._depth += 1
+        try:
+            yield metrics
+        finally:
+            self._depth -= 1
+            end = time.perf_counter()
+            end_cpu_self, end_cpu_children = _cpu_time()
+            end_read, end_written = _io_counters()
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self._start) * 1e6),
+                "dur": round((end - start) * 1e6),
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": dict(
+                    args,
+                    **metrics,
+                    depth=self._depth,
+                    wall_s=end - start,
+                    cpu_s=end_cpu_self - cpu_self,
+                    children_cpu_s=end_cpu_children - cpu_children,
+                    process_max_rss_kb=_process_max_rss(),
+                    read_bytes=None if read is None else end_read - read,
+                    written_bytes=None if written is None else end_written - written,
+                ),
+            })
+
+    # subprocess.run in a stage of its own, with the peak RSS of the child alone
+    def run(self, name, args, **kwargs):
+        if not self.enabled:
+            return subprocess.run(args, **kwargs)
+        with self.stage(name, "subprocess", args=args) as metrics:
+            return _run(args, metrics, **kwargs)
+
+    def stages(self):
+        return [dict(event["args"], name=event["name"], category=event["cat"]) for event in self._sorted_events()]
+
+    def _sorted_events(self):
+        return sorted(self.events, key=lambda event: (event["ts"], -event["dur"]))
+
+    # Chrome trace (chrome://tracing, Perfetto) JSON object, the stages are also listed with their metrics
+    def save(self, path, command=None):
+        trace = {
+            "traceEvents": self._sorted_events(),
+            "displayTimeUnit": "ms",
+            "command": command,
+            "stages": self.stages(),
+        }
+        with open(path, "w") as f:
+            json.dump(trace, f, indent=2)
+
+
+def load_stages(path):
+    with open(path, "r") as f:
+        return json.load(f)["stages"]
+
+
+# wall/CPU statistics of every stage over several profiles of the same command
+def aggregate(runs):
+    import statistics
+
+    by_stage = {}
+    for stages in runs:
+        for stage in stages:
+            by_stage.setdefault((stage["category"], stage["name"]), []).append(stage)
+
+    result = []
+    for (category, name), stages in by_stage.items():
+        walls = [stage["wall_s"] for stage in stages]
+        cpus = [stage["cpu_s"] + stage["children_cpu_s"] for stage in stages]
+        result.append({
+            "name": name,
+            "category": category,
+            "count": len(stages),
+            "wall_s_min": min(walls),
+            "wall_s_median": statistics.median(walls),
+            "wall_s_max": max(walls),
+            "cpu_s_median": statistics.median(cpus),
+            "process_max_rss_kb_max": _max(stage["process_max_rss_kb"] for stage in stages),
+            "child_peak_rss_kb_max": _max(stage.get("child_peak_rss_kb") for stage in stages),
+            "read_bytes_median": _median(stage["read_bytes"] for stage in stages),
+            "written_bytes_median": _median(stage["written_bytes"] for stage in stages),
+        })
+    return sorted(result, key=lambda stage: stage["wall_s_median"], reverse=True)
+
+
+def _max(values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def _median(values):
+    import statistics
+
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
@@ -0,0 +1,255 @@
+import json
+import os
+import random
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import NamedTuple
+
+from scripts import build_cache, genesis, matrix
+
+# long versions of the compilers of the contracts, when no build artifact tells them
+SOLC_BUILDS = {
+    "0.6.4": "v0.6.4+commit.1dca32f3",
+    "0.8.17": "v0.8.17+commit.8df45f5f",
+}
+# verification API of the explorer of each network, the networks without a known explorer need --verifier-url
+VERIFIER_URLS = {
+    "mainnet": "https://h2scan.io/api",
+}
+# EVM version of the contracts without build artifacts: the default of each compiler, which is also the newest one it
+# supports, and forge caps its own default to the newest one the compiler supports
+EVM_VERSIONS = {
+    "0.6.4": "istanbul",
+    "0.8.17": "london",
+}
+
+_template_code_pattern = re.compile(r'"(0x[0-9a-fA-F]{40})"\s*:\s*\{[^{}]*"code"\s*:\s*"\{\{\s*(\w+)\s*\}\}"')
+_pragma_pattern = re.compile(r"^\s*pragma\s+solidity\s+=?\s*(\d+\.\d+\.\d+)\s*;", re.M)
+
+
+class ReleaseContract(NamedTuple):
+    name: str
+    # relative to the project root
+    source: str
+    address: str
+    # long version, e.g. v0.8.17+commit.8df45f5f
+    compiler: str
+    optimizer: bool
+    runs: int
+    evm_version: str
+    # `settings` of the standard JSON input, exactly the ones of the build (bytecodeHash, remappings, ...)
+    settings: dict
+    # source unit names of the contract and its imports relative to the project root, None to resolve the imports
+    sources: tuple = None
+
+
+# template key -> address of the system contracts deployed by the genesis template
+def template_addresses(template_path):
+    with open(template_path, "r") as f:
+        return {key: address for address, key in _template_code_pattern.findall(f.read())}
+
+
+def _artifact_metadata(root, name):
+    try:
+        with open(os.path.join(root, "out", f"{name}.sol", f"{name}.json"), "r") as f:
+            metadata = json.load(f).get("metadata")
+    except (FileNotFoundError, ValueError):
+        return None
+    return json.loads(metadata) if isinstance(metadata, str) else metadata
+
+
+def _compiler_version(root, source):
+    with open(os.path.join(root, source), "r") as f:
+        match = _pragma_pattern.search(f.read())
+    if match is None:
+        raise Exception(f"No exact `pragma solidity` version in '{source}', build it first")
+    version = match.group(1)
+    if version not in SOLC_BUILDS:
+        raise Exception(f"Unknown build of solc {version} for '{source}', build it first")
+    return version
+
+
+# the remappings of foundry.toml and one for each library the sources are imported from, like forge detects them
+def _remappings(root, sources):
+    remappings = build_cache.load_remappings(root)
+    entries = [
+        f"{context}:{prefix}={target}" if context else f"{prefix}={target}" for context, prefix, target in remappings
+    ]
+    for name in sources:
+        parts = name.split("/")
+        if parts[0] not in ("node_modules", "lib") or len(parts) < 3:
+            continue
+        # the whole scope of the scoped npm packages, e.g. @openzeppelin/ for @openzeppelin/contracts
+        package = parts[1]
+        prefix = f"{package}/"
+        if not any(prefix.startswith(p) or p.startswith(prefix) for _, p, _ in remappings):
+            entries.append(f"{prefix}={parts[0]}/{package}/")
+    return sorted(set(entries))
+
+
+# the system contracts of the genesis template with their address and compiler settings, from the build
+# artifacts of `root` when there are some, otherwise from the pragma of the sources and foundry.toml
+def release_contracts(root, template_path):
+    profile = matrix.load_document(os.path.join(root, "foundry.toml")).get("profile", {}).get("default", {})
+    contracts = []
+    for key, address in template_addresses(template_path).items():
+        name = genesis.SYSTEM_CONTRACTS[key]
+        source = os.path.join("contracts", f"{name}.sol")
+        metadata = _artifact_metadata(root, name)
+        if metadata:
+            settings = {k: v for k, v in metadata.get("settings", {}).items() if k != "compilationTarget"}
+            optimizer = settings.get("optimizer", {})
+            contracts.append(ReleaseContract(
+                name, source, address, "v" + metadata["compiler"]["version"], bool(optimizer.get("enabled")),
+                int(optimizer.get("runs", 200)), settings.get("evmVersion"), settings,
+                tuple(sorted(metadata.get("sources", {})))
+            ))
+            continue
+
+        version = _compiler_version(root, source)
+        optimizer = bool(profile.get("optimizer", False))
+        runs = int(profile.get("optimizer_runs", 200))
+        evm_version = profile.get("evm_version") or EVM_VERSIONS[version]
+        settings = {
+            "optimizer": {"enabled": optimizer, "runs": runs},
+            "evmVersion": evm_version,
+            "metadata": {"bytecodeHash": profile.get("bytecode_hash", "ipfs")},
+            "libraries": {},
+        }
+        contracts.append(ReleaseContract(
+            name, source, address, SOLC_BUILDS[version], optimizer, runs, evm_version, settings
+        ))
+    return contracts
+
+
+# the solidity-standard-json-input of a contract, with the content of every source it is compiled from
+def standard_json_input(root, contract):
+    sources, settings = contract.sources, contract.settings
+    if sources is None:
+        # no build artifact: the imports as forge resolves them, which fails on the missing dependencies
+        sources = tuple(sorted(
+            os.path.relpath(path, root)
+            for path, _ in build_cache.source_closure(root, os.path.join(root, contract.source))
+        ))
+        settings = dict(settings, remappings=_remappings(root, sources))
+
+    contents = {}
+    for name in sources:
+        with open(os.path.join(root, name), "r") as f:
+            contents[name] = {"content": f.read()}
+    return json.dumps({"language": "Solidity", "sources": contents, "settings": settings}, sort_keys=True)
+
+
+# the flattened source of a contract only depends on the contract, its imports and the remappings
+def flatten_key(root, source):
+    return build_cache.source_key(root, os.path.join(root, source), build_cache.compiler_settings(root))
+
+
+class VerifierError(Exception):
+    pass
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class Verifier:
+    # the Etherscan compatible verification API of an explorer (Etherscan, Blockscout, a local stub), requests failing
+    # on the network, with a 429/5xx status or a rate limit are retried with an exponential backoff
+    def __init__(
+        self, url, api_key, chain_id, retries=5, backoff=1.0, max_backoff=30.0, poll_interval=3.0, timeout=600.0
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.chain_id = chain_id
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def _send(self, params, post):
+        params = dict(params, apikey=self.api_key, chainid=str(self.chain_id))
+        data = urllib.parse.urlencode(params).encode()
+        if post:
+            request = urllib.request.Request(self.url, data=data)
+        else:
+            request = urllib.request.Request(f"{self.url}?{data.decode()}")
+
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                body = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                raise _RetryableError(f"HTTP {e.code}")
+            raise VerifierError(f"HTTP {e.code}: {e.read()[:200]!r}")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise _RetryableError(str(e))
+
+        if "rate limit" in str(body.get("result", "")).lower():
+            raise _RetryableError(body["result"])
+        return body
+
+    def request(self, params, post=False):
+        for attempt in range(self.retries + 1):
+            try:
+                return self._send(params, post)
+            except _RetryableError as e:
+                if attempt == self.retries:
+                    raise VerifierError(f"{params.get('action')} failed after {attempt + 1} attempts: {e}")
+                # jittered, so the workers failing together do not retry together
+                time.sleep(min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0))
+
+    def is_verified(self, contract):
+        body = self.request({"module": "contract", "action": "getsourcecode", "address": contract.address})
+        result = body.get("result")
+        return body.get("status") == "1" and isinstance(result, list) and bool(result and result[0].get("SourceCode"))
+
+    # submit the standard JSON input of the contract, returns the guid of the verification
+    def submit(self, contract, standard_input):
+        params = {
+            "module": "contract",
+            "action": "verifysourcecode",
+            "contractaddress": contract.address,
+            "sourceCode": standard_input,
+            "codeformat": "solidity-standard-json-input",
+            "contractname": f"{contract.source}:{contract.name}",
+            "compilerversion": contract.compiler,
+            "optimizationUsed": "1" if contract.optimizer else "0",
+            "runs": str(contract.runs),
+            "evmversion": contract.evm_version,
+        }
+
+        body = self.request(params, post=True)
+        if body.get("status") != "1":
+            if "already verified" in str(body.get("result", "")).lower():
+                return None
+            raise VerifierError(f"Submitting {contract.name} failed: {body.get('result') or body.get('message')}")
+        return body["result"]
+
+    def wait(self, contract, guid):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            body = self.request({"module": "contract", "action": "checkverifystatus", "guid": guid})
+            result = str(body.get("result", ""))
+            if body.get("status") == "1" or "already verified" in result.lower():
+                return result
+            # some explorers do not know the guid for a moment after the submission
+            if "pending" not in result.lower() and "unknown uid" not in result.lower():
+                raise VerifierError(f"Verification of {contract.name} failed: {result}")
+            if time.monotonic() > deadline:
+                raise VerifierError(f"Verification of {contract.name} still pending after {self.timeout}s")
+            time.sleep(self.poll_interval)
+
+    # `verified`, `already verified` or `skipped` when the explorer already has the source
+    def verify(self, contract, standard_input, skip_verified=True):
+        if skip_verified and self.is_verified(contract):
+            return "skipped"
+        guid = self.submit(contract, standard_input)
+        if guid is None:
+            return "already verified"
+        self.wait(contract, guid)
+        return "verified"
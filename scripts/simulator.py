@@ -0,0 +1,377 @@
+import re
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:
+    raise Exception("numpy is required by the simulator, install it with `poetry install`")
+
+ETHER = 10 ** 18
+
+# StakeHub
+LOCK_AMOUNT = 1 * ETHER
+BREATHE_BLOCK_INTERVAL = 86400
+FELONY_SLASH_AMOUNT = 200 * ETHER
+# StakeCredit
+COMMISSION_RATE_BASE = 10_000
+# ValidatorSet
+BLOCK_FEES_RATIO_SCALE = 10_000
+INIT_SYSTEM_REWARD_RATIO = 625
+MAX_SYSTEM_REWARD_BALANCE = 100 * ETHER
+# SystemReward
+MAX_REWARDS = 5 * ETHER
+
+_units = {
+    "seconds": 1, "second": 1, "minutes": 60, "minute": 60, "hours": 3600, "hour": 3600,
+    "days": 86400, "day": 86400, "weeks": 604800, "week": 604800,
+}
+_duration_pattern = re.compile(r"^\s*(\d[\d_]*)\s*(\w+)?\s*$")
+
+
+# Solidity literal of the generate.py parameters, e.g. `30 days` or `25`
+def parse_duration(value):
+    match = _duration_pattern.match(str(value))
+    if not match or (match.group(2) and match.group(2) not in _units):
+        raise Exception(f"Unsupported duration: {value}")
+    return int(match.group(1).replace("_", "")) * _units.get(match.group(2), 1)
+
+
+# arrays hold wei as float64 for sweeps, or as python ints (object arrays) with the exact uint256 arithmetic
+def _array(values, exact):
+    return np.array([int(v) for v in values], dtype=object) if exact else np.asarray(values, dtype=np.float64)
+
+
+def _zeros(size, exact):
+    return np.array([0] * size, dtype=object) if exact else np.zeros(size)
+
+
+def _sum_by(index, values, size, exact):
+    if exact:
+        total = _zeros(size, True)
+        np.add.at(total, index, values)
+        return total
+    return np.bincount(index, weights=values, minlength=size)
+
+
+# StakeCredit.getSharesByPooledToken
+def shares_by_pooled_token(token_amount, total_supply, total_pooled_token):
+    return (token_amount * total_supply) // total_pooled_token
+
+
+# StakeCredit.getPooledTokenByShares
+def pooled_token_by_shares(shares, total_supply, total_pooled_token):
+    return (shares * total_pooled_token) // total_supply
+
+
+# the incoming of a block producer from ValidatorSet.deposit, the system reward and burn parts use the whole value
+def deposit_incoming(value, burn_ratio, system_reward_ratio=INIT_SYSTEM_REWARD_RATIO):
+    to_system_reward = (value * system_reward_ratio) // BLOCK_FEES_RATIO_SCALE
+    rest = value - to_system_reward
+    to_burn = ((value * burn_ratio) // BLOCK_FEES_RATIO_SCALE) * (rest > 0)
+    return rest - to_burn, to_system_reward, to_burn
+
+
+# ValidatorSet.distributeFinalityReward, returns the reward of every address
+def split_finality_reward(total_value, weights):
+    total_weight = weights.sum()
+    if total_weight == 0:
+        return 0 * weights
+    return (total_value * weights) // total_weight
+
+
+# the system reward paid out by the finality reward, SystemReward.claimRewards caps it at MAX_REWARDS
+def finality_reward(system_reward_balance):
+    if system_reward_balance <= MAX_SYSTEM_REWARD_BALANCE:
+        return 0 * system_reward_balance
+    return min(system_reward_balance - MAX_SYSTEM_REWARD_BALANCE, MAX_REWARDS)
+
+
+# the validators elected by the Parlia engine from StakeHub.getValidatorElectionInfo: jailed validators have no
+# voting power, the others are ordered by voting power then by consensus address
+def elect(voting_powers, addresses, max_elected_validators):
+    candidates = np.flatnonzero(voting_powers > 0)
+    if voting_powers.dtype == object:
+        order = sorted(candidates, key=lambda i: (-voting_powers[i], addresses[i]))
+        return np.array(order[:max_elected_validators], dtype=np.int64)
+
+    if len(candidates) > max_elected_validators:
+        # only the top of the voting powers needs a full sort
+        top = np.argpartition(-voting_powers[candidates], max_elected_validators - 1)[:max_elected_validators]
+        candidates = candidates[top]
+    order = np.lexsort((addresses[candidates], -voting_powers[candidates]))
+    return candidates[order][:max_elected_validators]
+
+
+class StakeCredits:
+    # share accounting of every StakeCredit, one entry per validator
+    def __init__(self, init_amounts, exact=False):
+        self.exact = exact
+        init_amounts = _array(init_amounts, exact)
+        if (init_amounts <= LOCK_AMOUNT).any():
+            raise Exception("The init amount of a validator must exceed the lock amount")
+
+        # _bootstrapInitialHolder: the lock amount is minted to the dead address
+        self.total_supply = init_amounts.copy()
+        self.total_pooled_token = init_amounts.copy()
+        self.self_shares = init_amounts - LOCK_AMOUNT
+
+    def delegate(self, validators, amounts):
+        # the delegations of a batch all use the share price of the start of the batch
+        shares = shares_by_pooled_token(amounts, self.total_supply[validators], self.total_pooled_token[validators])
+        size = len(self.total_supply)
+        self.total_supply = self.total_supply + _sum_by(validators, shares, size, self.exact)
+        self.total_pooled_token = self.total_pooled_token + _sum_by(validators, amounts, size, self.exact)
+        return shares
+
+    def undelegate(self, validators, shares):
+        amounts = pooled_token_by_shares(shares, self.total_supply[validators], self.total_pooled_token[validators])
+        size = len(self.total_supply)
+        self.total_supply = self.total_supply - _sum_by(validators, shares, size, self.exact)
+        self.total_pooled_token = self.total_pooled_token - _sum_by(validators, amounts, size, self.exact)
+        return amounts
+
+    # StakeCredit.distributeReward of every validator at once, the commission is minted to the validator
+    def distribute_reward(self, amounts, commission_rates):
+        commissions = (amounts * commission_rates) // COMMISSION_RATE_BASE
+        self.total_pooled_token = self.total_pooled_token + (amounts - commissions)
+
+        shares = shares_by_pooled_token(commissions, self.total_supply, self.total_pooled_token)
+        self.self_shares = self.self_shares + shares
+        self.total_supply = self.total_supply + shares
+        self.total_pooled_token = self.total_pooled_token + commissions
+
+    # StakeCredit.slash of the validators, returns the real amounts slashed
+    def slash(self, validators, slash_amount):
+        slash_shares = shares_by_pooled_token(
+            slash_amount + 0 * self.total_supply[validators], self.total_supply[validators],
+            self.total_pooled_token[validators]
+        )
+        slash_shares = np.minimum(slash_shares, self.self_shares[validators])
+        amounts = pooled_token_by_shares(
+            slash_shares, self.total_supply[validators], self.total_pooled_token[validators]
+        )
+        self.self_shares[validators] -= slash_shares
+        self.total_supply[validators] -= slash_shares
+        self.total_pooled_token[validators] -= amounts
+        return amounts
+
+    def pooled_tokens(self, validators, shares):
+        return pooled_token_by_shares(shares, self.total_supply[validators], self.total_pooled_token[validators])
+
+
+class SimulationParams(NamedTuple):
+    max_elected_validators: int = 45
+    felony_jail_time: int = 30 * 86400
+    burn_ratio: int = 1000
+    breathe_block_interval: int = BREATHE_BLOCK_INTERVAL
+    # fees of the blocks of an epoch, in wei
+    epoch_fees: float = 100 * ETHER
+    # chance of an elected validator to commit a felony in an epoch
+    felony_rate: float = 0.001
+    # share of the delegators of jailed validators redelegating to an elected validator in an epoch
+    redelegate_rate: float = 0.1
+    commission_rate: int = 500
+
+
+class Simulation:
+    # epochs of breathe blocks: election, fees and finality rewards, felonies and jails, reward distribution
+    def __init__(self, params, validator_stakes, delegator_validators, delegator_amounts, seed=0):
+        self.params = params
+        self.rng = np.random.default_rng(seed)
+        self.num_validators = len(validator_stakes)
+        self.addresses = self.rng.permutation(self.num_validators)
+
+        self.credits = StakeCredits(validator_stakes)
+        self.delegator_validators = np.asarray(delegator_validators, dtype=np.int64)
+        self.delegator_amounts = np.asarray(delegator_amounts, dtype=np.float64)
+        self.delegator_shares = self.credits.delegate(self.delegator_validators, self.delegator_amounts)
+
+        self.jailed_until = np.full(self.num_validators, -1, dtype=np.int64)
+        self.commission_rates = np.full(self.num_validators, float(params.commission_rate))
+        self.jail_epochs = -(-params.felony_jail_time // params.breathe_block_interval)
+        self.system_reward_balance = 0.0
+        self.epoch = 0
+        self.history = []
+
+    def step(self):
+        params = self.params
+        jailed = self.jailed_until >= self.epoch
+        voting_powers = np.where(jailed, 0.0, self.credits.total_pooled_token)
+        elected = elect(voting_powers, self.addresses, params.max_elected_validators)
+
+        # the blocks of the epoch are produced in turn by the elected validators
+        incoming = np.zeros(self.num_validators)
+        value = np.floor(params.epoch_fees / len(elected)) if len(elected) else 0.0
+        block_incoming, to_system_reward, burned = deposit_incoming(np.float64(value), params.burn_ratio)
+        incoming[elected] = block_incoming
+        self.system_reward_balance += float(to_system_reward) * len(elected)
+
+        total_value = finality_reward(self.system_reward_balance)
+        self.system_reward_balance -= total_value
+        incoming[elected] += split_finality_reward(total_value, np.ones(len(elected)))
+
+        # felonies: the incoming is lost to the system reward, the validator is slashed and jailed
+        felons = elected[self.rng.random(len(elected)) < params.felony_rate]
+        if len(felons) and len(felons) < len(elected):
+            self.system_reward_balance += float(incoming[felons].sum())
+            incoming[felons] = 0
+            self.system_reward_balance += float(self.credits.slash(felons, FELONY_SLASH_AMOUNT).sum())
+            self.jailed_until[felons] = self.epoch + self.jail_epochs
+        else:
+            felons = felons[:0]
+
+        self.credits.distribute_reward(incoming, self.commission_rates)
+        self._redelegate(elected)
+
+        self.history.append({
+            "epoch": self.epoch,
+            "elected": len(elected),
+            "jailed": int((self.jailed_until >= self.epoch).sum()),
+            "felonies": len(felons),
+            "burned": float(burned) * len(elected),
+            "rewards": float(incoming.sum()),
+            "elected_stake_share": float(
+                self.credits.total_pooled_token[elected].sum() / self.credits.total_pooled_token.sum()
+            ),
+        })
+        self.epoch += 1
+
+    def _redelegate(self, elected):
+        jailed = self.jailed_until >= self.epoch
+        movers = np.flatnonzero(jailed[self.delegator_validators])
+        if not len(movers) or not len(elected):
+            return
+        movers = movers[self.rng.random(len(movers)) < self.params.redelegate_rate]
+        if not len(movers):
+            return
+
+        amounts = self.credits.undelegate(self.delegator_validators[movers], self.delegator_shares[movers])
+        targets = elected[self.rng.integers(0, len(elected), len(movers))]
+        self.delegator_shares[movers] = self.credits.delegate(targets, amounts)
+        self.delegator_validators[movers] = targets
+
+    def run(self, epochs):
+        for _ in range(epochs):
+            self.step()
+        return self.summary()
+
+    def summary(self):
+        values = self.credits.pooled_tokens(self.delegator_validators, self.delegator_shares)
+        returns = values / self.delegator_amounts - 1
+        return {
+            "params": self.params._asdict(),
+            "epochs": self.epoch,
+            "burned": sum(h["burned"] for h in self.history),
+            "felonies": sum(h["felonies"] for h in self.history),
+            "mean_jailed": float(np.mean([h["jailed"] for h in self.history])) if self.history else 0.0,
+            "mean_elected_stake_share": (
+                float(np.mean([h["elected_stake_share"] for h in self.history])) if self.history else 0.0
+            ),
+            "delegator_return_p5": float(np.percentile(returns, 5)),
+            "delegator_return_p50": float(np.percentile(returns, 50)),
+            "delegator_return_p95": float(np.percentile(returns, 95)),
+        }
+
+
+# deterministic stakes of `num_validators` validators and `num_delegators` delegators
+def random_population(num_validators, num_delegators, seed=0):
+    rng = np.random.default_rng(seed)
+    validator_stakes = np.floor(rng.lognormal(np.log(10_000), 1.0, num_validators)) * ETHER + 2 * LOCK_AMOUNT
+    # delegators prefer the large validators
+    weights = validator_stakes / validator_stakes.sum()
+    delegator_validators = rng.choice(num_validators, size=num_delegators, p=weights)
+    delegator_amounts = np.floor(rng.lognormal(np.log(100), 1.5, num_delegators) * ETHER) + 1
+    return validator_stakes, delegator_validators, delegator_amounts
+
+
+# the `dev` options tuned by a sweep, as strings like `30 days`, and the options of the simulation itself
+def simulation_params(params):
+    values = {}
+    for key, value in params.items():
+        if key == "init_burn_ratio":
+            values["burn_ratio"] = int(value)
+        elif key in ("felony_jail_time", "breathe_block_interval"):
+            values[key] = parse_duration(value)
+        elif key in ("max_elected_validators", "commission_rate"):
+            values[key] = int(str(value).replace("_", ""))
+        elif key in SimulationParams._fields:
+            values[key] = float(value)
+        else:
+            raise Exception(f"Unknown simulation parameter: {key}")
+    return SimulationParams(**values)
+
+
+def run_simulation(params, num_validators, num_delegators, epochs, seed=0):
+    population = random_population(num_validators, num_delegators, seed)
+    return Simulation(params, *population, seed=seed).run(epochs)
+
+
+# the cases shared with test/Simulator.t.sol, computed with the exact uint256 arithmetic of the simulator,
+# numbers are written as decimal strings to keep their precision in JSON
+def fixtures(seed=0, cases=8):
+    rng = np.random.default_rng(seed)
+
+    stake_credit = []
+    for _ in range(cases):
+        init_amount = int(rng.integers(2_100, 9_000)) * ETHER + int(rng.integers(0, ETHER)) + LOCK_AMOUNT
+        delegations = [int(rng.integers(1, 5_000)) * ETHER + int(rng.integers(0, ETHER)) for _ in range(3)]
+        reward = int(rng.integers(1, 100)) * ETHER + int(rng.integers(0, ETHER))
+        commission_rate = int(rng.integers(0, 5_001))
+        # the felony slash, a small one, and one exceeding the self delegation
+        slash_amount = [FELONY_SLASH_AMOUNT, 10 * ETHER, 2 * init_amount][int(rng.integers(0, 3))]
+
+        credits = StakeCredits([init_amount], exact=True)
+        credits.distribute_reward(_array([reward], True), _array([commission_rate], True))
+        # delegations are sent one by one, each with the share price left by the previous one
+        shares = [credits.delegate(np.zeros(1, dtype=np.int64), _array([amount], True))[0] for amount in delegations]
+        total_supply, total_pooled_token = credits.total_supply[0], credits.total_pooled_token[0]
+        slashed = credits.slash(np.zeros(1, dtype=np.int64), slash_amount)[0]
+
+        stake_credit.append({
+            "initAmount": str(init_amount),
+            "delegations": [str(amount) for amount in delegations],
+            "reward": str(reward),
+            "commissionRate": str(commission_rate),
+            "slashAmount": str(slash_amount),
+            "expectedShares": [str(s) for s in shares],
+            "expectedTotalSupply": str(total_supply),
+            "expectedTotalPooledToken": str(total_pooled_token),
+            "expectedSlashed": str(slashed),
+            "expectedTotalSupplyAfterSlash": str(credits.total_supply[0]),
+            "expectedTotalPooledTokenAfterSlash": str(credits.total_pooled_token[0]),
+        })
+
+    deposit = []
+    for _ in range(cases):
+        value = int(rng.integers(0, 10)) * ETHER + int(rng.integers(1, ETHER))
+        system_reward_ratio = int(rng.integers(0, 2_000))
+        burn_ratio = int(rng.integers(0, BLOCK_FEES_RATIO_SCALE - system_reward_ratio + 1))
+        incoming, _, _ = deposit_incoming(value, burn_ratio, system_reward_ratio)
+        deposit.append({
+            "value": str(value),
+            "systemRewardRatio": str(system_reward_ratio),
+            "burnRatio": str(burn_ratio),
+            "expectedIncoming": str(incoming),
+        })
+
+    finality_reward_cases = []
+    for _ in range(cases):
+        # the validators of the set of the test, so at most 3 of them
+        weights = _array(rng.integers(1, 1_000, int(rng.integers(1, 4))), True)
+        excess = int(rng.integers(0, 2 * MAX_REWARDS // ETHER)) * ETHER + int(rng.integers(1, ETHER))
+        total_value = finality_reward(MAX_SYSTEM_REWARD_BALANCE + excess)
+        finality_reward_cases.append({
+            "excess": str(excess),
+            "weights": [str(w) for w in weights],
+            "expectedRewards": [str(r) for r in split_finality_reward(total_value, weights)],
+        })
+
+    return {
+        "seed": seed,
+        "stakeCreditCount": len(stake_credit),
+        "stakeCredit": stake_credit,
+        "depositCount": len(deposit),
+        "deposit": deposit,
+        "finalityRewardCount": len(finality_reward_cases),
+        "finalityReward": finality_reward_cases,
+    }
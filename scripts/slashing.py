@@ -0,0 +1,240 @@
+from typing import NamedTuple
+
+from scripts.simulator import ETHER, np, parse_duration
+
+# SlashIndicator
+DECREASE_RATE = 4
+# StakeHub
+DOWNTIME_SLASH_AMOUNT = 10 * ETHER
+
+OUTAGE_DISTRIBUTIONS = ("exponential", "lognormal", "fixed")
+
+
+class SlashingParams(NamedTuple):
+    misdemeanor_threshold: int = 50
+    felony_threshold: int = 150
+    max_elected_validators: int = 45
+    block_interval: int = 3
+    breathe_block_interval: int = 86400
+    turn_length: int = 16
+    downtime_jail_time: int = 2 * 86400
+    # fees of a block, in wei
+    block_reward: float = 0.01 * ETHER
+    # outages of a validator start as a Poisson process
+    outages_per_day: float = 0.5
+    outage_minutes: float = 10.0
+    outage_distribution: str = "exponential"
+    # sigma of the log of the lognormal durations
+    outage_sigma: float = 1.0
+
+
+# the `dev` options of a sweep, as strings like `2 days`, and the options of the downtime distribution
+def slashing_params(params):
+    values = {}
+    for key, value in params.items():
+        if key in ("block_interval", "breathe_block_interval", "downtime_jail_time"):
+            values[key] = parse_duration(value)
+        elif key in ("misdemeanor_threshold", "felony_threshold", "max_elected_validators", "turn_length"):
+            values[key] = int(str(value).replace("_", ""))
+        elif key == "outage_distribution":
+            if value not in OUTAGE_DISTRIBUTIONS:
+                raise Exception(f"Unsupported outage distribution: {value}, expected one of {OUTAGE_DISTRIBUTIONS}")
+            values[key] = value
+        elif key in SlashingParams._fields:
+            values[key] = float(value)
+        else:
+            raise Exception(f"Unknown slashing parameter: {key}")
+
+    params = SlashingParams(**values)
+    # the ranges accepted by SlashIndicator.updateParam
+    if not 1 <= params.misdemeanor_threshold < params.felony_threshold <= 1000:
+        raise Exception("The thresholds must satisfy 1 <= misdemeanorThreshold < felonyThreshold <= 1000")
+    return params
+
+
+# the blocks of a breathe block interval produced in turn by every validator, padded with -1
+def in_turn_blocks(params):
+    blocks_per_day = params.breathe_block_interval // params.block_interval
+    blocks = np.arange(blocks_per_day)
+    owners = (blocks // params.turn_length) % params.max_elected_validators
+
+    counts = np.bincount(owners, minlength=params.max_elected_validators)
+    slots = np.full((params.max_elected_validators, counts.max()), -1, dtype=np.int64)
+    for validator in range(params.max_elected_validators):
+        own = blocks[owners == validator]
+        slots[validator, :len(own)] = own
+    return slots
+
+
+def _durations(rng, params, size):
+    mean = params.outage_minutes * 60 / params.block_interval
+    if params.outage_distribution == "fixed":
+        return np.full(size, mean)
+    if params.outage_distribution == "lognormal":
+        return rng.lognormal(np.log(mean) - params.outage_sigma ** 2 / 2, params.outage_sigma, size)
+    return rng.exponential(mean, size)
+
+
+# the offline in-turn blocks of a breathe block interval, only for the validators of the trials with an outage,
+# the outages running past its end carry over to the next interval
+def offline_slots(rng, params, slots, carry):
+    trials, validators = carry.shape
+    blocks_per_day = params.breathe_block_interval // params.block_interval
+    num_slots = slots.shape[1]
+    outages = rng.poisson(params.outages_per_day, (trials, validators))
+
+    trial_index, validator_index = np.nonzero(outages)
+    repeats = outages[trial_index, validator_index]
+    trial_index, validator_index = np.repeat(trial_index, repeats), np.repeat(validator_index, repeats)
+    starts = rng.uniform(0, blocks_per_day, len(trial_index))
+    ends = starts + _durations(rng, params, len(trial_index))
+
+    # the outages carried over from the previous interval start at its beginning
+    carried_trial, carried_validator = np.nonzero(carry > 0)
+    trial_index = np.concatenate([trial_index, carried_trial])
+    validator_index = np.concatenate([validator_index, carried_validator])
+    starts = np.concatenate([starts, np.zeros(len(carried_trial))])
+    ends = np.concatenate([ends, carry[carried_trial, carried_validator]])
+
+    next_carry = np.zeros_like(carry)
+    np.maximum.at(next_carry, (trial_index, validator_index), ends - blocks_per_day)
+
+    # +1/-1 at the first offline slot and the first slot back online of every outage
+    valid = slots >= 0
+    first_slot = np.empty(len(trial_index), dtype=np.int64)
+    end_slot = np.empty(len(trial_index), dtype=np.int64)
+    for validator in range(validators):
+        own = slots[validator][valid[validator]]
+        outage = validator_index == validator
+        first_slot[outage] = np.searchsorted(own, np.ceil(starts[outage]))
+        end_slot[outage] = np.searchsorted(own, np.ceil(ends[outage]))
+
+    rows, row_index = np.unique(trial_index * validators + validator_index, return_inverse=True)
+    diff = np.zeros((len(rows), num_slots + 1), dtype=np.int32)
+    np.add.at(diff, (row_index, first_slot), 1)
+    np.add.at(diff, (row_index, end_slot), -1)
+    offline = (np.cumsum(diff, axis=1)[:, :num_slots] > 0) & valid[rows % validators]
+    return rows // validators, rows % validators, offline, next_carry
+
+
+class SlashingTrials:
+    # the indicators of SlashIndicator for a batch of independent trials, one row per trial
+    def __init__(self, params, trials, seed):
+        self.params = params
+        self.rng = np.random.default_rng(seed)
+        self.slots = in_turn_blocks(params)
+        self.trials = trials
+
+        shape = (trials, params.max_elected_validators)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.carry = np.zeros(shape)
+        self.jailed_days = np.zeros(shape, dtype=np.int64)
+        self.jail_intervals = -(-params.downtime_jail_time // params.breathe_block_interval)
+
+        self.misdemeanors = np.zeros(shape, dtype=np.int64)
+        self.felonies = np.zeros(shape, dtype=np.int64)
+        self.missed_blocks = np.zeros(shape, dtype=np.int64)
+        self.forfeited_blocks = np.zeros(shape, dtype=np.int64)
+        self.jailed_blocks = np.zeros(shape, dtype=np.int64)
+        self.jailed_validator_days = 0
+
+    # a breathe block interval: SlashIndicator.slash for every missed in-turn block, then ValidatorSet distributes
+    # the incoming and calls SlashIndicator.clean
+    def step(self):
+        params = self.params
+        trial_index, validator_index, offline, self.carry = offline_slots(self.rng, params, self.slots, self.carry)
+        valid = self.slots >= 0
+        num_slots = valid.sum(axis=1)
+
+        # jailed validators are not elected and produce no block
+        jailed = self.jailed_days > 0
+        self.jailed_blocks += np.where(jailed, num_slots, 0)
+        self.jailed_validator_days += int(jailed.sum())
+        self.jailed_days = np.maximum(self.jailed_days - 1, 0)
+
+        # only the validators missing blocks are slashed, the others keep their counts
+        online = ~jailed[trial_index, validator_index]
+        trial_index, validator_index, offline = trial_index[online], validator_index[online], offline[online]
+        valid = valid[validator_index]
+        index = (trial_index, validator_index)
+
+        # the count of the indicator after every in-turn block, felonies reset it and remove the validator
+        counts = self.counts[index][:, None] + np.cumsum(offline, axis=1, dtype=np.int32)
+        felony = offline & (counts == params.felony_threshold)
+        has_felony = felony.any(axis=1)
+        felony_slot = np.where(has_felony, felony.argmax(axis=1), valid.shape[1])
+        before_felony = np.arange(valid.shape[1]) < felony_slot[:, None]
+
+        misdemeanor = offline & before_felony & (counts % params.misdemeanor_threshold == 0)
+        self.misdemeanors[index] += misdemeanor.sum(axis=1)
+        self.felonies[index] += has_felony
+        self.missed_blocks[index] += (offline & (before_felony | felony)).sum(axis=1)
+
+        # the incoming is forfeited at every misdemeanor, and at the felony along with the rest of the interval
+        produced = np.cumsum(valid & ~offline, axis=1, dtype=np.int32)
+        last_misdemeanor = valid.shape[1] - 1 - misdemeanor[:, ::-1].argmax(axis=1)
+        forfeited = np.where(
+            misdemeanor.any(axis=1), np.take_along_axis(produced, last_misdemeanor[:, None], axis=1)[:, 0], 0
+        )
+        produced_before_felony = np.take_along_axis(
+            produced, np.minimum(felony_slot, valid.shape[1] - 1)[:, None], axis=1
+        )[:, 0]
+        after_felony = (valid & ~before_felony & ~felony).sum(axis=1)
+        self.forfeited_blocks[index] += np.where(has_felony, produced_before_felony + after_felony, forfeited)
+
+        self.counts[index] = np.where(has_felony, 0, counts[:, -1])
+        self.jailed_days[index] = np.where(has_felony, self.jail_intervals, self.jailed_days[index])
+
+        # SlashIndicator.clean: decrease the counts by felonyThreshold / DECREASE_RATE, or drop the indicators
+        decrease = params.felony_threshold // DECREASE_RATE
+        self.counts = np.where(self.counts > decrease, self.counts - decrease, 0)
+
+    def run(self, days):
+        for _ in range(days):
+            self.step()
+        return self.totals(days)
+
+    def totals(self, days):
+        params = self.params
+        validator_trials = self.trials * params.max_elected_validators
+        blocks = days * int((self.slots >= 0).sum())
+        return {
+            "validator_trials": validator_trials,
+            "misdemeanor_validators": int((self.misdemeanors > 0).sum()),
+            "jailed_validators": int((self.felonies > 0).sum()),
+            "misdemeanors": int(self.misdemeanors.sum()),
+            "felonies": int(self.felonies.sum()),
+            "jailed_validator_days": self.jailed_validator_days,
+            "lost_blocks": int((self.missed_blocks + self.forfeited_blocks + self.jailed_blocks).sum()),
+            "blocks": blocks * self.trials,
+        }
+
+
+def run_trials(params, trials, days, seed):
+    return SlashingTrials(params, trials, seed).run(days)
+
+
+# merge the totals of the batches of trials into the probabilities of a validator over the simulated days
+def summarize(params, days, totals):
+    total = {key: sum(t[key] for t in totals) for key in totals[0]}
+    validator_trials = total["validator_trials"]
+    lost_reward = total["lost_blocks"] * params.block_reward / validator_trials
+    return {
+        "params": params._asdict(),
+        "days": days,
+        "trials": validator_trials // params.max_elected_validators,
+        "misdemeanor_probability": total["misdemeanor_validators"] / validator_trials,
+        "jail_probability": total["jailed_validators"] / validator_trials,
+        "misdemeanors_per_validator": total["misdemeanors"] / validator_trials,
+        "felonies_per_validator": total["felonies"] / validator_trials,
+        "jailed_share": total["jailed_validator_days"] / (validator_trials * days),
+        "lost_reward_per_validator": lost_reward,
+        "lost_reward_ratio": total["lost_blocks"] / total["blocks"],
+        "slashed_per_validator": total["felonies"] * DOWNTIME_SLASH_AMOUNT / validator_trials,
+    }
+
+
+# independent seeds of the batches, the results do not depend on the number of parallel jobs
+def batch_seeds(seed, trials, batch_size):
+    sizes = [batch_size] * (trials // batch_size) + ([trials % batch_size] if trials % batch_size else [])
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
@@ -0,0 +1,240 @@
+import asyncio
+import gzip
+import json
+import ssl
+from urllib.parse import urlsplit
+
+SNAPSHOT_VERSION = 1
+
+STAKE_HUB_ADDR = "0x0000000000000000000000000000000000001004"
+VALIDATOR_CONTRACT_ADDR = "0x0000000000000000000000000000000000001000"
+SLASH_CONTRACT_ADDR = "0x0000000000000000000000000000000000001001"
+
+
+class RpcError(Exception):
+    pass
+
+
+class _Connection:
+    # a keep-alive HTTP/1.1 connection to the node
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def post(self, host, path, body):
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await self.writer.drain()
+
+        status = await self.reader.readline()
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode().partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            data = b"".join(chunks)
+        else:
+            data = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if b" 200 " not in status:
+            raise RpcError(f"HTTP {status.decode().strip()}: {data[:200]!r}")
+        return data
+
+    def close(self):
+        self.writer.close()
+
+
+class RpcClient:
+    # JSON-RPC over a bounded pool of keep-alive connections, the calls are sent in batches
+    def __init__(self, url, connections=8, batch_size=100):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.path = parts.path or "/"
+        self.batch_size = batch_size
+        self.connections = connections
+        self._pool = None
+        self._opened = set()
+        self._opening = 0
+        self._next_id = 0
+
+    async def _acquire(self):
+        if self._pool is None:
+            self._pool = asyncio.Queue()
+        if self._pool.empty() and len(self._opened) + self._opening < self.connections:
+            self._opening += 1
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+            finally:
+                self._opening -= 1
+            connection = _Connection(reader, writer)
+            self._opened.add(connection)
+            return connection
+        return await self._pool.get()
+
+    async def _send(self, requests):
+        connection = await self._acquire()
+        try:
+            body = json.dumps(requests).encode()
+            responses = json.loads(await connection.post(self.host, self.path, body))
+        except BaseException:
+            # the state of the connection is unknown, do not reuse it
+            connection.close()
+            # close() may already have dropped it
+            self._opened.discard(connection)
+            raise
+        self._pool.put_nowait(connection)
+
+        if isinstance(responses, dict):
+            # a node without batch support answers with a single error
+            raise RpcError(f"Batch request failed: {responses.get('error')}")
+        by_id = {response["id"]: response for response in responses}
+        results = []
+        for request in requests:
+            response = by_id.get(request["id"])
+            if response is None or "error" in response:
+                error = response and response["error"]
+                raise RpcError(f"{request['method']} failed: {error}")
+            results.append(response["result"])
+        return results
+
+    # results of the (method, params) calls in order, split into concurrent batches
+    async def batch(self, calls):
+        requests = []
+        for method, params in calls:
+            self._next_id += 1
+            requests.append({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params})
+
+        batches = [requests[i:i + self.batch_size] for i in range(0, len(requests), self.batch_size)]
+        results = await asyncio.gather(*(self._send(batch) for batch in batches))
+        return [result for batch in results for result in batch]
+
+    async def call(self, method, *params):
+        return (await self.batch([(method, list(params))]))[0]
+
+    def close(self):
+        for connection in self._opened:
+            connection.close()
+        self._opened = set()
+
+
+class Snapshotter:
+    # the state of the validators from StakeHub, ValidatorSet and SlashIndicator, every call at the same block
+    def __init__(self, client, index, page_size=100):
+        self.client = client
+        self.index = index
+        self.page_size = page_size
+
+    async def eth_calls(self, block, calls):
+        requests = []
+        decoders = []
+        for address, contract, name, args in calls:
+            data, decoder = self.index.encode_call(contract, name, *args)
+            requests.append(("eth_call", [{"to": address, "data": "0x" + data.hex()}, block]))
+            decoders.append(decoder)
+
+        results = await self.client.batch(requests)
+        return [decoder.decode_output(bytes.fromhex(result[2:])) for decoder, result in zip(decoders, results)]
+
+    async def paginate(self, block, name):
+        # the first page gives the total length, the other pages are fetched concurrently
+        first = (await self.eth_calls(block, [(STAKE_HUB_ADDR, "StakeHub", name, (0, self.page_size))]))[0]
+        total = first[-1]
+        offsets = range(self.page_size, total, self.page_size)
+        pages = [first] + await self.eth_calls(
+            block, [(STAKE_HUB_ADDR, "StakeHub", name, (offset, self.page_size)) for offset in offsets]
+        )
+        columns = [[] for _ in first[:-1]]
+        for page in pages:
+            for column, values in zip(columns, page[:-1]):
+                column.extend(values)
+        return columns
+
+    async def snapshot(self, block=None):
+        if block is None:
+            block = await self.client.call("eth_blockNumber")
+        chain_id, header = await self.client.batch([("eth_chainId", []), ("eth_getBlockByNumber", [block, False])])
+
+        validators, election, living = await asyncio.gather(
+            self.paginate(block, "getValidators"),
+            self.paginate(block, "getValidatorElectionInfo"),
+            self.eth_calls(block, [(VALIDATOR_CONTRACT_ADDR, "ValidatorSet", "getLivingValidators", ())]),
+        )
+        operators, credits = validators
+        consensus_addrs, voting_powers, vote_addrs = election
+
+        per_validator = []
+        for operator, credit, consensus in zip(operators, credits, consensus_addrs):
+            per_validator += [
+                (STAKE_HUB_ADDR, "StakeHub", "getValidatorCommission", (operator,)),
+                (STAKE_HUB_ADDR, "StakeHub", "getValidatorBasicInfo", (operator,)),
+                (credit, "StakeCredit", "totalPooledToken", ()),
+                (credit, "StakeCredit", "totalSupply", ()),
+                (SLASH_CONTRACT_ADDR, "SlashIndicator", "getSlashIndicator", (consensus,)),
+            ]
+        results = await self.eth_calls(block, per_validator)
+        commissions, basic_infos, pooled_tokens, supplies, indicators = (results[i::5] for i in range(5))
+
+        living_consensus, living_votes = living[0]
+        return {
+            "version": SNAPSHOT_VERSION,
+            "chainId": int(chain_id, 16),
+            "block": int(block, 16),
+            "blockHash": header and header["hash"],
+            "timestamp": header and int(header["timestamp"], 16),
+            # one column per field, one row per validator of StakeHub in its order
+            "validators": {
+                "operator": list(operators),
+                "consensus": list(consensus_addrs),
+                "credit": list(credits),
+                "voteAddress": ["0x" + v.hex() for v in vote_addrs],
+                "votingPower": [str(v) for v in voting_powers],
+                "commissionRate": [c[0][0] for c in commissions],
+                "commissionMaxRate": [c[0][1] for c in commissions],
+                "commissionMaxChangeRate": [c[0][2] for c in commissions],
+                "createdTime": [info[0] for info in basic_infos],
+                "jailed": [info[1] for info in basic_infos],
+                "jailUntil": [info[2] for info in basic_infos],
+                "totalPooledToken": [str(p[0]) for p in pooled_tokens],
+                "totalSupply": [str(s[0]) for s in supplies],
+                "slashHeight": [i[0] for i in indicators],
+                "slashCount": [i[1] for i in indicators],
+            },
+            "living": {
+                "consensus": list(living_consensus),
+                "voteAddress": ["0x" + v.hex() for v in living_votes],
+            },
+        }
+
+
+def write_snapshot(path, snapshot):
+    data = json.dumps(snapshot, separators=(",", ":")).encode()
+    if path.endswith(".gz"):
+        data = gzip.compress(data)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def read_snapshot(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".gz"):
+        data = gzip.decompress(data)
+    snapshot = json.loads(data)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise Exception(f"Unsupported snapshot version {snapshot.get('version')} of '{path}'")
+    return snapshot
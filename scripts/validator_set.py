@@ -0,0 +1,341 @@
+import functools
+import json
+import os
+import re
+import struct
+from typing import NamedTuple
+
+# package type of a validator set update, see ValidatorSet.sol
+VALIDATORS_UPDATE_MESSAGE_TYPE = 0
+
+EXTRA_VANITY_LENGTH = 32
+EXTRA_SEAL_LENGTH = 65
+ADDRESS_LENGTH = 20
+BLS_PUBLIC_KEY_LENGTH = 48
+
+
+class Validator(NamedTuple):
+    consensus_addr: bytes
+    fee_addr: bytes
+    bbc_fee_addr: bytes
+    voting_power: int
+    bls_public_key: bytes
+
+
+_address_pattern = re.compile(r"^0x[0-9a-fA-F]{40}$")
+_bls_key_pattern = re.compile(r"^0x[0-9a-fA-F]{%d}$" % (BLS_PUBLIC_KEY_LENGTH * 2))
+
+# order of the fields in validators.conf
+CONFIG_FIELDS = ("consensusAddr", "feeAddr", "bbcFeeAddr", "votingPower", "bLSPublicKey")
+
+# packed binary format: magic, then fixed size records
+PACKED_MAGIC = b"H2VS\x01"
+PACKED_RECORD = struct.Struct(">20s20s20sQ48s")
+
+MAX_VOTING_POWER = 2 ** 64 - 1
+
+
+# rows usually repeat the same address for the consensus and fee addresses
+@functools.lru_cache(maxsize=1024)
+def to_checksum_address(addr):
+    from eth_hash.auto import keccak
+
+    hex_addr = addr.hex()
+    digest = keccak(hex_addr.encode()).hex()
+    return "0x" + "".join(c.upper() if d in "89abcdef" else c for c, d in zip(hex_addr, digest))
+
+
+def parse_address(value):
+    if not _address_pattern.match(value):
+        raise ValueError(f"invalid address {value}")
+    addr = bytes.fromhex(value[2:])
+    # mixed case addresses must carry a valid EIP-55 checksum
+    if value[2:] not in (value[2:].lower(), value[2:].upper()) and to_checksum_address(addr) != value:
+        raise ValueError(f"invalid address checksum {value}")
+    return addr
+
+
+def parse_bls_public_key(value):
+    if not _bls_key_pattern.match(value):
+        raise ValueError(f"BLS public key must be {BLS_PUBLIC_KEY_LENGTH} bytes, got {value}")
+    return bytes.fromhex(value[2:])
+
+
+def parse_voting_power(value):
+    try:
+        voting_power = value if isinstance(value, int) else int(value, 0)
+    except ValueError:
+        raise ValueError(f"invalid voting power {value}")
+    if not 0 < voting_power <= MAX_VOTING_POWER:
+        raise ValueError(f"voting power {voting_power} out of range")
+    return voting_power
+
+
+def parse_validator(v):
+    return Validator(
+        parse_address(v["consensusAddr"]),
+        parse_address(v["feeAddr"]),
+        parse_address(v["bbcFeeAddr"]),
+        parse_voting_power(v["votingPower"]),
+        parse_bls_public_key(v["bLSPublicKey"]),
+    )
+
+
+def _csv_rows(f):
+    for line_no, line in enumerate(f, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        vs = [v.strip() for v in line.split(",")]
+        if len(vs) != len(CONFIG_FIELDS):
+            yield line_no, ValueError(f"expected {len(CONFIG_FIELDS)} comma separated fields: {line}")
+        else:
+            yield line_no, dict(zip(CONFIG_FIELDS, vs))
+
+
+# the voting power may be a JSON number, the other fields are strings like in the CSV rows
+def _check_json_types(row):
+    for field, value in row.items():
+        if field == "votingPower" and isinstance(value, int) and not isinstance(value, bool):
+            continue
+        if not isinstance(value, str):
+            expected = "string or an integer" if field == "votingPower" else "string"
+            raise TypeError(f"{field} must be a {expected}, got {json.dumps(value)}")
+    return row
+
+
+def _jsonl_rows(f):
+    for line_no, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            yield line_no, _check_json_types({field: row[field] for field in CONFIG_FIELDS})
+        except (ValueError, KeyError, TypeError) as e:
+            yield line_no, ValueError(f"invalid JSON validator: {e}")
+
+
+def _packed_validators(f):
+    if f.read(len(PACKED_MAGIC)) != PACKED_MAGIC:
+        raise Exception("Invalid packed validators file")
+    record_no = 0
+    while True:
+        record = f.read(PACKED_RECORD.size)
+        if not record:
+            return
+        record_no += 1
+        if len(record) != PACKED_RECORD.size:
+            yield record_no, ValueError("truncated record")
+            return
+        consensus_addr, fee_addr, bbc_fee_addr, voting_power, bls_public_key = PACKED_RECORD.unpack(record)
+        yield record_no, Validator(consensus_addr, fee_addr, bbc_fee_addr, voting_power, bls_public_key)
+
+
+def detect_format(path):
+    if path.endswith(".jsonl"):
+        return "jsonl"
+    if path.endswith(".bin"):
+        return "bin"
+    return "csv"
+
+
+# stream the validators of a file, validating every row and rejecting duplicated consensus/vote addresses
+def read_validators(path, fmt=None, max_errors=20):
+    fmt = fmt or detect_format(path)
+    if fmt not in ("csv", "jsonl", "bin"):
+        raise Exception(f"Unsupported validators format: {fmt}")
+
+    consensus_addrs = {}
+    vote_addrs = {}
+    errors = []
+    with open(path, "rb" if fmt == "bin" else "r") as f:
+        rows = {"csv": _csv_rows, "jsonl": _jsonl_rows, "bin": _packed_validators}[fmt](f)
+        for row_no, row in rows:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                v = row if isinstance(row, Validator) else parse_validator(row)
+                if fmt == "bin":
+                    parse_voting_power(v.voting_power)
+
+                if v.consensus_addr in consensus_addrs:
+                    raise ValueError(
+                        f"duplicated consensus address {to_checksum_address(v.consensus_addr)}, "
+                        f"first seen at {consensus_addrs[v.consensus_addr]}"
+                    )
+                if v.bls_public_key in vote_addrs:
+                    raise ValueError(
+                        f"duplicated vote address 0x{v.bls_public_key.hex()}, "
+                        f"first seen at {vote_addrs[v.bls_public_key]}"
+                    )
+                consensus_addrs[v.consensus_addr] = row_no
+                vote_addrs[v.bls_public_key] = row_no
+            except ValueError as e:
+                errors.append(f"{path}:{row_no}: {e}")
+                if len(errors) >= max_errors:
+                    break
+                continue
+
+            if not errors:
+                yield v
+
+    if errors:
+        raise Exception("Invalid validator info:\n" + "\n".join(errors))
+
+
+# write validators incrementally, the output is only moved in place once every row is valid
+def write_validators(path, validators, fmt=None):
+    fmt = fmt or detect_format(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    count = 0
+    try:
+        with open(tmp_path, "wb" if fmt == "bin" else "w") as f:
+            if fmt == "bin":
+                f.write(PACKED_MAGIC)
+            for v in validators:
+                if fmt == "bin":
+                    f.write(PACKED_RECORD.pack(*v))
+                elif fmt == "jsonl":
+                    f.write(json.dumps(to_json(v)) + "\n")
+                elif fmt == "csv":
+                    row = to_json(v)
+                    f.write(",".join(str(row[field]) for field in CONFIG_FIELDS) + "\n")
+                else:
+                    raise Exception(f"Unsupported validators format: {fmt}")
+                count += 1
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+class ValidatorsView:
+    # re-iterable validators of a file for templates, every iteration streams the file again
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = fmt
+
+    def __iter__(self):
+        for v in read_validators(self.path, self.fmt):
+            yield to_json(v)
+
+
+def _int_to_bytes(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, "big")
+
+
+def _length_prefix(length, offset):
+    if length < 56:
+        return bytes([offset + length])
+    length_bytes = _int_to_bytes(length)
+    return bytes([offset + 55 + len(length_bytes)]) + length_bytes
+
+
+def _encode_bytes(value):
+    if len(value) == 1 and value[0] < 0x80:
+        return value
+    return _length_prefix(len(value), 0x80) + value
+
+
+def _encode_list(payload):
+    return _length_prefix(len(payload), 0xc0) + payload
+
+
+# rlp of [0x00, [[consensusAddr, bbcFeeAddr, feeAddr, votingPower, bLSPublicKey], ...]], same as validators.js
+def encode_package(validators):
+    vals = []
+    for v in validators:
+        fields = (v.consensus_addr, v.bbc_fee_addr, v.fee_addr, _int_to_bytes(v.voting_power), v.bls_public_key)
+        vals.append(_encode_list(b"".join(_encode_bytes(f) for f in fields)))
+
+    return _encode_list(_encode_bytes(_int_to_bytes(VALIDATORS_UPDATE_MESSAGE_TYPE)) + _encode_list(b"".join(vals)))
+
+
+def _decode_length(data, pos, offset):
+    prefix = data[pos] - offset
+    if prefix < 56:
+        return pos + 1, prefix
+    length_size = prefix - 55
+    length = int.from_bytes(data[pos + 1:pos + 1 + length_size], "big")
+    if length < 56 or data[pos + 1] == 0:
+        raise ValueError(f"non canonical length at {pos}")
+    return pos + 1 + length_size, length
+
+
+# decode the rlp item at `pos`, returns the item (bytes or nested lists) and the position after it
+def _decode_item(data, pos):
+    if pos >= len(data):
+        raise ValueError("unexpected end of data")
+    if data[pos] < 0x80:
+        return data[pos:pos + 1], pos + 1
+
+    if data[pos] < 0xc0:
+        start, length = _decode_length(data, pos, 0x80)
+        if start + length > len(data):
+            raise ValueError(f"string at {pos} exceeds the data")
+        if length == 1 and data[start] < 0x80:
+            raise ValueError(f"non canonical single byte at {pos}")
+        return data[start:start + length], start + length
+
+    start, length = _decode_length(data, pos, 0xc0)
+    end = start + length
+    if end > len(data):
+        raise ValueError(f"list at {pos} exceeds the data")
+    items = []
+    while start < end:
+        item, start = _decode_item(data, start)
+        items.append(item)
+    if start != end:
+        raise ValueError(f"list at {pos} exceeds its length")
+    return items, end
+
+
+def decode_package(data):
+    try:
+        package, end = _decode_item(data, 0)
+        if end != len(data):
+            raise ValueError("trailing bytes")
+        if not isinstance(package, list) or len(package) != 2 or not isinstance(package[1], list):
+            raise ValueError("expected [type, validators]")
+        package_type, vals = package
+    except (ValueError, TypeError) as e:
+        raise Exception(f"Invalid validator set package: {e}")
+
+    package_type = int.from_bytes(package_type, "big")
+    if package_type != VALIDATORS_UPDATE_MESSAGE_TYPE:
+        raise Exception(f"Unsupported validator set package type: {package_type}")
+
+    validators = []
+    for i, v in enumerate(vals):
+        if not isinstance(v, list) or len(v) != 5 or not all(isinstance(field, bytes) for field in v):
+            raise Exception(f"Invalid validator #{i}: expected 5 fields")
+        consensus_addr, bbc_fee_addr, fee_addr, voting_power, bls_public_key = v
+        validators.append(
+            Validator(consensus_addr, fee_addr, bbc_fee_addr, int.from_bytes(voting_power, "big"), bls_public_key)
+        )
+    return validators
+
+
+# Parlia extraData of the genesis block: 32 bytes vanity, the consensus addresses and a 65 bytes seal
+def encode_extra_data(consensus_addrs):
+    return bytes(EXTRA_VANITY_LENGTH) + b"".join(consensus_addrs) + bytes(EXTRA_SEAL_LENGTH)
+
+
+def decode_extra_data(extra_data):
+    validators_length = len(extra_data) - EXTRA_VANITY_LENGTH - EXTRA_SEAL_LENGTH
+    if validators_length < 0 or validators_length % ADDRESS_LENGTH != 0:
+        raise Exception(f"Invalid extraData length: {len(extra_data)}")
+
+    validators_bytes = extra_data[EXTRA_VANITY_LENGTH:EXTRA_VANITY_LENGTH + validators_length]
+    return [validators_bytes[i:i + ADDRESS_LENGTH] for i in range(0, validators_length, ADDRESS_LENGTH)]
+
+
+def to_json(v):
+    return {
+        "consensusAddr": to_checksum_address(v.consensus_addr),
+        "feeAddr": to_checksum_address(v.fee_addr),
+        "bbcFeeAddr": to_checksum_address(v.bbc_fee_addr),
+        "votingPower": v.voting_power,
+        "bLSPublicKey": "0x" + v.bls_public_key.hex(),
+    }
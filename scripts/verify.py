@@ -0,0 +1,120 @@
+import json
+from typing import Any, NamedTuple
+
+from scripts.holders import UniqueHolders
+
+# kinds of the differences which do not fail a verification
+WARNING_KINDS = frozenset({"metadata"})
+
+
+class Diff(NamedTuple):
+    # config, account, code, metadata, missing or unexpected
+    kind: str
+    path: str
+    expected: Any
+    actual: Any
+
+    def is_warning(self):
+        return self.kind in WARNING_KINDS
+
+    def to_json(self):
+        return self._asdict()
+
+
+def _code_bytes(code):
+    return bytes.fromhex(code[2:] if code.startswith("0x") else code)
+
+
+# solc appends the CBOR encoded metadata and its 2 bytes length to the runtime code,
+# it only holds the compiler version with bytecode_hash = 'none' but still differs between solc versions
+def strip_metadata(code):
+    if len(code) < 2:
+        return code
+    length = int.from_bytes(code[-2:], "big")
+    start = len(code) - 2 - length
+    # a CBOR map of 1 to 5 entries
+    if length == 0 or start < 0 or not 0xa1 <= code[start] <= 0xa5:
+        return code
+    return code[:start]
+
+
+def code_hash(code):
+    from eth_hash.auto import keccak
+
+    return "0x" + keccak(code).hex()
+
+
+def _address_key(address):
+    return address.lower()[2:] if address.lower().startswith("0x") else address.lower()
+
+
+def diff_fields(expected, actual, path):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in expected.keys() | actual.keys():
+            field_path = f"{path}.{key}" if path else key
+            if key not in actual:
+                yield Diff("missing", field_path, expected[key], None)
+            elif key not in expected:
+                yield Diff("unexpected", field_path, None, actual[key])
+            else:
+                yield from diff_fields(expected[key], actual[key], field_path)
+    elif expected != actual:
+        yield Diff("config", path, expected, actual)
+
+
+def diff_code(expected, actual, path):
+    expected, actual = _code_bytes(expected), _code_bytes(actual)
+    if expected == actual:
+        return
+
+    kind = "metadata" if strip_metadata(expected) == strip_metadata(actual) else "code"
+    yield Diff(kind, path, code_hash(expected), code_hash(actual))
+
+
+def diff_account(address, expected, actual):
+    path = f"alloc.{address}"
+    for key in expected.keys() | actual.keys():
+        field_path = f"{path}.{key}"
+        if key not in actual:
+            yield Diff("missing", field_path, expected[key], None)
+        elif key not in expected:
+            yield Diff("unexpected", field_path, None, actual[key])
+        elif key == "code":
+            yield from diff_code(expected[key], actual[key], field_path)
+        elif key in ("balance", "nonce"):
+            if int(expected[key], 16) != int(actual[key], 16):
+                yield Diff("account", field_path, expected[key], actual[key])
+        elif expected[key] != actual[key]:
+            yield Diff("account", field_path, expected[key], actual[key])
+
+
+def _expected_alloc(alloc, holders):
+    yield from alloc.items()
+    for key, balance in UniqueHolders(holders, alloc):
+        yield key, {"balance": hex(balance)}
+
+
+# compare a genesis file with the expected genesis dict and init holders, returns every difference found
+def verify(genesis_path, expected, holders=()):
+    with open(genesis_path, "r") as f:
+        actual = json.load(f)
+
+    diffs = sorted(
+        diff_fields(
+            {k: v for k, v in expected.items() if k != "alloc"}, {k: v for k, v in actual.items() if k != "alloc"}, ""
+        )
+    )
+
+    # index the alloc once by normalized address
+    alloc = {_address_key(address): (address, account) for address, account in actual.get("alloc", {}).items()}
+    for address, account in _expected_alloc(expected["alloc"], holders):
+        found = alloc.pop(_address_key(address), None)
+        if found is None:
+            diffs.append(Diff("missing", f"alloc.{address}", account, None))
+        else:
+            diffs.extend(sorted(diff_account(address, account, found[1])))
+
+    for address, account in alloc.values():
+        diffs.append(Diff("unexpected", f"alloc.{address}", None, account))
+
+    return diffs
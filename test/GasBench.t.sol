@@ -0,0 +1,110 @@
+pragma solidity ^0.8.10;
+
+import "./utils/Deployer.sol";
+
+/**
+ * @dev Gas of the hot paths of the system contracts for the validator set of the genesis.
+ * Run by `python -m scripts.generate gas-bench` for each validator count, every measurement is logged as
+ * `gas.<entry point>: <gas used>`.
+ */
+contract GasBenchTest is Deployer {
+    address public coinbase;
+
+    function setUp() public {
+        coinbase = block.coinbase;
+        vm.deal(coinbase, 100 ether);
+
+        // set gas price to zero to send system txs
+        vm.txGasPrice(0);
+        vm.mockCall(address(0x66), bytes(""), hex"01");
+
+        // without a fork, init the system contracts like the first blocks of the chain do
+        if (!validatorSet.alreadyInit()) {
+            validatorSet.init();
+            slashIndicator.init();
+
+            vm.startPrank(coinbase);
+            stakeHub.initialize();
+            governor.initialize();
+            govToken.initialize();
+            timelock.initialize();
+            vm.stopPrank();
+        }
+    }
+
+    function testGasGetLivingValidators() public {
+        uint256 gasBefore = gasleft();
+        validatorSet.getLivingValidators();
+        emit log_named_uint("gas.getLivingValidators", gasBefore - gasleft());
+    }
+
+    function testGasGetMiningValidators() public {
+        uint256 gasBefore = gasleft();
+        validatorSet.getMiningValidators();
+        emit log_named_uint("gas.getMiningValidators", gasBefore - gasleft());
+    }
+
+    function testGasUpdateValidatorSet() public {
+        (address[] memory consensusAddrs, bytes[] memory voteAddrs) = validatorSet.getLivingValidators();
+        uint256 n = consensusAddrs.length;
+
+        // rotate the validators, so every one of them moves in the nested loops of doUpdateState
+        address[] memory newConsensusAddrs = new address[](n);
+        uint64[] memory newVotingPowers = new uint64[](n);
+        bytes[] memory newVoteAddrs = new bytes[](n);
+        for (uint256 i; i < n; ++i) {
+            newConsensusAddrs[i] = consensusAddrs[(i + 1) % n];
+            newVotingPowers[i] = 100;
+            newVoteAddrs[i] = voteAddrs[(i + 1) % n];
+        }
+
+        vm.prank(coinbase);
+        uint256 gasBefore = gasleft();
+        validatorSet.updateValidatorSetV2(newConsensusAddrs, newVotingPowers, newVoteAddrs);
+        emit log_named_uint("gas.updateValidatorSetV2", gasBefore - gasleft());
+    }
+
+    function testGasDistributeFinalityReward() public {
+        (address[] memory consensusAddrs,) = validatorSet.getLivingValidators();
+        uint256[] memory weights = new uint256[](consensusAddrs.length);
+        for (uint256 i; i < weights.length; ++i) {
+            weights[i] = 1;
+        }
+
+        vm.deal(address(systemReward), validatorSet.MAX_SYSTEM_REWARD_BALANCE() + 1 ether);
+        vm.roll(block.number + 1);
+
+        vm.prank(coinbase);
+        uint256 gasBefore = gasleft();
+        validatorSet.distributeFinalityReward(consensusAddrs, weights);
+        emit log_named_uint("gas.distributeFinalityReward", gasBefore - gasleft());
+    }
+
+    function testGasMisdemeanor() public {
+        address validator = validatorSet.getValidators()[0];
+        uint256 threshold = slashIndicator.misdemeanorThreshold();
+
+        vm.startPrank(coinbase);
+        validatorSet.deposit{ value: 1 ether }(validator);
+        for (uint256 i = 1; i < threshold; ++i) {
+            vm.roll(block.number + 1);
+            slashIndicator.slash(validator);
+        }
+
+        // the slash reaching the threshold spreads the incoming of the validator over the others
+        vm.roll(block.number + 1);
+        uint256 gasBefore = gasleft();
+        slashIndicator.slash(validator);
+        emit log_named_uint("gas.misdemeanor", gasBefore - gasleft());
+        vm.stopPrank();
+    }
+
+    function testGasStakeHubGetValidators() public {
+        uint256 number = vm.envOr("GAS_BENCH_VALIDATORS", uint256(21));
+        _batchCreateValidators(number);
+
+        uint256 gasBefore = gasleft();
+        stakeHub.getValidators(0, number);
+        emit log_named_uint("gas.getValidators", gasBefore - gasleft());
+    }
+}
@@ -0,0 +1,67 @@
+pragma solidity ^0.8.10;
+
+import "forge-std/Test.sol";
+
+/**
+ * @dev Runs the init calls of the first block on the system contracts of a genesis and writes the storage they leave,
+ * one `<address> <slot> <value>` line per written slot. Run by `python -m scripts.generate` with `--precompute-init`,
+ * the system contracts are read from `GENESIS_INIT_INPUT` and the storage is written to `GENESIS_INIT_OUTPUT`.
+ */
+contract GenesisInitTest is Test {
+    address public constant VALIDATOR_CONTRACT_ADDR = 0x0000000000000000000000000000000000001000;
+    address public constant SLASH_CONTRACT_ADDR = 0x0000000000000000000000000000000000001001;
+    address public constant STAKE_HUB_ADDR = 0x0000000000000000000000000000000000001004;
+    address public constant GOVERNOR_ADDR = 0x0000000000000000000000000000000000001006;
+    address public constant GOV_TOKEN_ADDR = 0x0000000000000000000000000000000000001007;
+    address public constant TIMELOCK_ADDR = 0x0000000000000000000000000000000000001008;
+
+    function testPrecomputeInit() public {
+        // only run by --precompute-init, a plain `forge test` has nothing to precompute
+        string memory inputPath = vm.envOr("GENESIS_INIT_INPUT", string(""));
+        string memory output = vm.envOr("GENESIS_INIT_OUTPUT", string(""));
+        if (bytes(inputPath).length == 0 || bytes(output).length == 0) {
+            return;
+        }
+
+        string memory input = vm.readFile(inputPath);
+        address[] memory addrs = vm.parseJsonAddressArray(input, ".addresses");
+        bytes[] memory codes = vm.parseJsonBytesArray(input, ".codes");
+        for (uint256 i; i < addrs.length; ++i) {
+            vm.etch(addrs[i], codes[i]);
+        }
+
+        // the system txs of the node: sent by the block producer with a zero gas price
+        address coinbase = vm.parseJsonAddress(input, ".coinbase");
+        vm.roll(vm.parseJsonUint(input, ".block"));
+        vm.coinbase(coinbase);
+        vm.txGasPrice(0);
+
+        vm.record();
+        vm.startPrank(coinbase, coinbase);
+        _init(VALIDATOR_CONTRACT_ADDR, "init()");
+        _init(SLASH_CONTRACT_ADDR, "init()");
+        _init(STAKE_HUB_ADDR, "initialize()");
+        _init(GOVERNOR_ADDR, "initialize()");
+        _init(GOV_TOKEN_ADDR, "initialize()");
+        _init(TIMELOCK_ADDR, "initialize()");
+        vm.stopPrank();
+
+        for (uint256 i; i < addrs.length; ++i) {
+            (, bytes32[] memory writes) = vm.accesses(addrs[i]);
+            for (uint256 j; j < writes.length; ++j) {
+                bytes32 value = vm.load(addrs[i], writes[j]);
+                vm.writeLine(
+                    output,
+                    string.concat(vm.toString(addrs[i]), " ", vm.toString(writes[j]), " ", vm.toString(value))
+                );
+            }
+        }
+    }
+
+    function _init(address target, string memory signature) internal {
+        (bool success, bytes memory result) = target.call(abi.encodeWithSignature(signature));
+        if (!success) {
+            revert(string.concat(vm.toString(target), ".", signature, " failed: ", vm.toString(result)));
+        }
+    }
+}
@@ -0,0 +1,168 @@
+pragma solidity ^0.8.10;
+
+import "./utils/Deployer.sol";
+
+/**
+ * @dev Checks the contracts against the off-chain simulator of `scripts/simulator.py` on the cases of
+ * `test/simulator-fixtures.json`, regenerate them with `python -m scripts.generate simulator-fixtures`.
+ */
+contract SimulatorTest is Deployer {
+    event finalityRewardDeposit(address indexed validator, uint256 amount);
+    event validatorDeposit(address indexed validator, uint256 amount);
+
+    string public fixtures;
+    address public coinbase;
+
+    function setUp() public {
+        fixtures = vm.readFile(string.concat(vm.projectRoot(), "/test/simulator-fixtures.json"));
+
+        // add operator
+        _updateParamByGovHub("addOperator", abi.encodePacked(address(validatorSet)), address(systemReward));
+
+        coinbase = block.coinbase;
+        vm.deal(coinbase, 100 ether);
+
+        // set gas price to zero to send system txs
+        vm.txGasPrice(0);
+        vm.mockCall(address(0x66), bytes(""), hex"01");
+    }
+
+    function testStakeCreditFixtures() public {
+        uint256 count = vm.parseJsonUint(fixtures, ".stakeCreditCount");
+        for (uint256 i; i < count; ++i) {
+            string memory case_ = string.concat(".stakeCredit[", vm.toString(i), "]");
+            uint256 initAmount = vm.parseJsonUint(fixtures, string.concat(case_, ".initAmount"));
+            uint64 commissionRate = uint64(vm.parseJsonUint(fixtures, string.concat(case_, ".commissionRate")));
+            (address operatorAddress, address consensusAddress, address credit) =
+                _createValidator(initAmount, commissionRate);
+
+            // reward distributed by the validator set at the breathe block
+            uint256 reward = vm.parseJsonUint(fixtures, string.concat(case_, ".reward"));
+            vm.deal(VALIDATOR_CONTRACT_ADDR, VALIDATOR_CONTRACT_ADDR.balance + reward);
+            vm.prank(VALIDATOR_CONTRACT_ADDR);
+            stakeHub.distributeReward{ value: reward }(consensusAddress);
+
+            uint256[] memory delegations = vm.parseJsonUintArray(fixtures, string.concat(case_, ".delegations"));
+            uint256[] memory expectedShares =
+                vm.parseJsonUintArray(fixtures, string.concat(case_, ".expectedShares"));
+            for (uint256 j; j < delegations.length; ++j) {
+                address delegator = _getNextUserAddress();
+                vm.prank(delegator);
+                stakeHub.delegate{ value: delegations[j] }(operatorAddress, false);
+                assertEq(IStakeCredit(credit).balanceOf(delegator), expectedShares[j], "wrong shares");
+            }
+            _assertTotals(credit, case_, ".expectedTotalSupply", ".expectedTotalPooledToken");
+
+            uint256 slashAmount = vm.parseJsonUint(fixtures, string.concat(case_, ".slashAmount"));
+            vm.prank(STAKE_HUB_ADDR);
+            uint256 slashed = IStakeCredit(credit).slash(slashAmount);
+            assertEq(slashed, vm.parseJsonUint(fixtures, string.concat(case_, ".expectedSlashed")), "wrong slashed");
+            _assertTotals(credit, case_, ".expectedTotalSupplyAfterSlash", ".expectedTotalPooledTokenAfterSlash");
+        }
+    }
+
+    function testDepositFixtures() public {
+        address validator0 = validatorSet.getValidators()[0];
+
+        // the first deposit includes the system reward, the ratios can be updated after it
+        vm.prank(coinbase);
+        validatorSet.deposit{ value: 1 ether }(validator0);
+        _updateParamByGovHub("systemRewardAntiMEVRatio", abi.encode(uint256(0)), address(validatorSet));
+
+        uint256 count = vm.parseJsonUint(fixtures, ".depositCount");
+        for (uint256 i; i < count; ++i) {
+            string memory case_ = string.concat(".deposit[", vm.toString(i), "]");
+            uint256 value = vm.parseJsonUint(fixtures, string.concat(case_, ".value"));
+
+            _updateParamByGovHub("burnRatio", abi.encode(uint256(0)), address(validatorSet));
+            _updateParamByGovHub(
+                "systemRewardBaseRatio",
+                abi.encode(vm.parseJsonUint(fixtures, string.concat(case_, ".systemRewardRatio"))),
+                address(validatorSet)
+            );
+            _updateParamByGovHub(
+                "burnRatio",
+                abi.encode(vm.parseJsonUint(fixtures, string.concat(case_, ".burnRatio"))),
+                address(validatorSet)
+            );
+
+            vm.deal(coinbase, coinbase.balance + value);
+            vm.expectEmit(true, false, false, true, address(validatorSet));
+            emit validatorDeposit(validator0, vm.parseJsonUint(fixtures, string.concat(case_, ".expectedIncoming")));
+            vm.prank(coinbase);
+            validatorSet.deposit{ value: value }(validator0);
+        }
+    }
+
+    function testFinalityRewardFixtures() public {
+        address[] memory validators = validatorSet.getValidators();
+        uint256 ceil = validatorSet.MAX_SYSTEM_REWARD_BALANCE();
+
+        uint256 count = vm.parseJsonUint(fixtures, ".finalityRewardCount");
+        for (uint256 i; i < count; ++i) {
+            string memory case_ = string.concat(".finalityReward[", vm.toString(i), "]");
+            uint256[] memory weights = vm.parseJsonUintArray(fixtures, string.concat(case_, ".weights"));
+            uint256[] memory expectedRewards =
+                vm.parseJsonUintArray(fixtures, string.concat(case_, ".expectedRewards"));
+
+            address[] memory addrs = new address[](weights.length);
+            for (uint256 j; j < weights.length; ++j) {
+                addrs[j] = validators[j];
+            }
+
+            vm.deal(address(systemReward), ceil + vm.parseJsonUint(fixtures, string.concat(case_, ".excess")));
+            vm.roll(block.number + 1);
+            for (uint256 j; j < weights.length; ++j) {
+                vm.expectEmit(true, false, false, true, address(validatorSet));
+                emit finalityRewardDeposit(addrs[j], expectedRewards[j]);
+            }
+            vm.prank(coinbase);
+            validatorSet.distributeFinalityReward(addrs, weights);
+        }
+    }
+
+    function _createValidator(
+        uint256 initAmount,
+        uint64 commissionRate
+    ) internal returns (address operatorAddress, address consensusAddress, address credit) {
+        operatorAddress = _getNextUserAddress();
+        vm.deal(operatorAddress, initAmount);
+        StakeHub.Commission memory commission =
+            StakeHub.Commission({ rate: commissionRate, maxRate: 5_000, maxChangeRate: 5_000 });
+        StakeHub.Description memory description = StakeHub.Description({
+            moniker: string.concat("S", vm.toString(uint24(uint160(operatorAddress)))),
+            identity: vm.toString(operatorAddress),
+            website: vm.toString(operatorAddress),
+            details: vm.toString(operatorAddress)
+        });
+        bytes memory voteAddress = bytes.concat(
+            hex"00000000000000000000000000000000000000000000000000000000", abi.encodePacked(operatorAddress)
+        );
+        consensusAddress = address(uint160(uint256(keccak256(voteAddress))));
+
+        // the whole init amount, the lock amount included, bootstraps the credit contract
+        vm.prank(operatorAddress);
+        stakeHub.createValidator{ value: initAmount }(
+            consensusAddress, voteAddress, new bytes(96), commission, description
+        );
+        credit = stakeHub.getValidatorCreditContract(operatorAddress);
+    }
+
+    function _assertTotals(
+        address credit,
+        string memory case_,
+        string memory totalSupplyKey,
+        string memory totalPooledTokenKey
+    ) internal {
+        assertEq(
+            IStakeCredit(credit).totalSupply(),
+            vm.parseJsonUint(fixtures, string.concat(case_, totalSupplyKey)),
+            "wrong total supply"
+        );
+        assertEq(
+            IStakeCredit(credit).totalPooledToken(),
+            vm.parseJsonUint(fixtures, string.concat(case_, totalPooledTokenKey)),
+            "wrong total pooled token"
+        );
+    }
+}
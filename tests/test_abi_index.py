@@ -0,0 +1,183 @@
+import json
+import os
+
+import pytest
+from eth_abi import encode
+from eth_hash.auto import keccak
+
+from scripts import abi_index
+from scripts.abi_index import AbiIndex
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+TEST_ABI = [
+    {
+        "type": "event", "name": "Mixed", "anonymous": False,
+        "inputs": [
+            {"name": "who", "type": "address", "indexed": True},
+            {"name": "tag", "type": "string", "indexed": True},
+            {"name": "small", "type": "uint64", "indexed": False},
+            {"name": "big", "type": "int256", "indexed": False},
+            {"name": "id", "type": "bytes32", "indexed": False},
+            {"name": "note", "type": "string", "indexed": False},
+            {"name": "values", "type": "uint256[]", "indexed": False},
+            {
+                "name": "pair", "type": "tuple", "indexed": False,
+                "components": [{"name": "a", "type": "uint256"}, {"name": "b", "type": "address"}],
+            },
+            {"name": "flag", "type": "bool", "indexed": False},
+            {"name": "block_number", "type": "int64", "indexed": False},
+        ],
+    },
+    {
+        "type": "function", "name": "submit", "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "validator", "type": "address"},
+            {"name": "amount", "type": "uint256"},
+            {"name": "votes", "type": "bytes[]"},
+        ],
+        "outputs": [{"name": "", "type": "bool"}, {"name": "", "type": "uint64[]"}],
+    },
+]
+
+MIXED = "Mixed(address,string,uint64,int256,bytes32,string,uint256[],(uint256,address),bool,int64)"
+MIXED_DATA_TYPES = ["uint64", "int256", "bytes32", "string", "uint256[]", "(uint256,address)", "bool", "int64"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    abi_dir = tmp_path / "abi"
+    abi_dir.mkdir()
+    (abi_dir / "Test.abi").write_text(json.dumps(TEST_ABI))
+    (abi_dir / "errors.json").write_text("{}")
+    return AbiIndex(abi_index.build(str(abi_dir)))
+
+
+def address(i):
+    return bytes([i]) * 20
+
+
+def mixed_log(i, as_hex=True):
+    tag = f"tag {i}"
+    values = (
+        2 ** 64 - i, -(2 ** 200) + i, bytes([i]) * 32, "é" * i, list(range(i)),
+        (2 ** 255 + i, "0x" + address(i + 1).hex()), i % 2 == 0, -i,
+    )
+    log = {
+        "topics": [keccak(MIXED.encode()), b"\0" * 12 + address(i), keccak(tag.encode())],
+        "data": encode(MIXED_DATA_TYPES, values),
+        "blockNumber": 100 + i,
+        "logIndex": i,
+        "transactionHash": bytes([i]) * 32,
+        "address": address(0xaa),
+    }
+    if as_hex:
+        log = {
+            key: ["0x" + t.hex() for t in value] if key == "topics"
+            else hex(value) if isinstance(value, int) else "0x" + value.hex()
+            for key, value in log.items()
+        }
+    return log, tag, values
+
+
+def test_index_of_the_system_contracts():
+    index = AbiIndex(abi_index.build(os.path.join(ROOT, "abi")))
+
+    get_validators = index.function("0xb7ab4db5")
+    assert (get_validators.name, get_validators.signature) == ("getValidators", "getValidators()")
+    assert get_validators.contracts == ["ValidatorSet"] and get_validators.outputs == ["address[]"]
+    # the calldata is looked up by its first 4 bytes
+    assert index.function(bytes.fromhex("f340fa01") + bytes(32)).signature == "deposit(address)"
+
+    slashed = index.event("0xddb6012116e51abf5436d956a4f0ebd927e92c576ff96d7918290c8782291e3e")
+    assert (slashed.signature, slashed.contracts) == ("validatorSlashed(address)", ["SlashIndicator"])
+    param_change = index.event(keccak(b"paramChange(string,bytes)"))
+    assert {"ValidatorSet", "SlashIndicator"} <= set(param_change.contracts)
+    assert index.event(bytes(32)) is None
+
+
+def test_fields(index):
+    decoder = index.event(keccak(MIXED.encode()))
+    assert decoder.signature == MIXED
+    # the static tuple takes 2 words of the head, the parameter named like a log column is renamed
+    assert [(f["name"], f["kind"], f.get("head")) for f in decoder.fields] == [
+        ("who", "address", None), ("tag", "hash", None), ("small", "uint64", 0), ("big", "int256", 1),
+        ("id", "bytes32", 2), ("note", "dynamic", 3), ("values", "dynamic", 4), ("pair", "dynamic", 5),
+        ("flag", "bool", 7), ("block_number_", "int64", 8),
+    ]
+    assert decoder.head_words == 9
+
+
+@pytest.mark.parametrize("as_hex", [True, False])
+def test_decode_logs(index, as_hex):
+    logs = [mixed_log(i, as_hex) for i in range(1, 6)]
+    unknown = {"topics": ["0x" + "11" * 32], "data": "0x"}
+    raw_logs = [log for log, _, _ in logs]
+    batches = list(index.decode_logs(raw_logs[:3] + [unknown] + raw_logs[3:], 2))
+
+    assert [list(batch) for batch in batches] == [[MIXED], [MIXED, None], [MIXED]]
+    assert batches[1][None] == [unknown]
+    rows = abi_index.np.concatenate([batch[MIXED] for batch in batches])
+
+    for i, (row, (log, tag, values)) in enumerate(zip(rows, logs), 1):
+        small, big, id_, note, numbers, pair, flag, negative = values
+        assert bytes(row["who"]) == address(i) and bytes(row["tag"]) == keccak(tag.encode())
+        assert (int(row["small"]), row["big"], bytes(row["id"]), row["note"]) == (small, big, id_, note)
+        assert (list(row["values"]), row["pair"], bool(row["flag"]), int(row["block_number_"])) == (
+            numbers, pair, flag, negative
+        )
+        assert (int(row["block_number"]), int(row["log_index"])) == (100 + i, i)
+        assert bytes(row["transaction_hash"]) == bytes([i]) * 32 and bytes(row["log_address"]) == address(0xaa)
+
+        # the per-log reference decoding gives the same values
+        signature, reference = abi_index.decode_log_reference(index, log)
+        assert signature == MIXED
+        assert reference["tag"] == keccak(tag.encode()) and reference["note"] == note
+        assert (reference["small"], reference["big"], reference["pair"]) == (small, big, pair)
+
+
+def test_truncated_log_data(index):
+    log, _, _ = mixed_log(1, as_hex=False)
+    log["data"] = log["data"][:32 * 4]
+    with pytest.raises(Exception, match="Truncated ABI encoded data"):
+        list(index.decode_logs([log]))
+
+
+def test_encode_call_and_decode_output_round_trip(index):
+    votes = [b"\x01" * 48, b"", b"\x02" * 3]
+    calldata, decoder = index.encode_call("Test", "submit", "0x" + address(7).hex(), 10 ** 30, votes)
+
+    assert calldata[:4] == keccak(b"submit(address,uint256,bytes[])")[:4]
+    assert index.function(calldata) is decoder
+
+    # the calldata decoded back by selector, as bytes and as a `0x` hex string
+    other = "0x" + keccak(b"other()")[:4].hex()
+    for calls in ([calldata], ["0x" + calldata.hex(), other]):
+        batch = next(index.decode_calls(calls))
+        rows = batch["submit(address,uint256,bytes[])"]
+        assert bytes(rows["validator"][0]) == address(7)
+        assert (rows["amount"][0], list(rows["votes"][0])) == (10 ** 30, votes)
+    assert batch[None] == [other]
+
+    output = encode(decoder.outputs, (True, [1, 2 ** 64 - 1]))
+    assert decoder.decode_output(output) == (True, (1, 2 ** 64 - 1))
+
+    with pytest.raises(Exception, match="Unknown function Test.missing"):
+        index.encode_call("Test", "missing")
+
+
+def test_load_from_the_cache(tmp_path, monkeypatch):
+    abi_dir = tmp_path / "abi"
+    abi_dir.mkdir()
+    (abi_dir / "Test.abi").write_text(json.dumps(TEST_ABI))
+    cache_dir = str(tmp_path / "cache")
+
+    first = AbiIndex.load(str(abi_dir), cache_dir)
+    monkeypatch.setattr(abi_index, "build", lambda abi_dir: pytest.fail("the index was not cached"))
+    second = AbiIndex.load(str(abi_dir), cache_dir)
+    assert second.events.keys() == first.events.keys() and second.functions.keys() == first.functions.keys()
+
+    # a changed ABI is a new key
+    (abi_dir / "Test.abi").write_text(json.dumps(TEST_ABI[1:]))
+    monkeypatch.undo()
+    assert not AbiIndex.load(str(abi_dir), cache_dir).events
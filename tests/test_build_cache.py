@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+from scripts import build_cache
+
+FOUNDRY_TOML = """[profile.default]
+src = 'contracts'
+remappings = [
+    'dep/=lib/dep/src/',
+    'contracts/:scoped/=lib/scoped-a/',
+    'scoped/=lib/scoped-b/',
+]
+"""
+
+
+def write(root, path, content):
+    path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = str(tmp_path)
+    write(root, "foundry.toml", FOUNDRY_TOML)
+    write(root, "lib/dep/src/Dep.sol", "contract Dep {}\n")
+    write(root, "node_modules/@scope/pkg/Pkg.sol", 'import "./Inner.sol";\n')
+    write(root, "node_modules/@scope/pkg/Inner.sol", "contract Inner {}\n")
+    write(root, "lib/scoped-a/A.sol", "contract A {}\n")
+    write(root, "lib/scoped-b/A.sol", "contract B {}\n")
+    source = write(
+        root,
+        "contracts/Main.sol",
+        'import "dep/Dep.sol";\nimport {Pkg} from "@scope/pkg/Pkg.sol";\n'
+        'import "./Local.sol";\nimport "scoped/A.sol";\n',
+    )
+    write(root, "contracts/Local.sol", "contract Local {}\n")
+    return root, source
+
+
+def key(root, source):
+    return build_cache.source_key(root, source, build_cache.compiler_settings(root))
+
+
+def test_remappings_longest_context_first(project):
+    root, _ = project
+    remappings = build_cache.load_remappings(root)
+    assert remappings[0] == ("contracts/", "scoped/", "lib/scoped-a/")
+    assert ("", "dep/", "lib/dep/src/") in remappings
+
+
+def test_source_closure_resolves_remappings_libraries_and_relative_imports(project):
+    root, source = project
+    files = {os.path.relpath(path, root) for path, _ in build_cache.source_closure(root, source)}
+    assert files == {
+        "contracts/Main.sol",
+        "contracts/Local.sol",
+        "lib/dep/src/Dep.sol",
+        "lib/scoped-a/A.sol",
+        "node_modules/@scope/pkg/Pkg.sol",
+        "node_modules/@scope/pkg/Inner.sol",
+    }
+
+
+@pytest.mark.parametrize(
+    "dependency", ["lib/dep/src/Dep.sol", "node_modules/@scope/pkg/Inner.sol", "lib/scoped-a/A.sol"]
+)
+def test_key_changes_with_a_dependency(project, dependency):
+    root, source = project
+    before = key(root, source)
+    write(root, dependency, "contract Changed {}\n")
+    assert key(root, source) != before
+
+
+def test_key_ignores_files_shadowed_by_a_remapping(project):
+    root, source = project
+    before = key(root, source)
+    write(root, "lib/scoped-b/A.sol", "contract Changed {}\n")
+    assert key(root, source) == before
+
+
+def test_unresolved_import_fails(project):
+    root, source = project
+    os.remove(os.path.join(root, "lib/dep/src/Dep.sol"))
+    with pytest.raises(Exception, match="Unresolved import 'dep/Dep.sol' of 'contracts/Main.sol'"):
+        key(root, source)
+
+
+def test_entries_evicted_by_another_worker_are_misses(tmp_path, monkeypatch):
+    cache = build_cache.BuildCache(str(tmp_path), max_entries=2)
+    cache.put("kind", "a", b"a")
+    utime = os.utime
+
+    # another worker evicts the entry between the read and the mark as recently used
+    def evicted_utime(path, *args, **kwargs):
+        os.remove(path)
+        return utime(path, *args, **kwargs)
+
+    monkeypatch.setattr(build_cache.os, "utime", evicted_utime)
+    assert cache.get("kind", "a") is None
+    cache.put("kind", "a", b"a")
+    assert cache.get_file("kind", "a", str(tmp_path / "a.out")) is False
+    monkeypatch.undo()
+
+    cache.put("kind", "a", b"a")
+    assert cache.get("kind", "a") == b"a"
+    assert cache.get_file("kind", "a", str(tmp_path / "a.out")) is True
+
+
+def test_eviction_skips_the_entries_removed_while_scanning(tmp_path, monkeypatch):
+    cache = build_cache.BuildCache(str(tmp_path), max_entries=2)
+    for key in ("a", "b"):
+        cache.put("kind", key, key.encode())
+        os.utime(tmp_path / "kind" / key, ns=(0, {"a": 1, "b": 2}[key]))
+    scandir = os.scandir
+
+    def racing_scandir(path):
+        entries = list(scandir(path))
+        os.remove(tmp_path / "kind" / "b")
+        return iter(entries)
+
+    monkeypatch.setattr(build_cache.os, "scandir", racing_scandir)
+    cache.put("kind", "c", b"c")
+    monkeypatch.undo()
+
+    # b vanished during the scan, a and c are the 2 entries left
+    assert sorted(os.listdir(tmp_path / "kind")) == ["a", "c"]
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+from scripts import gas_bench as bench
+
+GAS = {"getValidators": {21: 21_000, 100: 100_000}, "misdemeanor": {21: 50_000, 100: 50_000}}
+
+
+def exponents(gas):
+    return {entry: bench.growth_exponent(list(by_count.items())) for entry, by_count in gas.items()}
+
+
+def test_load_config(tmp_path):
+    path = tmp_path / "gas-bench.toml"
+    path.write_text('counts = [100, 21, 21]\nmax_increase = 0.05\n[bounds]\ngetValidators = 1\n')
+    # no baseline unless the config sets one
+    assert bench.load_config(str(path)) == ([21, 100], {"getValidators": 1.0}, 0.05, None, 0.1)
+
+    path.write_text('baseline = "other.json"\nbound_margin = 0.2\n[bounds]\n')
+    assert bench.load_config(str(path))[3:] == (str(tmp_path / "other.json"), 0.2)
+
+
+@pytest.mark.parametrize(
+    "content, error", [("counts = [21]\n[bounds]\n", "at least 2 validator counts"), ("counts = [21, 45]\n", "bounds")]
+)
+def test_invalid_config(tmp_path, content, error):
+    path = tmp_path / "gas-bench.toml"
+    path.write_text(content)
+    with pytest.raises(Exception, match=error):
+        bench.load_config(str(path))
+
+
+def test_growth_exponent():
+    assert bench.growth_exponent([(21, 21_000), (45, 45_000), (100, 100_000)]) == pytest.approx(1.0)
+    assert bench.growth_exponent([(21, 21 ** 2), (500, 500 ** 2)]) == pytest.approx(2.0)
+    assert bench.growth_exponent([(21, 7), (500, 7)]) == pytest.approx(0.0)
+
+
+def test_check_bounds_and_increase():
+    measured = exponents(GAS)
+    assert bench.check(GAS, measured, {"getValidators": 1.05, "misdemeanor": 0.5}) == []
+
+    violations = bench.check(GAS, measured, {"getValidators": 0.5, "getLivingValidators": 1.0})
+    assert violations == ["getValidators: gas grows as N^1.00, bound N^0.50", "getLivingValidators: not measured"]
+
+    previous = {"gas": {"getValidators": {"21": 21_000, "100": 90_000}}}
+    assert bench.check(GAS, measured, {}, 0.05, previous) == [
+        "getValidators: 100000 gas with 100 validators, 90000 before"
+    ]
+    assert bench.check(GAS, measured, {}, 0.2, previous) == []
+
+
+def test_baseline_round_trip_and_bounds(tmp_path):
+    path = str(tmp_path / "gas-baseline.json")
+    with pytest.raises(Exception, match="record it with `gas-bench --record-baseline`"):
+        bench.load_baseline(path)
+
+    record = bench.write_baseline(path, GAS, exponents(GAS), "abc")
+    baseline = bench.load_baseline(path)
+    assert baseline == record
+    assert baseline["gas"]["getValidators"] == {"21": 21_000, "100": 100_000}
+    assert bench.baseline_bounds(baseline, 0.1) == {"getValidators": 1.1, "misdemeanor": 0.1}
+    assert bench.check(GAS, exponents(GAS), bench.baseline_bounds(baseline, 0.1), 0.0, baseline) == []
+
+
+def test_history_is_appended_into_a_new_directory(tmp_path):
+    path = str(tmp_path / "cache" / "gas-history.jsonl")
+    assert bench.last_entry(path) is None
+
+    bench.append_entry(path, GAS, exponents(GAS))
+    last = bench.append_entry(path, {"misdemeanor": {21: 1, 100: 1}}, {"misdemeanor": 0.0}, "abc")
+    with open(path, "r") as f:
+        assert len(f.readlines()) == 2
+    assert bench.last_entry(path) == json.loads(json.dumps(last))
+
+
+@pytest.fixture
+def command(tmp_path, monkeypatch):
+    # gas-bench with the gas of GAS measured for every count, the benchmarks run in threads
+    import concurrent.futures
+
+    from typer.testing import CliRunner
+
+    from scripts import generate
+
+    (tmp_path / "test").mkdir()
+    monkeypatch.setattr(generate, "work_dir", str(tmp_path))
+    monkeypatch.setattr(generate, "git_commit", lambda: "abc")
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", concurrent.futures.ThreadPoolExecutor)
+    gas = dict(GAS)
+    monkeypatch.setattr(
+        generate, "run_gas_bench", lambda number, bench_dir: {entry: by[number] for entry, by in gas.items()}
+    )
+
+    def run(config, *args):
+        (tmp_path / "test" / "gas-bench.toml").write_text("counts = [21, 100]\nmax_increase = 0.05\n" + config)
+        return CliRunner().invoke(generate.main, ["gas-bench", *args])
+
+    return run, gas
+
+
+def test_command_without_a_baseline(tmp_path, command):
+    run, gas = command
+    result = run("[bounds]\ngetValidators = 1.05\n")
+    assert result.exit_code == 0, result.output
+    assert "WARNING" not in result.output and "within bounds" in result.output
+    assert bench.last_entry(str(tmp_path / "cache" / "gas-history.jsonl"))["gas"]["getValidators"]["100"] == 100_000
+
+    # the previous run of the local history is the reference
+    gas["misdemeanor"] = {21: 60_000, 100: 60_000}
+    result = run("[bounds]\ngetValidators = 1.05\n")
+    assert result.exit_code == 1
+    assert "misdemeanor: 60000 gas with 21 validators, 50000 before" in str(result.exception)
+
+
+def test_command_with_a_baseline(tmp_path, command):
+    run, gas = command
+    config = 'baseline = "gas-baseline.json"\n[bounds]\ngetValidators = 0.5\n'
+
+    result = run(config)
+    assert result.exit_code == 1
+    assert "Gas bench baseline" in str(result.exception) and "not found" in str(result.exception)
+
+    result = run("[bounds]\n", "--record-baseline")
+    assert result.exit_code == 0, result.output
+    assert 'Set `baseline = "gas-baseline.json"`' in result.output
+    assert bench.load_baseline(str(tmp_path / "test" / "gas-baseline.json"))["commit"] == "abc"
+
+    # the bound derived from the baseline replaces the static one, the baseline is the reference of the increase
+    result = run(config)
+    assert result.exit_code == 0, result.output
+    gas["getValidators"] = {21: 21_000, 100: 110_000}
+    result = run(config, "--no-record")
+    assert result.exit_code == 1
+    assert "getValidators: 110000 gas with 100 validators, 100000 before" in str(result.exception)
@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+from scripts import generate, genesis, release
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+def load(name):
+    with open(os.path.join(ROOT, name), "r") as f:
+        return json.load(f)
+
+
+def assemble(tmp_path, configure, committed, holders):
+    # the code of the committed genesis stands in for the compiled system contracts
+    alloc = {address.lower(): account for address, account in committed["alloc"].items()}
+    addresses = release.template_addresses(os.path.join(ROOT, genesis.TEMPLATE))
+    bytecodes = {key: alloc[address.lower()]["code"] for key, address in addresses.items()}
+
+    init_validator_set_bytes = configure()
+    output = str(tmp_path / "genesis.json")
+    extra_data = generate.genesis_extra_data(init_validator_set_bytes)
+    genesis.assemble(ROOT, generate.chain_id, extra_data, holders, output, bytecodes)
+    with open(output, "r") as f:
+        return json.load(f)
+
+
+def test_mainnet_matches_genesis_json(tmp_path):
+    committed = load("genesis.json")
+    holders = genesis.load_init_holders(os.path.join(ROOT, "scripts", "init_holders.js"))
+
+    assert assemble(tmp_path, generate.configure_mainnet, committed, holders) == committed
+
+
+def test_testnet_matches_genesis_test_json(tmp_path):
+    committed = load("genesis-test.json")
+    data = dict({key: "" for key in genesis.SYSTEM_CONTRACTS}, chainId=0, extraData="")
+    template = genesis.load_template(os.path.join(ROOT, genesis.TEMPLATE), data)
+    # the testnet was launched with its own holders, they are not the ones of scripts/init_holders.js
+    holders = [
+        (address, int(account["balance"], 16))
+        for address, account in committed["alloc"].items() if address not in template["alloc"]
+    ]
+
+    assembled = assemble(tmp_path, generate.configure_testnet, committed, holders)
+    # and with the gas limit and timestamp of the template of then
+    assert (assembled["gasLimit"], assembled["timestamp"]) == ("0x42c1d80", "0x693a8b79")
+    assert (committed["gasLimit"], committed["timestamp"]) == ("0x5f5e100", "0x690873a3")
+    # one of its holders is checksummed, the holders are written in lowercase
+    alloc = {
+        address if address in template["alloc"] else address.lower(): account
+        for address, account in committed["alloc"].items()
+    }
+    assert dict(assembled, gasLimit="0x5f5e100", timestamp="0x690873a3") == dict(committed, alloc=alloc)
+
+
+@pytest.mark.parametrize(
+    "configure, name", [(generate.configure_mainnet, "genesis.json"), (generate.configure_testnet, "genesis-test.json")]
+)
+def test_extra_data_matches(configure, name):
+    assert generate.genesis_extra_data(configure()) == load(name)["extraData"]
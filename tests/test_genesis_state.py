@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from scripts import genesis_state
+
+
+class Anvil:
+    # the JSON-RPC calls of anvil used by the init calls, the system contracts in `initialized` revert them
+    def __init__(self, initialized=(), block=1):
+        self.initialized = set(initialized)
+        self.block = block
+        self.pending = []
+        self.receipts = {}
+        self.methods = []
+
+    async def batch(self, calls):
+        return [await self.call(method, *params) for method, params in calls]
+
+    async def call(self, method, *params):
+        self.methods.append(method)
+        if method == "eth_sendTransaction":
+            tx = params[0]
+            assert (tx["from"], tx["gasPrice"]) == (genesis_state.INIT_COINBASE, "0x0")
+            self.pending.append(tx)
+            return f"0x{len(self.pending):064x}"
+        if method == "evm_mine":
+            for i, tx in enumerate(self.pending, 1):
+                status = "0x0" if tx["to"] in self.initialized else "0x1"
+                self.receipts[f"0x{i:064x}"] = {"status": status, "blockNumber": hex(self.block)}
+                self.initialized.add(tx["to"])
+            return "0x0"
+        if method == "eth_getTransactionReceipt":
+            return self.receipts.get(params[0])
+        return True
+
+
+def test_init_calls_on_the_code_only_genesis():
+    anvil = Anvil()
+    asyncio.run(genesis_state.run_init_calls(anvil))
+
+    assert anvil.methods[:3] == ["anvil_setCoinbase", "anvil_impersonateAccount", "evm_setAutomine"]
+    assert anvil.initialized == {address for address, _ in genesis_state.INIT_CALLS}
+
+
+def test_failing_init_call():
+    anvil = Anvil(initialized={"0x0000000000000000000000000000000000001004"})
+    with pytest.raises(Exception, match=r"0x0+1004\.initialize\(\) failed on the node"):
+        asyncio.run(genesis_state.run_init_calls(anvil))
+
+
+def test_init_calls_mined_into_another_block():
+    with pytest.raises(Exception, match="was mined into block 2"):
+        asyncio.run(genesis_state.run_init_calls(Anvil(block=2)))
+
+
+def test_replayed_init_calls_revert_on_the_precomputed_genesis():
+    anvil = Anvil(initialized={address for address, _ in genesis_state.INIT_CALLS})
+    assert asyncio.run(genesis_state.replay_init_calls(anvil)) == list(genesis_state.INIT_CALLS)
+
+    assert asyncio.run(genesis_state.replay_init_calls(Anvil())) == []
+
+
+def test_storage_lines(tmp_path):
+    path = tmp_path / "storage.txt"
+    path.write_text(
+        f"0x0000000000000000000000000000000000001000 0x01 0x{1:064x}\n"
+        "0x0000000000000000000000000000000000001000 0x02 0x05\n"
+        # written back to zero
+        "0x0000000000000000000000000000000000001000 0x02 0x00\n"
+        "0x0000000000000000000000000000000000001001 0x03 0x00\n"
+    )
+    storage = genesis_state.read_storage(str(path))
+    assert storage == {"0x0000000000000000000000000000000000001000": {f"0x{1:064x}": f"0x{1:064x}"}}
+
+    genesis = {
+        "alloc": {
+            "0x0000000000000000000000000000000000001000": {"balance": "0x0", "code": "0x60"},
+            "0x0000000000000000000000000000000000001001": {"balance": "0x0", "code": "0x60"},
+        }
+    }
+    genesis_state.apply_storage(genesis, storage)
+    assert genesis["alloc"]["0x0000000000000000000000000000000000001000"]["storage"] == {f"0x{1:064x}": f"0x{1:064x}"}
+    assert "storage" not in genesis["alloc"]["0x0000000000000000000000000000000000001001"]
+    assert not any("storage" in account for account in genesis_state.strip_storage(genesis)["alloc"].values())
@@ -0,0 +1,136 @@
+import io
+import json
+
+import pytest
+
+from scripts import genesis, holders
+from scripts.holders import UniqueHolders
+
+TEMPLATE = """{
+  "config": {"chainId": {{chainId}}},
+  "extraData": "{{extraData}}",
+  "alloc": {
+    "0xffffFFFfFFffffffffffffffFfFFFfffFFFfFFfE": {
+      "balance": "0x0"
+    },
+    "0x0000000000000000000000000000000000001000": {
+      "balance": "0x0",
+      "code": "{{validatorContract}}"
+    }{% for holder in initHolders %},
+    "{{ holder.address.replace('0x', '') }}": {
+      "balance": "0x{{ holder.balance }}"
+    }{% endfor %}
+  }
+}
+"""
+
+
+def write(path, content):
+    path.write_text(content)
+    return str(path)
+
+
+def test_read_holders(tmp_path):
+    path = write(
+        tmp_path / "holders.txt",
+        "# address[,balance]\n"
+        "0x00000000000000000000000000000000000000a1\n"
+        "\n"
+        "00000000000000000000000000000000000000a2, 1000\n"
+        "0x00000000000000000000000000000000000000a3,0x10\n"
+        '{"address": "0x00000000000000000000000000000000000000a4", "balance": "0x20"}\n'
+        '{"address": "0x00000000000000000000000000000000000000a5"}\n',
+    )
+    assert list(holders.read_holders(path)) == [
+        ("0x00000000000000000000000000000000000000a1", holders.DEFAULT_BALANCE),
+        ("00000000000000000000000000000000000000a2", 1000),
+        ("0x00000000000000000000000000000000000000a3", 0x10),
+        ("0x00000000000000000000000000000000000000a4", 0x20),
+        ("0x00000000000000000000000000000000000000a5", holders.DEFAULT_BALANCE),
+    ]
+
+
+def test_read_holders_from_stdin(monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("0x00000000000000000000000000000000000000a1,7\n"))
+    assert list(holders.read_holders("-")) == [("0x00000000000000000000000000000000000000a1", 7)]
+
+
+@pytest.mark.parametrize(
+    "line, error",
+    [
+        ("0x00000000000000000000000000000000000000a1,-1", "negative balance -1"),
+        ("0x00000000000000000000000000000000000000a1,ten", "invalid literal"),
+        ('{"balance": 1}', "'address'"),
+        ("{not json", "Expecting property name"),
+    ],
+)
+def test_invalid_holders(tmp_path, line, error):
+    path = write(tmp_path / "holders.txt", "0x00000000000000000000000000000000000000a1\n" + line + "\n")
+    with pytest.raises(Exception, match=f"Invalid init holder at {path}:2: .*{error}"):
+        list(holders.read_holders(path))
+
+
+def test_reserved_and_system_addresses_are_skipped():
+    rows = [
+        ("0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFE", 1),
+        ("0x0000000000000000000000000000000000000fff", 2),
+        ("0x0000000000000000000000000000000000001000", 3),
+        ("0000000000000000000000000000000000002005", 4),
+        ("0x0000000000000000000000000000000000002006", 5),
+        ("0x00000000000000000000000000000000000000A1", 6),
+    ]
+    unique = UniqueHolders(rows, reserved=["0xffffFFFfFFffffffffffffffFfFFFfffFFFfFFfE"])
+
+    assert list(unique) == [
+        ("0000000000000000000000000000000000000fff", 2),
+        ("0000000000000000000000000000000000002006", 5),
+        ("00000000000000000000000000000000000000a1", 6),
+    ]
+    assert unique.count == 3
+    assert unique.skipped == [
+        "0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFE",
+        "0x0000000000000000000000000000000000001000",
+        "0000000000000000000000000000000000002005",
+    ]
+
+
+def test_duplicated_holders_fail_whatever_their_case():
+    rows = [("0x00000000000000000000000000000000000000aB", 1), ("00000000000000000000000000000000000000AB", 2)]
+    with pytest.raises(Exception, match="Duplicated init holder: 00000000000000000000000000000000000000AB"):
+        list(UniqueHolders(rows))
+
+
+@pytest.mark.parametrize("address", ["0x1234", "0x" + "g" * 40, "0x" + "a" * 41])
+def test_invalid_addresses(address):
+    with pytest.raises(Exception, match="Invalid init holder address"):
+        list(UniqueHolders([(address, 1)]))
+
+
+def test_assemble_keeps_the_template_accounts(tmp_path):
+    (tmp_path / genesis.TEMPLATE).write_text(TEMPLATE)
+    rows = [
+        ("0xfffffffffffffffffffffffffffffffffffffffe", 10 ** 18),
+        ("0x0000000000000000000000000000000000001000", 10 ** 18),
+        ("0x00000000000000000000000000000000000000a1", 255),
+    ]
+
+    unique = genesis.assemble(str(tmp_path), 714, "0x00", rows, "genesis.json", {"validatorContract": "0x6080"})
+    assert (unique.count, len(unique.skipped)) == (1, 2)
+    with open(tmp_path / "genesis.json", "r") as f:
+        alloc = json.load(f)["alloc"]
+    assert alloc == {
+        "0xffffFFFfFFffffffffffffffFfFFFfffFFFfFFfE": {"balance": "0x0"},
+        "0x0000000000000000000000000000000000001000": {"balance": "0x0", "code": "0x6080"},
+        "00000000000000000000000000000000000000a1": {"balance": "0xff"},
+    }
+
+
+def test_duplicated_holder_keeps_the_previous_genesis(tmp_path):
+    (tmp_path / genesis.TEMPLATE).write_text(TEMPLATE)
+    (tmp_path / "genesis.json").write_text('{"previous": true}\n')
+    rows = [("0x00000000000000000000000000000000000000a1", 1), ("0x00000000000000000000000000000000000000A1", 2)]
+
+    with pytest.raises(Exception, match="Duplicated init holder"):
+        genesis.assemble(str(tmp_path), 714, "0x00", rows, "genesis.json", {"validatorContract": "0x6080"})
+    assert (tmp_path / "genesis.json").read_text() == '{"previous": true}\n'
+    assert sorted(path.name for path in tmp_path.iterdir()) == [genesis.TEMPLATE, "genesis.json"]
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+from scripts import import_profile
+from scripts.import_profile import ImportTime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# `python -X importtime -m scripts.generate`, the children are listed before their parent
+STDERR = """import time: self [us] | cumulative | imported package
+import time:       268 |        268 |   _io
+import time:       872 |       1140 | _frozen_importlib_external
+import time:       300 |        300 |   os
+import time:      2000 |       2300 | site
+import time:       185 |        185 |       click.core
+import time:       500 |        685 |     click
+import time:      4000 |       4685 |   typer.main
+import time:      1000 |       5685 | typer
+Some warning printed by an import
+import time:       700 |        700 |     numpy.core
+import time:        50 |         50 |   scripts.profiler
+import time:       400 |       1150 | scripts.gas_bench
+import time:       250 |        250 | scripts.profiler_extra
+import time:      3000 |       3000 | json
+"""
+
+
+def test_parse_import_times():
+    times = import_profile.parse_import_times(STDERR)
+
+    assert len(times) == 13
+    assert times[:2] == [ImportTime("_io", 268, 268, 1), ImportTime("_frozen_importlib_external", 872, 1140, 0)]
+    assert times[5] == ImportTime("click", 500, 685, 2)
+    assert times[6] == ImportTime("typer.main", 4000, 4685, 1)
+    assert times[8] == ImportTime("numpy.core", 700, 700, 2)
+
+
+def test_by_package():
+    times = import_profile.parse_import_times(STDERR)
+
+    # the cumulative times of the top level imports, by package and slowest first, without site
+    assert import_profile.by_package(times) == [
+        ("typer", 5685), ("json", 3000), ("scripts", 1400), ("_frozen_importlib_external", 1140)
+    ]
+
+
+def test_real_import_times_add_up():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import json"], capture_output=True, text=True)
+    times = import_profile.parse_import_times(result.stderr)
+
+    assert any(t.module == "json" and t.depth == 0 for t in times)
+    # the cumulative time of an import is its self time and the cumulative times of its children, listed before it,
+    # each of them rounded to the microsecond
+    for i, t in enumerate(times):
+        children = []
+        for child in reversed(times[:i]):
+            if child.depth <= t.depth:
+                break
+            if child.depth == t.depth + 1:
+                children.append(child)
+        assert abs(t.cumulative_us - t.self_us - sum(child.cumulative_us for child in children)) <= len(children) + 1
+
+
+def test_profile_of_the_cli():
+    code, stdout, times = import_profile.profile(["--help"], cwd=ROOT)
+
+    assert code == 0 and "verify-genesis" in stdout
+    packages = dict(import_profile.by_package(times))
+    assert "typer" in packages and "site" not in packages
+    # the heavy dependencies are only imported by the commands which use them
+    assert not {"web3", "numpy", "eth_abi", "jinja2"} & packages.keys()
+
+
+def test_summary():
+    assert import_profile.summary([0.3, 0.1, 0.2, 0.5]) == (0.1, 0.25, 0.5)
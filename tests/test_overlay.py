@@ -0,0 +1,118 @@
+import fileinput
+import os
+import re
+import shutil
+
+import pytest
+
+from scripts import generate
+from scripts.overlay import SourceOverlay
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+# the patches of the contracts as scripts/generate.py applied them before the overlay, rewriting the working tree
+def legacy_insert(contracts_dir, contract, pattern, ins):
+    pattern = re.compile(pattern)
+    found = False
+    with fileinput.FileInput(os.path.join(contracts_dir, contract), inplace=True) as file:
+        for line in file:
+            if not found and pattern.search(line):
+                print(ins)
+                found = True
+            print(line, end="")
+    if not found:
+        raise Exception(f"{pattern} not found")
+
+
+def legacy_replace(contracts_dir, contract, pattern, repl, count=1):
+    pattern = re.compile(pattern)
+    path = os.path.join(contracts_dir, contract)
+    with open(path, "r") as f:
+        content = f.read()
+    if not pattern.search(content):
+        raise Exception(f"{pattern} not found")
+    with open(path, "w") as f:
+        f.write(pattern.sub(repl, content, count=count))
+
+
+def configure_dev():
+    generate.network = "dev"
+    generate.sources = SourceOverlay(generate.work_dir)
+    generate.generate_system()
+    generate.generate_system_reward()
+    generate.generate_slash_indicator("50", "150", "28800")
+    generate.generate_stake_hub("1 days", "45", "7 days", "2 days", "30 days", "address(0xdEaD)")
+    generate.generate_governor(
+        "3 seconds", "0 hours / 3", "7 days / 3", "200 ether", "10", "10_000_000 ether", "uint64(1 days / 3)",
+        "address(0xdEaD)"
+    )
+    generate.generate_timelock("24 hours")
+
+
+def read_sources(overlay):
+    contents = {}
+    for rel_path, path in overlay.sources():
+        with open(path, "r") as f:
+            contents[rel_path] = f.read()
+    return contents
+
+
+@pytest.mark.parametrize("configure", [generate.configure_mainnet, generate.configure_testnet, configure_dev])
+def test_overlay_matches_the_in_place_patches(tmp_path, monkeypatch, configure):
+    calls = []
+    monkeypatch.setattr(generate, "work_dir", ROOT)
+    monkeypatch.setattr(generate, "insert", lambda *args: calls.append((legacy_insert, args)))
+    monkeypatch.setattr(generate, "replace", lambda *args: calls.append((legacy_replace, args)))
+    configure()
+    overlay = SourceOverlay(ROOT)
+    for function, args in calls:
+        (overlay.insert if function is legacy_insert else overlay.replace)(*args)
+
+    legacy_dir = str(tmp_path / "legacy")
+    shutil.copytree(os.path.join(ROOT, "contracts"), legacy_dir)
+    for function, args in calls:
+        function(legacy_dir, *args)
+    working_tree = read_sources(overlay)
+    overlay_root = overlay.materialize(str(tmp_path / "overlay"))
+
+    assert {args[0] for _, args in calls}
+    legacy = read_sources(SourceOverlay(str(tmp_path), "legacy"))
+    assert read_sources(SourceOverlay(overlay_root)) == legacy
+    assert read_sources(overlay) == working_tree
+
+
+def test_materialize_links_unpatched_sources_and_drops_removed_ones(tmp_path):
+    work = tmp_path / "work"
+    (work / "contracts" / "lib").mkdir(parents=True)
+    (work / "foundry.toml").write_text("[profile.default]\n")
+    (work / "contracts" / "A.sol").write_text("uint256 public constant X = 1;\n")
+    (work / "contracts" / "lib" / "B.sol").write_text("contract B {}\n")
+    overlay = SourceOverlay(str(work))
+    overlay.replace("A.sol", r"X =[^;]*;", "X = 2;")
+
+    root = overlay.materialize(str(tmp_path / "overlay"))
+    assert (tmp_path / "overlay" / "contracts" / "A.sol").read_text() == "uint256 public constant X = 2;\n"
+    assert (work / "contracts" / "A.sol").read_text() == "uint256 public constant X = 1;\n"
+    assert os.path.samefile(work / "contracts" / "lib" / "B.sol", os.path.join(root, "contracts", "lib", "B.sol"))
+
+    (work / "contracts" / "lib" / "B.sol").unlink()
+    overlay.materialize(root)
+    assert not os.path.exists(os.path.join(root, "contracts", "lib", "B.sol"))
+
+
+def test_missing_pattern_and_unknown_contract_fail(tmp_path):
+    work = tmp_path / "work"
+    (work / "contracts").mkdir(parents=True)
+    (work / "foundry.toml").write_text("[profile.default]\n")
+    (work / "contracts" / "A.sol").write_text("contract A {}\n")
+
+    overlay = SourceOverlay(str(work))
+    overlay.replace("A.sol", r"missing =[^;]*;", "missing = 1;")
+    with pytest.raises(Exception, match="not found"):
+        overlay.materialize(str(tmp_path / "overlay"))
+
+    overlay = SourceOverlay(str(work))
+    overlay.insert("Missing.sol", "contract", "// x")
+    with pytest.raises(Exception, match="Source file 'Missing.sol' not found"):
+        overlay.materialize(str(tmp_path / "overlay"))
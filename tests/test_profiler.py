@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from scripts import profiler as profiling
+from scripts.profiler import Profiler
+
+
+def test_nested_stages_and_trace(tmp_path):
+    profiler = Profiler(enabled=True)
+    with profiler.stage("command", "command", argv=["mainnet"]):
+        with profiler.stage("patch sources"):
+            pass
+        with profiler.stage("assemble genesis") as metrics:
+            metrics["holders"] = 3
+
+    path = str(tmp_path / "profile.json")
+    profiler.save(path, ["mainnet"])
+    with open(path, "r") as f:
+        trace = json.load(f)
+
+    assert (trace["displayTimeUnit"], trace["command"]) == ("ms", ["mainnet"])
+    events = trace["traceEvents"]
+    assert [(event["name"], event["cat"], event["args"]["depth"]) for event in events] == [
+        ("command", "command", 0), ("patch sources", "stage", 1), ("assemble genesis", "stage", 1)
+    ]
+    command, patch, assemble = events
+    assert all(event["ph"] == "X" and event["tid"] == 0 for event in events)
+    assert command["ts"] <= patch["ts"] <= patch["ts"] + patch["dur"] <= assemble["ts"]
+    assert assemble["ts"] + assemble["dur"] <= command["ts"] + command["dur"]
+    assert command["args"]["argv"] == ["mainnet"] and assemble["args"]["holders"] == 3
+    assert "child_peak_rss_kb" not in command["args"]
+
+    assert profiling.load_stages(path) == trace["stages"]
+    assert [stage["name"] for stage in trace["stages"]] == ["command", "patch sources", "assemble genesis"]
+    assert trace["stages"][0]["category"] == "command"
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    with profiler.stage("stage") as metrics:
+        metrics["x"] = 1
+    result = profiler.run("echo", [sys.executable, "-c", "print('hi')"], capture_output=True, text=True)
+    assert result.stdout == "hi\n"
+    assert profiler.events == []
+
+
+@pytest.mark.skipif(not hasattr(os, "wait4"), reason="os.wait4 is not available")
+def test_peak_rss_of_each_child():
+    profiler = Profiler(enabled=True)
+    large = profiler.run("large", [sys.executable, "-c", "b = b'x' * (256 * 1024 * 1024)"], check=True)
+    small = profiler.run("small", [sys.executable, "-c", "pass"], check=True)
+    assert (large.returncode, small.returncode) == (0, 0)
+
+    large_kb, small_kb = (event["args"]["child_peak_rss_kb"] for event in profiler.events)
+    assert large_kb > 256 * 1024
+    # not the high-water mark of all the children, like RUSAGE_CHILDREN
+    assert small_kb < 128 * 1024
+    assert profiler.events[0]["args"]["args"] == [sys.executable, "-c", "b = b'x' * (256 * 1024 * 1024)"]
+
+
+def test_run_behaves_like_subprocess_run():
+    profiler = Profiler(enabled=True)
+    result = profiler.run("cat", [sys.executable, "-c", "import sys; print(sys.stdin.read())"],
+                          input="abc", capture_output=True, text=True)
+    assert (result.returncode, result.stdout) == (0, "abc\n")
+
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        profiler.run("fail", [sys.executable, "-c", "import sys; sys.exit(3)"], capture_output=True, check=True)
+    assert e.value.returncode == 3
+    # the failed stage is recorded too
+    assert [event["name"] for event in profiler.events] == ["cat", "fail"]
+
+
+def test_aggregate():
+    def stage(name, wall, process_kb, child_kb=None, read=None):
+        stage = {
+            "name": name, "category": "subprocess" if child_kb else "stage", "wall_s": wall, "cpu_s": wall / 2,
+            "children_cpu_s": 0.0, "process_max_rss_kb": process_kb, "read_bytes": read, "written_bytes": None,
+        }
+        if child_kb:
+            stage["child_peak_rss_kb"] = child_kb
+        return stage
+
+    runs = [
+        [stage("forge build", 4.0, 100, 900, 10), stage("assemble genesis", 0.5, 200)],
+        [stage("forge build", 2.0, 110, 700, 30), stage("assemble genesis", 1.5, 300)],
+        [stage("forge build", 3.0, 120, 800, None)],
+    ]
+    forge, assemble = profiling.aggregate(runs)
+
+    assert (forge["name"], forge["category"], forge["count"]) == ("forge build", "subprocess", 3)
+    assert (forge["wall_s_min"], forge["wall_s_median"], forge["wall_s_max"], forge["cpu_s_median"]) == (
+        2.0, 3.0, 4.0, 1.5
+    )
+    assert (forge["process_max_rss_kb_max"], forge["child_peak_rss_kb_max"]) == (120, 900)
+    assert (forge["read_bytes_median"], forge["written_bytes_median"]) == (20, None)
+    assert (assemble["count"], assemble["wall_s_median"], assemble["child_peak_rss_kb_max"]) == (2, 1.0, None)
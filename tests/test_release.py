@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from typer.testing import CliRunner
+
+from scripts import generate, release
+
+PENDING = (200, {"status": "0", "result": "Pending in queue"})
+PASS = (200, {"status": "1", "result": "Pass - Verified"})
+NOT_VERIFIED = (200, {"status": "1", "result": [{"SourceCode": ""}]})
+VERIFIED = (200, {"status": "1", "result": [{"SourceCode": "contract ValidatorSet {}"}]})
+
+TEMPLATE = """{
+  "alloc": {
+    "0x0000000000000000000000000000000000001000": {
+      "balance": "0x0",
+      "code": "{{validatorContract}}"
+    },
+    "0x0000000000000000000000000000000000001001": {
+      "balance": "0x0",
+      "code": "{{slashContract}}"
+    }
+  }
+}
+"""
+
+
+class Explorer:
+    # an Etherscan compatible verification API answering with `handle(params) -> (status code, body)`
+    def __init__(self):
+        self.requests = []
+        self.handle = None
+        self.lock = threading.Lock()
+
+    def actions(self):
+        return [params["action"] for params in self.requests]
+
+    def script(self, **responses):
+        # the next scripted response of each action, the last one is repeated
+        def handle(params):
+            queue = responses[params["action"]]
+            return queue.pop(0) if len(queue) > 1 else queue[0]
+
+        self.handle = handle
+
+
+@pytest.fixture
+def explorer():
+    stub = Explorer()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, query):
+            params = {k: v[0] for k, v in urllib.parse.parse_qs(query).items()}
+            with stub.lock:
+                stub.requests.append(params)
+                code, body = stub.handle(params)
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._reply(urllib.parse.urlsplit(self.path).query)
+
+        def do_POST(self):
+            self._reply(self.rfile.read(int(self.headers["Content-Length"])).decode())
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    stub.url = f"http://127.0.0.1:{server.server_address[1]}/api"
+    yield stub
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # the delays instead of sleeping, without the jitter
+    delays = []
+    monkeypatch.setattr(release.time, "sleep", delays.append)
+    monkeypatch.setattr(release.random, "uniform", lambda low, high: high)
+    return delays
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = str(tmp_path)
+    with open(os.path.join(root, "foundry.toml"), "w") as f:
+        f.write("[profile.default]\noptimizer = true\noptimizer_runs = 200\nbytecode_hash = 'none'\n")
+    with open(os.path.join(root, "genesis-template.json"), "w") as f:
+        f.write(TEMPLATE)
+    os.makedirs(os.path.join(root, "contracts"))
+    for name in ("ValidatorSet", "SlashIndicator"):
+        with open(os.path.join(root, "contracts", f"{name}.sol"), "w") as f:
+            f.write(f'pragma solidity 0.6.4;\nimport "./System.sol";\ncontract {name} is System {{}}\n')
+    with open(os.path.join(root, "contracts", "System.sol"), "w") as f:
+        f.write("pragma solidity 0.6.4;\ncontract System {}\n")
+    return root
+
+
+def contract(project, name="ValidatorSet"):
+    contracts = release.release_contracts(project, os.path.join(project, "genesis-template.json"))
+    return next(c for c in contracts if c.name == name)
+
+
+def test_retries_with_exponential_backoff_then_polls(explorer, sleeps, project):
+    explorer.script(
+        getsourcecode=[(429, {}), (503, {}), NOT_VERIFIED],
+        verifysourcecode=[
+            (200, {"status": "0", "result": "Max rate limit reached"}),
+            (200, {"status": "1", "result": "guid"}),
+        ],
+        checkverifystatus=[PENDING, PENDING, PASS],
+    )
+    verifier = release.Verifier(explorer.url, "key", 2582, retries=3, backoff=0.5, poll_interval=2.0)
+    validator_set = contract(project)
+
+    assert verifier.verify(validator_set, release.standard_json_input(project, validator_set)) == "verified"
+    assert explorer.actions() == ["getsourcecode"] * 3 + ["verifysourcecode"] * 2 + ["checkverifystatus"] * 3
+    assert sleeps == [0.5, 1.0, 0.5, 2.0, 2.0]
+
+    submitted = explorer.requests[4]
+    assert submitted["codeformat"] == "solidity-standard-json-input"
+    assert submitted["contractname"] == "contracts/ValidatorSet.sol:ValidatorSet"
+    assert submitted["evmversion"] == "istanbul"
+    assert (submitted["apikey"], submitted["chainid"]) == ("key", "2582")
+    standard_input = json.loads(submitted["sourceCode"])
+    assert sorted(standard_input["sources"]) == ["contracts/System.sol", "contracts/ValidatorSet.sol"]
+    assert standard_input["settings"]["metadata"] == {"bytecodeHash": "none"}
+    assert standard_input["settings"]["optimizer"] == {"enabled": True, "runs": 200}
+
+
+def test_gives_up_after_the_retries_with_a_capped_backoff(explorer, sleeps, project):
+    explorer.script(getsourcecode=[(502, {})])
+    verifier = release.Verifier(explorer.url, "key", 2582, retries=5, backoff=1.0, max_backoff=4.0)
+
+    with pytest.raises(release.VerifierError, match="getsourcecode failed after 6 attempts: HTTP 502"):
+        verifier.is_verified(contract(project))
+    assert len(explorer.requests) == 6
+    assert sleeps == [1.0, 2.0, 4.0, 4.0, 4.0]
+
+
+def test_client_errors_are_not_retried(explorer, sleeps, project):
+    explorer.script(getsourcecode=[(403, {"message": "invalid api key"})])
+    verifier = release.Verifier(explorer.url, "key", 2582)
+
+    with pytest.raises(release.VerifierError, match="HTTP 403"):
+        verifier.is_verified(contract(project))
+    assert len(explorer.requests) == 1
+    assert sleeps == []
+
+
+def test_already_verified(explorer, sleeps, project):
+    explorer.script(
+        getsourcecode=[NOT_VERIFIED],
+        verifysourcecode=[(200, {"status": "0", "result": "Contract source code already verified"})],
+    )
+    verifier = release.Verifier(explorer.url, "key", 2582)
+
+    assert verifier.verify(contract(project), "{}") == "already verified"
+    assert explorer.actions() == ["getsourcecode", "verifysourcecode"]
+
+
+def test_verified_contracts_are_skipped_unless_forced(explorer, sleeps, project):
+    explorer.script(
+        getsourcecode=[VERIFIED],
+        verifysourcecode=[(200, {"status": "1", "result": "guid"})],
+        checkverifystatus=[PASS],
+    )
+    verifier = release.Verifier(explorer.url, "key", 2582)
+
+    assert verifier.verify(contract(project), "{}") == "skipped"
+    assert verifier.verify(contract(project), "{}", skip_verified=False) == "verified"
+    assert explorer.actions() == ["getsourcecode", "verifysourcecode", "checkverifystatus"]
+
+
+def test_release_contracts_from_the_artifact_metadata(project):
+    metadata = {
+        "compiler": {"version": "0.6.4+commit.1dca32f3"},
+        "settings": {
+            "compilationTarget": {"contracts/ValidatorSet.sol": "ValidatorSet"},
+            "evmVersion": "istanbul",
+            "metadata": {"bytecodeHash": "none"},
+            "optimizer": {"enabled": True, "runs": 200},
+            "remappings": ["forge-std/=lib/forge-std/src/"],
+            "libraries": {},
+        },
+        "sources": {"contracts/ValidatorSet.sol": {}, "contracts/System.sol": {}},
+    }
+    os.makedirs(os.path.join(project, "out", "ValidatorSet.sol"))
+    with open(os.path.join(project, "out", "ValidatorSet.sol", "ValidatorSet.json"), "w") as f:
+        json.dump({"metadata": json.dumps(metadata)}, f)
+
+    validator_set = contract(project)
+    assert validator_set.compiler == "v0.6.4+commit.1dca32f3"
+    standard_input = json.loads(release.standard_json_input(project, validator_set))
+    assert standard_input["settings"] == {k: v for k, v in metadata["settings"].items() if k != "compilationTarget"}
+    assert sorted(standard_input["sources"]) == ["contracts/System.sol", "contracts/ValidatorSet.sol"]
+
+
+def test_failed_verification_fails_the_command(explorer, sleeps, project, monkeypatch):
+    def handle(params):
+        if params["action"] == "getsourcecode":
+            return NOT_VERIFIED
+        if params["action"] == "verifysourcecode":
+            return 200, {"status": "1", "result": "guid-" + params["contractname"].rpartition(":")[2]}
+        if params["guid"] == "guid-SlashIndicator":
+            return 200, {"status": "0", "result": "Fail - Unable to verify"}
+        return PASS
+
+    explorer.handle = handle
+    monkeypatch.setattr(generate, "work_dir", project)
+    monkeypatch.setattr(generate, "chain_id", 25821, raising=False)
+    monkeypatch.setattr(generate, "release_root", lambda network_name: project)
+
+    result = CliRunner().invoke(generate.main, ["verify-contracts", "testnet", "--verifier-url", explorer.url])
+    assert result.exit_code == 1, result.output
+    assert "ValidatorSet 0x0000000000000000000000000000000000001000 (v0.6.4+commit.1dca32f3): verified" in result.output
+    assert "SlashIndicator 0x0000000000000000000000000000000000001001 (v0.6.4+commit.1dca32f3): failed" in result.output
+    assert "Verification of SlashIndicator failed" in result.output
+    assert {params["chainid"] for params in explorer.requests} == {"25821"}
+
+
+def test_testnet_needs_a_verifier_url(project, monkeypatch):
+    monkeypatch.setattr(generate, "release_root", lambda network_name: project)
+
+    result = CliRunner().invoke(generate.main, ["verify-contracts", "testnet"])
+    assert result.exit_code == 1
+    assert str(result.exception) == "No known verifier of testnet, set --verifier-url"
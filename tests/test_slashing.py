@@ -0,0 +1,216 @@
+import random
+
+import numpy as np
+import pytest
+
+from scripts import slashing
+from scripts.slashing import SlashingParams, SlashingTrials
+
+# 40 blocks per breathe block interval in turns of 4 blocks: 16 in-turn blocks for the first validator, 12 for the
+# others, with misdemeanorThreshold 5, felonyThreshold 12 and clean() decreasing the counts by 3
+PARAMS = SlashingParams(
+    misdemeanor_threshold=5, felony_threshold=12, max_elected_validators=3, block_interval=3,
+    breathe_block_interval=120, turn_length=4, downtime_jail_time=2 * 120,
+)
+
+
+class Reference:
+    # SlashIndicator.slash and clean for a single validator, one call per missed in-turn block
+    def __init__(self, params, slots):
+        self.params = params
+        self.slots = slots
+        self.jail_intervals = -(-params.downtime_jail_time // params.breathe_block_interval)
+        self.count = 0
+        self.jailed = 0
+        self.misdemeanors = self.felonies = self.missed = self.forfeited = self.jailed_blocks = 0
+
+    def slash(self):
+        self.count += 1
+        if self.count % self.params.felony_threshold == 0:
+            self.count = 0
+            return "felony"
+        if self.count % self.params.misdemeanor_threshold == 0:
+            return "misdemeanor"
+
+    def clean(self):
+        decrease = self.params.felony_threshold // slashing.DECREASE_RATE
+        self.count = self.count - decrease if self.count > decrease else 0
+
+    def interval(self, offline):
+        if self.jailed:
+            self.jailed -= 1
+            self.jailed_blocks += self.slots
+            self.clean()
+            return
+
+        produced = forfeited = 0
+        for slot, missed in enumerate(offline):
+            if not missed:
+                produced += 1
+                continue
+            self.missed += 1
+            result = self.slash()
+            if result == "misdemeanor":
+                self.misdemeanors += 1
+                # the incoming of the interval so far, forfeited again at the next misdemeanor
+                forfeited = produced
+            elif result == "felony":
+                self.felonies += 1
+                self.jailed = self.jail_intervals
+                # and the validator is removed for the rest of the interval
+                forfeited = produced + len(offline) - slot - 1
+                break
+        self.forfeited += forfeited
+        self.clean()
+
+
+def feed(monkeypatch, trials, days):
+    # the offline in-turn blocks of every day, by (trial, validator)
+    days = iter(days)
+
+    def offline_slots(rng, params, slots, carry):
+        offline_by_row = next(days)
+        rows = sorted(offline_by_row)
+        offline = np.zeros((len(rows), slots.shape[1]), dtype=bool)
+        for i, row in enumerate(rows):
+            offline[i, :len(offline_by_row[row])] = offline_by_row[row]
+        trial_index = np.array([trial for trial, _ in rows], dtype=np.int64)
+        validator_index = np.array([validator for _, validator in rows], dtype=np.int64)
+        return trial_index, validator_index, offline, carry
+
+    monkeypatch.setattr(slashing, "offline_slots", offline_slots)
+    return SlashingTrials(PARAMS, trials, 0)
+
+
+def test_in_turn_blocks():
+    slots = slashing.in_turn_blocks(PARAMS)
+    assert slots.shape == (3, 16)
+    assert list(slots[0]) == [0, 1, 2, 3, 12, 13, 14, 15, 24, 25, 26, 27, 36, 37, 38, 39]
+    assert list(slots[2]) == [8, 9, 10, 11, 20, 21, 22, 23, 32, 33, 34, 35, -1, -1, -1, -1]
+
+
+def test_threshold_crossings():
+    reference = Reference(PARAMS, 16)
+    assert [reference.slash() for _ in range(13)] == [
+        None, None, None, None, "misdemeanor", None, None, None, None, "misdemeanor", None, "felony", None
+    ]
+    assert reference.count == 1
+
+
+def test_misdemeanors_then_felony_in_an_interval(monkeypatch):
+    # the first validator misses its first 12 in-turn blocks, the second 5 of them and the third none
+    offline = [True] * 12 + [False] * 4
+    trials = feed(monkeypatch, 1, [{(0, 0): offline, (0, 1): [False] * 7 + [True] * 5}])
+    trials.step()
+
+    assert list(trials.misdemeanors[0]) == [2, 1, 0]
+    assert list(trials.felonies[0]) == [1, 0, 0]
+    assert list(trials.missed_blocks[0]) == [12, 5, 0]
+    # the rest of the interval after the felony, and the 7 blocks produced before the misdemeanor
+    assert list(trials.forfeited_blocks[0]) == [4, 7, 0]
+    # the felony reset the count, clean() decreased the other one by 12 / 4
+    assert list(trials.counts[0]) == [0, 2, 0]
+    assert list(trials.jailed_days[0]) == [2, 0, 0]
+
+
+def test_clean_decreases_the_counts_until_they_are_dropped(monkeypatch):
+    trials = feed(monkeypatch, 1, [{(0, 1): [True] * 7}, {}, {}, {}])
+    counts = []
+    for _ in range(4):
+        trials.step()
+        counts.append(int(trials.counts[0, 1]))
+    assert counts == [4, 1, 0, 0]
+    assert int(trials.misdemeanors[0, 1]) == 1
+
+
+def test_jailed_validators_skip_the_jail_intervals(monkeypatch):
+    felony = [True] * 12
+    days = [{(0, 1): felony}, {(0, 1): felony}, {(0, 1): felony}, {(0, 1): [True] * 4}]
+    trials = feed(monkeypatch, 1, days)
+    totals = trials.run(4)
+
+    # jailed on the first day for 2 intervals, the outages of the next two days are not slashed
+    assert int(trials.felonies[0, 1]) == 1
+    assert int(trials.jailed_blocks[0, 1]) == 2 * 12
+    assert totals["jailed_validator_days"] == 2
+    assert int(trials.counts[0, 1]) == 1
+    assert (totals["jailed_validators"], totals["felonies"]) == (1, 1)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_the_contract_on_random_outages(monkeypatch, seed):
+    rng = random.Random(seed)
+    num_trials, num_days = 2, 30
+    slots = [int(n) for n in (slashing.in_turn_blocks(PARAMS) >= 0).sum(axis=1)]
+
+    days = []
+    for _ in range(num_days):
+        day = {}
+        for trial in range(num_trials):
+            for validator, n in enumerate(slots):
+                if rng.random() < 0.6:
+                    start, length = rng.randrange(n), rng.randrange(1, n + 1)
+                    day[(trial, validator)] = [start <= slot < start + length for slot in range(n)]
+        days.append(day)
+
+    trials = feed(monkeypatch, num_trials, days)
+    trials.run(num_days)
+
+    for trial in range(num_trials):
+        for validator, n in enumerate(slots):
+            reference = Reference(PARAMS, n)
+            for day in days:
+                reference.interval(day.get((trial, validator), [False] * n))
+            index = trial, validator
+            assert (
+                int(trials.counts[index]), int(trials.misdemeanors[index]), int(trials.felonies[index]),
+                int(trials.missed_blocks[index]), int(trials.forfeited_blocks[index]), int(trials.jailed_blocks[index]),
+            ) == (
+                reference.count, reference.misdemeanors, reference.felonies, reference.missed, reference.forfeited,
+                reference.jailed_blocks,
+            )
+
+
+def test_zero_outages():
+    params = PARAMS._replace(outages_per_day=0.0)
+    totals = slashing.run_trials(params, 4, 10, 0)
+
+    assert totals == {
+        "validator_trials": 12,
+        "misdemeanor_validators": 0,
+        "jailed_validators": 0,
+        "misdemeanors": 0,
+        "felonies": 0,
+        "jailed_validator_days": 0,
+        "lost_blocks": 0,
+        "blocks": 4 * 10 * 40,
+    }
+    summary = slashing.summarize(params, 10, [totals])
+    assert (summary["jail_probability"], summary["lost_reward_ratio"], summary["trials"]) == (0.0, 0.0, 4)
+
+
+def test_batches_do_not_depend_on_the_batch_split():
+    assert [size for size, _ in slashing.batch_seeds(7, 10, 4)] == [4, 4, 2]
+    first = [seed.generate_state(1)[0] for _, seed in slashing.batch_seeds(7, 10, 4)]
+    assert first == [seed.generate_state(1)[0] for _, seed in slashing.batch_seeds(7, 12, 4)]
+
+
+@pytest.mark.parametrize(
+    "params, error",
+    [
+        ({"misdemeanor_threshold": "150"}, "1 <= misdemeanorThreshold < felonyThreshold <= 1000"),
+        ({"felony_threshold": "1_001"}, "1 <= misdemeanorThreshold < felonyThreshold <= 1000"),
+        ({"outage_distribution": "uniform"}, "Unsupported outage distribution: uniform"),
+        ({"slash_amount": "1"}, "Unknown slashing parameter: slash_amount"),
+    ],
+)
+def test_invalid_params(params, error):
+    with pytest.raises(Exception, match=error):
+        slashing.slashing_params(params)
+
+
+def test_params_from_a_sweep():
+    params = slashing.slashing_params(
+        {"downtime_jail_time": "1 days", "felony_threshold": "1_000", "outage_minutes": 5}
+    )
+    assert (params.downtime_jail_time, params.felony_threshold, params.outage_minutes) == (86400, 1000, 5.0)
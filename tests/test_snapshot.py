@@ -0,0 +1,247 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from eth_abi import decode, encode
+
+from scripts import snapshot as snapshots
+from scripts.abi_index import AbiIndex
+
+INDEX = AbiIndex.load(os.path.join(os.path.dirname(__file__), os.pardir, "abi"))
+BLOCK = "0x10"
+
+
+class Node:
+    # a JSON-RPC node with `validators` validators in StakeHub, `respond(requests)` overrides its answer
+    def __init__(self, validators=0):
+        self.validators = validators
+        self.chunked = False
+        self.delay = 0
+        self.respond = None
+        self.batches = []
+        self.peers = set()
+        self.lock = threading.Lock()
+
+    def operator(self, i):
+        return f"0x{0x1000000 + i:040x}"
+
+    def credit(self, i):
+        return f"0x{0x2000000 + i:040x}"
+
+    def consensus(self, i):
+        return f"0x{0x3000000 + i:040x}"
+
+    def eth_call(self, data):
+        function = INDEX.function(data)
+        args = decode([f["type"] for f in function.fields], bytes.fromhex(data[10:]))
+        if function.name in ("getValidators", "getValidatorElectionInfo"):
+            offset, limit = args
+            rows = range(offset, min(offset + limit, self.validators))
+            if function.name == "getValidators":
+                values = [[self.operator(i) for i in rows], [self.credit(i) for i in rows], self.validators]
+            else:
+                values = [
+                    [self.consensus(i) for i in rows], [10 ** 21 + i for i in rows],
+                    [bytes([i % 256]) * 48 for i in rows], self.validators,
+                ]
+            return encode(function.outputs, values)
+        if function.name == "getLivingValidators":
+            living = range(min(self.validators, 3))
+            return encode(function.outputs, [[self.consensus(i) for i in living], [b"\x02" * 48 for _ in living]])
+        if function.name == "getValidatorCommission":
+            return encode(function.outputs, [(10, 100, 5)])
+        if function.name == "getValidatorBasicInfo":
+            return encode(function.outputs, [1, False, 0])
+        if function.name in ("totalPooledToken", "totalSupply"):
+            return encode(function.outputs, [10 ** 22])
+        if function.name == "getSlashIndicator":
+            return encode(function.outputs, [5, 2])
+        raise Exception(f"Unexpected call of {function.name}")
+
+    def answer(self, request):
+        method = request["method"]
+        if method == "eth_call":
+            result = "0x" + self.eth_call(request["params"][0]["data"]).hex()
+        elif method == "eth_blockNumber":
+            result = BLOCK
+        elif method == "eth_chainId":
+            result = "0xa16"
+        elif method == "eth_getBlockByNumber":
+            result = {"hash": "0x" + "ab" * 32, "timestamp": "0x5"}
+        else:
+            result = request["params"]
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    def calls(self, name):
+        selector = "0x" + next(sel.hex() for sel, f in INDEX.functions.items() if f.name == name)
+        return [
+            decode(["uint256", "uint256"], bytes.fromhex(request["params"][0]["data"][10:]))
+            for batch in self.batches for request in batch
+            if request["method"] == "eth_call" and request["params"][0]["data"].startswith(selector)
+        ]
+
+
+@pytest.fixture
+def node():
+    stub = Node()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            requests = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with stub.lock:
+                stub.batches.append(requests)
+                stub.peers.add(self.client_address)
+            time.sleep(stub.delay)
+            status, body = (stub.respond and stub.respond(requests)) or (200, [stub.answer(r) for r in requests])
+            data = json.dumps(body).encode()
+
+            self.send_response(status)
+            if stub.chunked:
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(data), 1000):
+                    chunk = data[i:i + 1000]
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    stub.url = f"http://127.0.0.1:{server.server_address[1]}/"
+    yield stub
+    server.shutdown()
+    server.server_close()
+
+
+def run(client, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            client.close()
+
+    return asyncio.run(main())
+
+
+def test_batches_are_split_and_results_kept_in_order(node):
+    client = snapshots.RpcClient(node.url, connections=2, batch_size=100)
+
+    results = run(client, client.batch([("echo", [i]) for i in range(250)]))
+    assert results == [[i] for i in range(250)]
+    assert sorted(len(batch) for batch in node.batches) == [50, 100, 100]
+
+
+def test_connections_are_bounded_and_reused(node):
+    client = snapshots.RpcClient(node.url, connections=2, batch_size=10)
+
+    async def calls():
+        return [await client.batch([("echo", [i]) for i in range(100)]) for _ in range(3)]
+
+    run(client, calls())
+    assert len(node.batches) == 30
+    assert len(node.peers) == 2
+
+
+def test_chunked_responses(node):
+    node.chunked = True
+    client = snapshots.RpcClient(node.url)
+
+    results = run(client, client.batch([("echo", ["x" * 100]) for _ in range(50)]))
+    assert results == [["x" * 100]] * 50
+
+
+@pytest.mark.parametrize(
+    "respond, error",
+    [
+        (lambda requests: (200, [{"id": r["id"], "error": {"code": -32000, "message": "boom"}} for r in requests]),
+         "echo failed: {'code': -32000, 'message': 'boom'}"),
+        (lambda requests: (200, []), "echo failed: None"),
+        (lambda requests: (200, {"id": None, "error": {"message": "batch not supported"}}),
+         "Batch request failed: {'message': 'batch not supported'}"),
+        (lambda requests: (503, {"error": "overloaded"}), "HTTP HTTP/1.1 503"),
+    ],
+)
+def test_errors(node, respond, error):
+    node.respond = respond
+    client = snapshots.RpcClient(node.url)
+
+    with pytest.raises(snapshots.RpcError, match=re.escape(error)):
+        run(client, client.call("echo", 1))
+
+
+def test_a_connection_failing_on_the_wire_is_dropped(node):
+    node.respond = lambda requests: (503, {})
+    client = snapshots.RpcClient(node.url, connections=1)
+
+    async def calls():
+        with pytest.raises(snapshots.RpcError):
+            await client.call("echo", 1)
+        assert not client._opened
+        node.respond = None
+        return await client.call("echo", 2)
+
+    assert run(client, calls()) == [2]
+    assert len(node.peers) == 2
+
+
+def test_closing_the_client_during_a_request(node):
+    node.delay = 0.2
+    client = snapshots.RpcClient(node.url)
+
+    async def close_during_call():
+        task = asyncio.ensure_future(client.call("echo", 1))
+        await asyncio.sleep(0.05)
+        client.close()
+        await task
+
+    # the error of the request, not one of the bookkeeping of the closed connections
+    with pytest.raises(snapshots.RpcError):
+        run(client, close_during_call())
+
+
+@pytest.mark.parametrize(
+    "validators, page_size, offsets", [(0, 100, [0]), (200, 100, [0, 100]), (250, 100, [0, 100, 200])]
+)
+def test_snapshot_paginates(node, validators, page_size, offsets):
+    node.validators = validators
+    client = snapshots.RpcClient(node.url, batch_size=64)
+
+    snapshot = run(client, snapshots.Snapshotter(client, INDEX, page_size).snapshot())
+    assert sorted(offset for offset, _ in node.calls("getValidators")) == offsets
+    assert sorted(offset for offset, _ in node.calls("getValidatorElectionInfo")) == offsets
+    assert {limit for _, limit in node.calls("getValidators")} == {page_size}
+
+    assert (snapshot["chainId"], snapshot["block"]) == (0xa16, 0x10)
+    columns = snapshot["validators"]
+    assert {len(column) for column in columns.values()} == {validators}
+    assert columns["operator"] == [node.operator(i) for i in range(validators)]
+    assert columns["consensus"] == [node.consensus(i) for i in range(validators)]
+    assert columns["votingPower"] == [str(10 ** 21 + i) for i in range(validators)]
+    assert columns["slashCount"] == [2] * validators
+    assert snapshot["living"]["consensus"] == [node.consensus(i) for i in range(min(validators, 3))]
+
+
+def test_snapshot_round_trip(tmp_path, node):
+    node.validators = 3
+    client = snapshots.RpcClient(node.url)
+    snapshot = run(client, snapshots.Snapshotter(client, INDEX).snapshot(BLOCK))
+
+    for name in ("snapshot.json", "snapshot.json.gz"):
+        path = str(tmp_path / name)
+        snapshots.write_snapshot(path, snapshot)
+        assert snapshots.read_snapshot(path) == snapshot
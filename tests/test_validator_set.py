@@ -0,0 +1,214 @@
+import json
+import os
+
+import pytest
+
+from scripts import generate, validator_set
+from scripts.validator_set import Validator
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+NETWORKS = [(generate.configure_mainnet, "genesis.json"), (generate.configure_testnet, "genesis-test.json")]
+
+
+def extra_data(name):
+    with open(os.path.join(ROOT, name), "r") as f:
+        return bytes.fromhex(json.load(f)["extraData"][2:])
+
+
+def validator(i, voting_power=0x64):
+    return Validator(
+        bytes([1]) + i.to_bytes(19, "big"), bytes([2]) + i.to_bytes(19, "big"), bytes([3]) + i.to_bytes(19, "big"),
+        voting_power, bytes([4]) + i.to_bytes(47, "big"),
+    )
+
+
+# the packages of validators.js in scripts/generate.py and the extraData of the committed genesis files
+@pytest.mark.parametrize("configure, name", NETWORKS)
+def test_package_and_extra_data_round_trip(configure, name):
+    package = bytes.fromhex(configure())
+    validators = validator_set.decode_package(package)
+
+    assert validators
+    assert validator_set.encode_package(validators) == package
+    consensus_addrs = [v.consensus_addr for v in validators]
+    assert validator_set.encode_extra_data(consensus_addrs) == extra_data(name)
+    assert validator_set.decode_extra_data(extra_data(name)) == consensus_addrs
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 100])
+@pytest.mark.parametrize("voting_power", [1, 0x7f, 0x80, 0xff, 2 ** 64 - 1])
+def test_encode_decode(count, voting_power):
+    validators = [validator(i, voting_power) for i in range(count)]
+    assert validator_set.decode_package(validator_set.encode_package(validators)) == validators
+
+
+def test_encoding_of_a_single_validator():
+    package = validator_set.encode_package([validator(0, 0x7f)])
+    # [0x00, [[20 bytes, 20 bytes, 20 bytes, 0x7f, 48 bytes]]], the list payloads are longer than 55 bytes
+    v = validator(0)
+    entry = b"\x94" + v.consensus_addr + b"\x94" + v.bbc_fee_addr + b"\x94" + v.fee_addr
+    entry += b"\x7f" + b"\xb0" + v.bls_public_key
+    assert len(entry) == 0x71
+    assert package == b"\xf8\x76\x80\xf8\x73\xf8\x71" + entry
+
+
+@pytest.mark.parametrize(
+    "data, error",
+    [
+        (b"", "unexpected end of data"),
+        (bytes.fromhex("c280c0") + b"\x00", "trailing bytes"),
+        (bytes.fromhex("c580"), "list at 0 exceeds the data"),
+        (bytes.fromhex("c180"), r"expected \[type, validators\]"),
+        (bytes.fromhex("c2808000"), "trailing bytes"),
+        (bytes.fromhex("c4808105c0"), "non canonical single byte at 2"),
+        (bytes.fromhex("f800"), "non canonical length"),
+        (bytes.fromhex("c201c0"), "Unsupported validator set package type: 1"),
+        (bytes.fromhex("c480c2c180"), "Invalid validator #0: expected 5 fields"),
+    ],
+)
+def test_invalid_packages(data, error):
+    with pytest.raises(Exception, match=error):
+        validator_set.decode_package(data)
+
+
+@pytest.mark.parametrize("length", [0, 32 + 65 - 1, 32 + 65 + 19])
+def test_invalid_extra_data(length):
+    with pytest.raises(Exception, match="Invalid extraData length"):
+        validator_set.decode_extra_data(bytes(length))
+
+
+def write(path, content):
+    with open(path, "wb" if isinstance(content, bytes) else "w") as f:
+        f.write(content)
+    return str(path)
+
+
+def csv_row(v):
+    row = validator_set.to_json(v)
+    return ",".join(str(row[field]) for field in validator_set.CONFIG_FIELDS)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl", "bin"])
+def test_write_read_round_trip(tmp_path, fmt):
+    validators = [validator(i, 10 ** 18 + i) for i in range(5)]
+    path = str(tmp_path / f"validators.{fmt}")
+
+    assert validator_set.write_validators(path, validators) == 5
+    assert list(validator_set.read_validators(path)) == validators
+    assert [validator_set.parse_validator(row) for row in validator_set.ValidatorsView(path)] == validators
+
+
+def test_csv_skips_comments_and_blank_lines(tmp_path):
+    content = f"# consensusAddr,...\n\n{csv_row(validator(0))}\n  \n{csv_row(validator(1))}\n"
+    path = write(tmp_path / "validators.conf", content)
+    assert list(validator_set.read_validators(path)) == [validator(0), validator(1)]
+
+
+@pytest.mark.parametrize(
+    "content, error",
+    [
+        ("0x01,0x02\n", "validators.conf:1: expected 5 comma separated fields"),
+        (csv_row(validator(0)).replace("0x0100", "0xzz00", 1) + "\n", "validators.conf:1: invalid address"),
+        (csv_row(validator(0)).rsplit(",", 1)[0] + ",0x1234\n", "validators.conf:1: BLS public key must be 48 bytes"),
+        (csv_row(validator(0)).replace(",100,", ",0,") + "\n", "validators.conf:1: voting power 0 out of range"),
+        (csv_row(validator(0)).replace(",100,", ",ten,") + "\n", "validators.conf:1: invalid voting power ten"),
+    ],
+)
+def test_csv_errors(tmp_path, content, error):
+    path = write(tmp_path / "validators.conf", content)
+    with pytest.raises(Exception, match=error):
+        list(validator_set.read_validators(path))
+
+
+def test_mixed_case_addresses_need_a_valid_checksum(tmp_path):
+    row = validator_set.to_json(validator(0))
+    checksummed = validator_set.to_checksum_address(bytes.fromhex("ab" * 20))
+    assert validator_set.parse_address(checksummed) == bytes.fromhex("ab" * 20)
+    assert validator_set.parse_address(checksummed.lower()) == bytes.fromhex("ab" * 20)
+
+    row["consensusAddr"] = "0x" + checksummed[2:].swapcase()
+    path = write(tmp_path / "validators.jsonl", json.dumps(row) + "\n")
+    with pytest.raises(Exception, match="invalid address checksum"):
+        list(validator_set.read_validators(path))
+
+
+def test_jsonl_errors(tmp_path):
+    row = validator_set.to_json(validator(0))
+    del row["bLSPublicKey"]
+    path = write(tmp_path / "validators.jsonl", "{not json\n" + json.dumps(row) + "\n[]\n")
+    with pytest.raises(Exception) as e:
+        list(validator_set.read_validators(path))
+    assert str(e.value).splitlines()[1:] == [
+        f"{path}:1: invalid JSON validator: Expecting property name enclosed in double quotes: "
+        f"line 1 column 2 (char 1)",
+        f"{path}:2: invalid JSON validator: 'bLSPublicKey'",
+        f"{path}:3: invalid JSON validator: list indices must be integers or slices, not str",
+    ]
+
+
+@pytest.mark.parametrize(
+    "field, value, error",
+    [
+        ("votingPower", 1.5, "votingPower must be a string or an integer, got 1.5"),
+        ("votingPower", True, "votingPower must be a string or an integer, got true"),
+        ("consensusAddr", 0x1234, "consensusAddr must be a string, got 4660"),
+        ("bLSPublicKey", None, "bLSPublicKey must be a string, got null"),
+        ("feeAddr", ["0x01"], r'feeAddr must be a string, got \["0x01"\]'),
+    ],
+)
+def test_jsonl_field_types(tmp_path, field, value, error):
+    row = dict(validator_set.to_json(validator(1)), **{field: value})
+    rows = [validator_set.to_json(validator(0)), row, dict(validator_set.to_json(validator(2)), votingPower="0x64")]
+    path = write(tmp_path / "validators.jsonl", "".join(json.dumps(r) + "\n" for r in rows))
+
+    # reported with the other row errors instead of escaping as a TypeError
+    with pytest.raises(Exception, match=f"Invalid validator info:\n{path}:2: invalid JSON validator: {error}$"):
+        list(validator_set.read_validators(path))
+
+
+def test_packed_errors(tmp_path):
+    path = write(tmp_path / "bad-magic.bin", b"H2VS\x02")
+    with pytest.raises(Exception, match="Invalid packed validators file"):
+        list(validator_set.read_validators(path))
+
+    record = validator_set.PACKED_RECORD.pack(*validator(0))
+    path = write(tmp_path / "truncated.bin", validator_set.PACKED_MAGIC + record + record[:-1])
+    with pytest.raises(Exception, match="truncated.bin:2: truncated record"):
+        list(validator_set.read_validators(path))
+
+    path = write(tmp_path / "zero.bin", validator_set.PACKED_MAGIC + validator_set.PACKED_RECORD.pack(*validator(0, 0)))
+    with pytest.raises(Exception, match="zero.bin:1: voting power 0 out of range"):
+        list(validator_set.read_validators(path))
+
+
+def test_duplicates(tmp_path):
+    duplicated_vote = validator(2)._replace(bls_public_key=validator(0).bls_public_key)
+    path = str(tmp_path / "validators.jsonl")
+    validator_set.write_validators(path, [validator(0), validator(1), validator(0), duplicated_vote])
+
+    with pytest.raises(Exception) as e:
+        list(validator_set.read_validators(path))
+    assert str(e.value).splitlines()[1:] == [
+        f"{path}:3: duplicated consensus address {validator_set.to_checksum_address(validator(0).consensus_addr)}, "
+        f"first seen at 1",
+        f"{path}:4: duplicated vote address 0x{validator(0).bls_public_key.hex()}, first seen at 1",
+    ]
+
+
+def test_errors_are_capped_and_nothing_is_yielded_after_one(tmp_path):
+    rows = [csv_row(validator(0))] + ["0x01"] * 30 + [csv_row(validator(1))]
+    path = write(tmp_path / "validators.conf", "\n".join(rows) + "\n")
+
+    read = []
+    with pytest.raises(Exception) as e:
+        for v in validator_set.read_validators(path, max_errors=5):
+            read.append(v)
+    assert read == [validator(0)]
+    errors = str(e.value).splitlines()[1:]
+    assert [error.split(":")[1] for error in errors] == ["2", "3", "4", "5", "6"]
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(Exception, match="Unsupported validators format: xml"):
+        list(validator_set.read_validators(str(tmp_path / "validators.xml"), "xml"))
@@ -0,0 +1,130 @@
+import copy
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from scripts import generate, verify
+from scripts.verify import Diff
+
+# {"solc": 0x000813} and its length, as appended by solc with bytecode_hash = 'none'
+METADATA = bytes.fromhex("a164736f6c6343000813") + (10).to_bytes(2, "big")
+OTHER_METADATA = bytes.fromhex("a164736f6c6343000814") + (10).to_bytes(2, "big")
+CODE = bytes.fromhex("6080604052600080fd")
+
+EXPECTED = {
+    "config": {"chainId": 714, "parlia": {"period": 3, "epoch": 200}},
+    "gasLimit": "0x2625a00",
+    "alloc": {
+        "0x0000000000000000000000000000000000001000": {"balance": "0x0", "code": "0x" + (CODE + METADATA).hex()},
+        "0x0000000000000000000000000000000000001001": {"balance": "0x0", "code": "0x" + (CODE + METADATA).hex()},
+        "0x0000000000000000000000000000000000001002": {"balance": "0x0", "code": "0x60", "nonce": "0x1"},
+    },
+}
+
+
+def write(path, genesis):
+    path.write_text(json.dumps(genesis))
+    return str(path)
+
+
+def test_strip_metadata():
+    assert verify.strip_metadata(CODE + METADATA) == CODE
+    # no CBOR map before the length, or a length past the start of the code
+    assert verify.strip_metadata(CODE + (3).to_bytes(2, "big")) == CODE + (3).to_bytes(2, "big")
+    assert verify.strip_metadata(b"\xa1" + (100).to_bytes(2, "big")) == b"\xa1" + (100).to_bytes(2, "big")
+    assert verify.strip_metadata(b"\x00") == b"\x00"
+
+
+def test_identical_genesis(tmp_path):
+    actual = copy.deepcopy(EXPECTED)
+    # addresses are compared case insensitively, balances and nonces by value
+    account = actual["alloc"].pop("0x0000000000000000000000000000000000001002")
+    actual["alloc"]["0000000000000000000000000000000000001002"] = dict(account, nonce="0x01")
+    actual["alloc"]["00000000000000000000000000000000000000aB"] = {"balance": "0x0a"}
+
+    holders = [("0x00000000000000000000000000000000000000Ab", 10)]
+    assert verify.verify(write(tmp_path / "genesis.json", actual), EXPECTED, holders) == []
+
+
+def test_diffs(tmp_path):
+    actual = copy.deepcopy(EXPECTED)
+    actual["config"]["chainId"] = 715
+    del actual["config"]["parlia"]["epoch"]
+    actual["extraData"] = "0x00"
+    alloc = actual["alloc"]
+    alloc["0x0000000000000000000000000000000000001000"]["code"] = "0x" + (CODE + OTHER_METADATA).hex()
+    alloc["0x0000000000000000000000000000000000001001"]["code"] = "0x" + (CODE[:-1] + b"\xfe" + METADATA).hex()
+    alloc["0x0000000000000000000000000000000000001002"].update(balance="0x1", storage={"0x01": "0x02"})
+    alloc["0x00000000000000000000000000000000000000a2"] = {"balance": "0x5"}
+    alloc["0x00000000000000000000000000000000000000a3"] = {"balance": "0x1"}
+
+    holders = [("0x00000000000000000000000000000000000000a1", 1), ("0x00000000000000000000000000000000000000a2", 4)]
+    diffs = verify.verify(write(tmp_path / "genesis.json", actual), EXPECTED, holders)
+
+    assert diffs == [
+        Diff("config", "config.chainId", 714, 715),
+        Diff("missing", "config.parlia.epoch", 200, None),
+        Diff("unexpected", "extraData", None, "0x00"),
+        Diff(
+            "metadata", "alloc.0x0000000000000000000000000000000000001000.code",
+            verify.code_hash(CODE + METADATA), verify.code_hash(CODE + OTHER_METADATA),
+        ),
+        Diff(
+            "code", "alloc.0x0000000000000000000000000000000000001001.code",
+            verify.code_hash(CODE + METADATA), verify.code_hash(CODE[:-1] + b"\xfe" + METADATA),
+        ),
+        Diff("account", "alloc.0x0000000000000000000000000000000000001002.balance", "0x0", "0x1"),
+        Diff("unexpected", "alloc.0x0000000000000000000000000000000000001002.storage", None, {"0x01": "0x02"}),
+        Diff("missing", "alloc.00000000000000000000000000000000000000a1", {"balance": "0x1"}, None),
+        Diff("account", "alloc.00000000000000000000000000000000000000a2.balance", "0x4", "0x5"),
+        Diff("unexpected", "alloc.0x00000000000000000000000000000000000000a3", None, {"balance": "0x1"}),
+    ]
+    assert [diff.is_warning() for diff in diffs].count(True) == 1
+    assert diffs[0].to_json() == {"kind": "config", "path": "config.chainId", "expected": 714, "actual": 715}
+
+
+@pytest.fixture
+def command(tmp_path, monkeypatch):
+    # verify-genesis with the rendering of the expected genesis and the holders stubbed
+    monkeypatch.setattr(generate, "work_dir", str(tmp_path))
+    monkeypatch.setattr(generate, "chain_id", 714, raising=False)
+    monkeypatch.setattr(generate, "configure_mainnet", lambda: "00")
+    monkeypatch.setattr(generate, "genesis_extra_data", lambda init_validator_set_bytes: "0x00")
+    monkeypatch.setattr(generate, "build_system_bytecodes", lambda cache: ({}, False))
+    monkeypatch.setattr(generate.genesis, "render", lambda *args: copy.deepcopy(EXPECTED))
+    monkeypatch.setattr(generate, "load_holders", lambda no_node, init_holders_file: ([], None))
+
+    def run(actual):
+        write(tmp_path / "genesis.json", actual)
+        args = ["verify-genesis", "mainnet", "--no-cache", "--report-file", "report.json"]
+        result = CliRunner().invoke(generate.main, args)
+        with open(tmp_path / "report.json", "r") as f:
+            return result, json.load(f)
+
+    return run
+
+
+def test_metadata_only_differences_pass(command):
+    actual = copy.deepcopy(EXPECTED)
+    actual["alloc"]["0x0000000000000000000000000000000000001000"]["code"] = "0x" + (CODE + OTHER_METADATA).hex()
+
+    result, report = command(actual)
+    assert result.exit_code == 0, result.output
+    assert "metadata   alloc.0x0000000000000000000000000000000000001000.code" in result.output
+    assert "Genesis ./genesis.json matches mainnet" in result.output
+    assert [diff["kind"] for diff in report] == ["metadata"]
+
+
+def test_code_differences_fail(command):
+    actual = copy.deepcopy(EXPECTED)
+    actual["alloc"]["0x0000000000000000000000000000000000001000"]["code"] = "0x" + (CODE + OTHER_METADATA).hex()
+    actual["alloc"]["0x0000000000000000000000000000000000001002"]["code"] = "0x61"
+
+    result, report = command(actual)
+    assert result.exit_code == 1, result.output
+    assert "Genesis ./genesis.json does not match mainnet, 1 differences" in result.output
+    assert [(diff["kind"], diff["path"]) for diff in report] == [
+        ("metadata", "alloc.0x0000000000000000000000000000000000001000.code"),
+        ("code", "alloc.0x0000000000000000000000000000000000001002.code"),
+    ]